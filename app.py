@@ -1,7 +1,12 @@
 import os
+import uuid
 import modal
 from dotenv import load_dotenv
 from game import AdventureGame
+from sessions import GameSessionManager
+from snapshot import encode_snapshot, decode_snapshot
+from state_delta import apply_delta, snapshot_version
+from warm_pool import load_warm_pool_config, warm_pool_env, warm_pool_scheduler
 
 # Load environment variables
 load_dotenv()
@@ -9,49 +14,45 @@ load_dotenv()
 # Define the Modal app
 app = modal.App("adventure-game")
 
+# The FLUX image model is deployed separately (flux_backend.py)
+IMAGE_APP_NAME = "adventure-image-gen"
+
+WARM_POOL = load_warm_pool_config()
+
 # Create an image with our dependencies
 image = modal.Image.debian_slim().pip_install(
     "langchain>=0.1.0",
     "langchain-core>=0.1.0",
     "langchain-google-genai>=0.0.3",
+    "langchain-openai>=0.1.0",
     "google-generativeai>=0.3.1",
     "pydantic>=2.5.0",
-    "python-dotenv>=1.0.0"
+    "python-dotenv>=1.0.0",
+    "msgpack>=1.0.0"
 )
 
+# The cron job runs in its own container, so it gets the deploying shell's
+# WARM_POOL_CONFIG (inlined, in case it names a local file) through its image
+warm_pool_image = image.env(warm_pool_env())
+
 @app.function(image=image, secrets=[modal.Secret.from_name("google-ai-key")])
 def run_game_turn(world_key, character_data, game_state_data, user_input):
-    """Run a single turn of the game, processing user input and returning the next state"""
-    # Recreate game state from data
-    game = AdventureGame()
-    
-    # Initialize world and character from provided data
-    game.select_world(world_key)
-    game.create_character(
-        character_data["name"],
-        character_data["attributes"],
-        character_data["description"]
-    )
+    """Run a single turn of the game, processing user input and returning the next state
     
-    # Manually set game state properties from the saved state
-    game.initialize_game()
+    `game_state_data` may also be a packed game (AdventureGame.pack()), in which case
+    the updated game is returned packed too.
+    """
+    packed = isinstance(game_state_data, (bytes, bytearray))
     
-    # Update game state based on saved data
-    if game_state_data.get("inventory"):
-        game.game_state.inventory = game_state_data["inventory"]
-    
-    if game_state_data.get("location"):
-        loc = game_state_data["location"]
-        game.game_state.change_location(loc["region"], loc["area"], loc.get("description", ""))
-    
-    if game_state_data.get("health"):
-        game.game_state.health = game_state_data["health"]
-    
-    if game_state_data.get("gold"):
-        game.game_state.gold = game_state_data["gold"]
-    
-    if game_state_data.get("history"):
-        game.game_state.history = game_state_data["history"]
+    # Restore the game from the saved state without generating a new introduction
+    if packed:
+        game = AdventureGame.from_snapshot(decode_snapshot(game_state_data))
+    else:
+        game = AdventureGame.from_snapshot({
+            "world_key": world_key,
+            "character": character_data,
+            "game_state": game_state_data
+        })
     
     # Process the user's input
     response = game.process_user_action(user_input)
@@ -59,21 +60,11 @@ def run_game_turn(world_key, character_data, game_state_data, user_input):
     # Return the updated game state and AI response
     return {
         "response": response,
-        "game_state": {
-            "inventory": game.game_state.inventory,
-            "location": {
-                "region": game.game_state.location.region,
-                "area": game.game_state.location.area,
-                "description": game.game_state.location.description
-            },
-            "health": game.game_state.health,
-            "gold": game.game_state.gold,
-            "history": game.game_state.history
-        }
+        "game_state": game.pack() if packed else game.to_snapshot()["game_state"]
     }
 
 @app.function(image=image, secrets=[modal.Secret.from_name("google-ai-key")])
-def initialize_new_game(world_key, character_name, character_attributes, character_description):
+def initialize_new_game(world_key, character_name, character_attributes, character_description, packed=False):
     """Initialize a new game with the given world and character settings"""
     game = AdventureGame()
     
@@ -87,19 +78,75 @@ def initialize_new_game(world_key, character_name, character_attributes, charact
     # Return initial game state
     return {
         "introduction": intro,
-        "game_state": {
-            "inventory": game.game_state.inventory,
-            "location": {
-                "region": game.game_state.location.region,
-                "area": game.game_state.location.area,
-                "description": game.game_state.location.description
-            },
-            "health": game.game_state.health,
-            "gold": game.game_state.gold,
-            "history": game.game_state.history
-        }
+        "game_state": game.pack() if packed else game.to_snapshot()["game_state"]
+    }
+
+@app.cls(image=image, secrets=[modal.Secret.from_name("google-ai-key")],
+         scaledown_window=WARM_POOL["game"].scaledown_window)
+class GameSessions:
+    """Stateful game server that keeps live games in the container between turns"""
+    
+    @modal.enter()
+    def enter(self):
+        self.sessions = GameSessionManager()
+    
+    @modal.method()
+    def start(self, session_id, world_key, character_name, character_attributes, character_description,
+              packed=False):
+        """Start a new game for a session and return the introduction"""
+        return self.sessions.start_game(
+            session_id, world_key, character_name, character_attributes, character_description, packed=packed
+        )
+    
+    @modal.method()
+    def turn(self, session_id, world_key, character_data, game_state_data, user_input):
+        """Run a turn, reusing the live game when this container already holds it"""
+        return self.sessions.run_turn(session_id, world_key, character_data, game_state_data, user_input)
+    
+    @modal.method()
+    def delta_turn(self, session_id, version, user_input, packed=None):
+        """Run a turn and return only the state delta; see GameSessionManager.run_delta_turn"""
+        return self.sessions.run_delta_turn(session_id, version, user_input, packed)
+    
+    @modal.method()
+    def end(self, session_id):
+        """Drop the live game for a session"""
+        return self.sessions.end_session(session_id)
+    
+    @modal.method()
+    def ping(self):
+        """No-op call used to start a container ahead of a player's first turn"""
+        return True
+
+def warm_pool_targets():
+    """The Modal objects whose warm capacity the scheduler manages, by config name"""
+    return {
+        "game": GameSessions(),
+        "image": modal.Cls.from_name(IMAGE_APP_NAME, "Model")()
     }
 
+@app.function(image=warm_pool_image, schedule=modal.Cron("*/10 * * * *"))
+def apply_warm_pool():
+    """Apply the configured minimum warm containers for the current time of day"""
+    targets = warm_pool_scheduler().targets()
+    for name, instance in warm_pool_targets().items():
+        if name in targets:
+            instance.update_autoscaler(min_containers=targets[name])
+    print(f"Warm pool targets: {targets}")
+    return targets
+
+def prewarm(names=None):
+    """Wake the functions a new session is about to need; safe to call from any web request"""
+    woken = warm_pool_scheduler().prewarm(names)
+    if woken:
+        instances = warm_pool_targets()
+        for name in woken:
+            try:
+                instances[name].ping.spawn()
+            except Exception as e:
+                print(f"Error pre-warming {name}: {e}")
+    return woken
+
 @app.local_entrypoint()
 def main():
     # This is a simple CLI interface for testing the Modal functions
@@ -138,12 +185,14 @@ def main():
         
         description = input("\nDescribe your character's appearance: ")
         
-        # Initialize game using Modal function
-        result = initialize_new_game.remote(world_key, name, attributes, description)
+        # Initialize game using the stateful Modal session class
+        session_id = uuid.uuid4().hex
+        sessions = GameSessions()
+        result = sessions.start.remote(session_id, world_key, name, attributes, description, packed=True)
         print("\n" + result["introduction"])
         
-        # Store game state
-        game_state = result["game_state"]
+        # Keep the game snapshot locally; turns only send back what changed
+        snapshot = decode_snapshot(result["game_state"])
         
         # Main game loop
         while True:
@@ -151,18 +200,17 @@ def main():
             if user_action.lower() in ["quit", "exit"]:
                 break
             
-            # Process user action using Modal function
-            result = run_game_turn.remote(
-                world_key,
-                {"name": name, "attributes": attributes, "description": description},
-                game_state,
-                user_action
-            )
+            # Process user action using the stateful Modal session class
+            version = snapshot_version(snapshot)
+            result = sessions.delta_turn.remote(session_id, version, user_action)
+            if result.get("resync"):
+                # The container serving this call does not hold the game yet
+                result = sessions.delta_turn.remote(session_id, version, user_action, encode_snapshot(snapshot))
             
             print("\n" + result["response"])
             
             # Update game state
-            game_state = result["game_state"]
+            snapshot = apply_delta(snapshot, result["delta"])
     except EOFError:
         print("\nInput error detected. Try running 'python local_game.py' instead for a better command-line experience.")
     except Exception as e:
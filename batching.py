@@ -0,0 +1,125 @@
+"""
+Dynamic batching for image generation
+
+Concurrent callers each submit one prompt; a background thread collects prompts
+for up to `max_wait` seconds (or until `max_batch_size` are waiting) and runs them
+through the pipeline as a single batched call, then hands each caller its own
+result. Nothing here imports torch, so the scheduling can be exercised on CPU
+with a fake pipeline.
+"""
+
+import time
+import queue
+import threading
+from io import BytesIO
+from concurrent.futures import Future
+
+
+class DynamicBatcher:
+    """Group individual requests into batches for `run_batch(items) -> results`"""
+
+    def __init__(self, run_batch, max_batch_size=4, max_wait=0.05):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pending = queue.Queue()
+        self.stats = {'batches': 0, 'items': 0, 'largest_batch': 0}
+        self.closed = False
+        self.worker = threading.Thread(target=self._loop, name="dynamic-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, item):
+        """Queue an item and return a Future for its result"""
+        if self.closed:
+            raise RuntimeError("Batcher is closed")
+        future = Future()
+        self.pending.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Submit an item and wait for its result"""
+        return self.submit(item).result(timeout)
+
+    def close(self):
+        self.closed = True
+        self.pending.put(None)
+        self.worker.join()
+
+    def metrics(self):
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'avg_batch_size': round(self.stats['items'] / batches, 2) if batches else None
+        }
+
+    def _next_batch(self):
+        """Block for the first item, then gather more until the batch is full or the window closes"""
+        first = self.pending.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                self.pending.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            # Skip callers that gave up while waiting
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            self.stats['batches'] += 1
+            self.stats['items'] += len(batch)
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+
+            try:
+                results = self.run_batch([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch returned {len(results)} results for {len(batch)} inputs")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def render_batch(pipe, prompts, num_inference_steps, image_format="JPEG", width=None, height=None, callback=None):
+    """Render several prompts in one pipeline call, returning encoded image bytes per prompt
+
+    `callback` is passed to the pipeline as `callback_on_step_end`, with the latents.
+    """
+    extra = {"width": width, "height": height} if width and height else {}
+    if callback is not None:
+        extra.update(callback_on_step_end=callback, callback_on_step_end_tensor_inputs=["latents"])
+    images = pipe(
+        list(prompts),
+        output_type="pil",
+        num_inference_steps=num_inference_steps,
+        **extra,
+    ).images
+
+    encoded = []
+    for image in images:
+        byte_stream = BytesIO()
+        image.save(byte_stream, format=image_format)
+        encoded.append(byte_stream.getvalue())
+    return encoded
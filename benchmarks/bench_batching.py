@@ -0,0 +1,94 @@
+"""
+Benchmark: image throughput and latency vs. dynamic batch window
+
+Runs DynamicBatcher in front of a fake pipeline whose cost grows sub-linearly with
+batch size (a fixed per-call cost plus a smaller per-image cost), like a GPU that a
+single prompt leaves underutilized. Concurrent clients submit prompts with random
+think time; for each batch window the throughput and latency are reported.
+
+    python benchmarks/bench_batching.py --clients 8 --requests 10 --max-batch 4
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import DynamicBatcher, render_batch
+
+
+class FakeImage:
+    def save(self, stream, format=None):
+        stream.write(b"\xff\xd8fake\xff\xd9")
+
+
+class FakePipeline:
+    """Stands in for FluxPipeline: sleeps call_cost + image_cost per prompt"""
+
+    def __init__(self, call_cost, image_cost):
+        self.call_cost = call_cost
+        self.image_cost = image_cost
+
+    def __call__(self, prompts, output_type="pil", num_inference_steps=None):
+        prompts = [prompts] if isinstance(prompts, str) else prompts
+        time.sleep(self.call_cost + self.image_cost * len(prompts))
+        return type("Output", (), {"images": [FakeImage() for _ in prompts]})()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(window, args):
+    pipe = FakePipeline(args.call_cost, args.image_cost)
+    batcher = DynamicBatcher(lambda prompts: render_batch(pipe, prompts, 4),
+                             max_batch_size=args.max_batch if window > 0 else 1, max_wait=window)
+
+    def client(index):
+        rng = random.Random(index)
+        latencies = []
+        for request in range(args.requests):
+            time.sleep(rng.uniform(0, args.think_time))
+            t0 = time.perf_counter()
+            batcher(f"client {index} scene {request}")
+            latencies.append(time.perf_counter() - t0)
+        return latencies
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        latencies = [latency for result in pool.map(client, range(args.clients)) for latency in result]
+    elapsed = time.perf_counter() - t0
+    batcher.close()
+
+    label = "unbatched" if window == 0 else f"{window * 1000:.0f} ms"
+    print(f"{label:>10}  images/s: {len(latencies) / elapsed:6.2f}  "
+          f"p50: {statistics.median(latencies) * 1000:6.0f} ms  "
+          f"p95: {percentile(latencies, 95) * 1000:6.0f} ms  "
+          f"avg batch: {batcher.metrics()['avg_batch_size']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--max-batch", type=int, default=4)
+    parser.add_argument("--call-cost", type=float, default=0.2, help="Fixed seconds per pipeline call")
+    parser.add_argument("--image-cost", type=float, default=0.05, help="Extra seconds per image in a call")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Max seconds between a client's requests")
+    parser.add_argument("--windows", default="0,0.01,0.05,0.1,0.2", help="Batch windows in seconds")
+    args = parser.parse_args()
+
+    for window in [float(w) for w in args.windows.split(",")]:
+        run(window, args)
+
+
+if __name__ == "__main__":
+    main()
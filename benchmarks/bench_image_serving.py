@@ -0,0 +1,90 @@
+"""
+Benchmark: requests/sec for repeated views of a generated image
+
+Serves the same image through a Flask app three ways: `send_file` from disk with
+no validators (how /api/image/view used to work), the in-memory cache returning
+the full body, and the in-memory cache answering a browser revalidation
+(If-None-Match) with 304. Also times a Range request for the second half of the
+image. Uses Flask's test client, so the numbers are server-side only.
+
+    python benchmarks/bench_image_serving.py --requests 2000 --size-kb 150
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from flask import Flask, Response, request, send_file
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "react-adventure-game"))
+
+from image_store import ImageStore, MemoryImageCache, set_cache_headers, IMMUTABLE_MAX_AGE
+
+KEY = "ab" * 32
+
+
+def create_app(store, memory):
+    app = Flask(__name__)
+
+    @app.route('/disk')
+    def disk():
+        return send_file(store.path(KEY), mimetype='image/jpeg', etag=False, conditional=False)
+
+    @app.route('/memory')
+    def memory_view():
+        data, etag = memory.get(KEY)
+        response = set_cache_headers(Response(data, mimetype='image/jpeg'), etag, IMMUTABLE_MAX_AGE)
+        return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+
+    return app
+
+
+def run(client, path, count, headers=None, expect=200):
+    received = 0
+    t0 = time.perf_counter()
+    for _ in range(count):
+        response = client.get(path, headers=headers or {})
+        if response.status_code != expect:
+            raise RuntimeError(f"{path}: expected {expect}, got {response.status_code}")
+        received += len(response.data)
+    elapsed = time.perf_counter() - t0
+    return count / elapsed, received / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=150, help="Size of the served image")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ImageStore(root)
+        memory = MemoryImageCache(store)
+        data = os.urandom(args.size_kb * 1024)
+        memory.put(KEY, data)
+        _, etag = memory.get(KEY)
+
+        client = create_app(store, memory).test_client()
+        half = len(data) // 2
+        cases = [
+            ("send_file from disk", "/disk", None, 200),
+            ("memory, full body", "/memory", None, 200),
+            ("memory, revalidation", "/memory", {"If-None-Match": f'"{etag}"'}, 304),
+            ("memory, range", "/memory", {"Range": f"bytes={half}-"}, 206),
+        ]
+
+        print(f"{args.requests} views of a {args.size_kb} KB image\n")
+        print(f"{'case':<22} {'req/s':>9} {'bytes/req':>10}")
+        for label, path, headers, expect in cases:
+            rate, size = run(client, path, args.requests, headers, expect)
+            print(f"{label:<22} {rate:>9.0f} {size:>10.0f}")
+
+        print(f"\nmemory cache: {memory.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: turns served without an LLM call by the intent fast path
+
+Replays a corpus of player sessions twice against the fake LLM backend (with a
+fixed latency standing in for the storyteller): once with only exact built-in
+commands answered locally, once with the intent router in front of the LLM.
+Reports the fraction of turns that skipped the LLM and the mean turn latency of
+each run.
+
+    python benchmarks/bench_intent_router.py --latency 0.8
+    python benchmarks/bench_intent_router.py --corpus sessions.txt   # "world: pirate" starts a session, one action per line
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import AdventureGame
+from llm_backends import create_llm
+
+STARTING_ITEMS = ["Rusty Sword", "Torch", "Healing Potion", "Map of the Region", "Coil of Rope"]
+
+# Actions typed by players during playtests, grouped by session
+CORPUS = [
+    ("pirate", [
+        "Look around the deck", "check my bag", "Talk to the first mate", "where am I",
+        "go to Port Royal", "Ask the harbourmaster about the treasure map", "inventory",
+        "Head to the tavern and listen for rumours", "sail to skull island", "Search the beach for footprints",
+        "drop the rope", "Climb the cliff", "how am i doing", "Open the chest", "status"
+    ]),
+    ("fantasy", [
+        "Take the left path", "what do i have", "Follow the river north", "travel to drakenwood forest",
+        "Listen to the trees", "Light the torch", "where are we", "Talk to the old hermit",
+        "go to the castel", "Ask the guard to let me in", "drop the map", "Look for a secret passage",
+        "help", "Cast a spell on the door", "i"
+    ]),
+    ("space", [
+        "Check the ship's sensors", "stats", "Hail the station", "go to Space Station Centauri",
+        "Dock at the station", "Talk to the trader", "look in my pack", "Buy fuel",
+        "fly to the asteroid belt", "Scan the asteroids", "where am i", "Mine the glowing rock",
+        "throw away the torch", "Return to the ship", "check my health"
+    ]),
+    ("regular", [
+        "Make some coffee", "Check my phone", "walk to the city park", "Sit on a bench and people-watch",
+        "what am i carrying", "Call my friend", "go to the shopping mall", "Buy a new jacket",
+        "location", "Take the bus home", "drop the healing potion", "Cook dinner", "status",
+        "Go to sleep", "Read a book"
+    ]),
+]
+
+
+def load_corpus(path):
+    sessions = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("world:"):
+                sessions.append((line.split(":", 1)[1].strip(), []))
+            elif line and sessions:
+                sessions[-1][1].append(line)
+    return sessions
+
+
+def replay(corpus, fast_path, latency):
+    llm = create_llm("fake", latency=latency)
+    latencies = []
+    local_turns = 0
+    for world, actions in corpus:
+        game = AdventureGame(llm=llm, fast_path=fast_path)
+        game.select_world(world)
+        game.create_character("Bench", {"strength": 5, "intelligence": 5, "dexterity": 5, "charisma": 3, "luck": 2},
+                              "A tireless benchmark runner in a long grey coat")
+        # Skip the introduction, it is the same with and without the fast path
+        game.restore_game({"inventory": list(STARTING_ITEMS)})
+
+        for action in actions:
+            calls = llm.calls
+            t0 = time.perf_counter()
+            game.process_user_action(action)
+            latencies.append(time.perf_counter() - t0)
+            local_turns += llm.calls == calls
+    return latencies, local_turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Session corpus file instead of the built-in one")
+    parser.add_argument("--latency", type=float, default=0.8, help="Simulated storyteller latency in seconds")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else CORPUS
+    turns = sum(len(actions) for _, actions in corpus)
+    print(f"{len(corpus)} sessions, {turns} turns, storyteller latency {args.latency}s\n")
+
+    print(f"{'mode':<14} {'no-LLM turns':>13} {'mean turn s':>12} {'p50 s':>8} {'total s':>8}")
+    for label, fast_path in (("exact commands", False), ("intent router", True)):
+        latencies, local_turns = replay(corpus, fast_path, args.latency)
+        print(f"{label:<14} {local_turns / turns:>13.1%} {statistics.mean(latencies):>12.3f} "
+              f"{statistics.median(latencies):>8.3f} {sum(latencies):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: inventory operations and the per-turn prompt summary at hoarder sizes
+
+Fills an inventory with N items (a quarter of them duplicates) and times adding,
+lookups, removals and a turn's worth of prompt rendering, for the old plain list
+of names (linear `in`/`remove`, the whole list joined every turn) and for the
+indexed Inventory (dict lookups, stacked duplicates, cached capped summary).
+Each simulated turn changes the inventory with probability --change-rate.
+
+    python benchmarks/bench_inventory.py --items 100 1000 10000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory import Inventory
+
+NOUNS = ["Sword", "Potion", "Torch", "Rope", "Map", "Gem", "Key", "Scroll", "Coin", "Lantern", "Dagger", "Apple"]
+ADJECTIVES = ["Rusty", "Old", "Shiny", "Cursed", "Small", "Heavy", "Silver", "Broken", "Ancient", "Glowing"]
+
+
+class ListInventory:
+    """The previous inventory: a list of names, one entry per unit"""
+
+    def __init__(self):
+        self.items = []
+
+    def add(self, name):
+        self.items.append(name)
+
+    def has(self, name):
+        return name in self.items
+
+    def remove(self, name):
+        if name in self.items:
+            self.items.remove(name)
+
+    def summary(self):
+        return ", ".join(self.items)
+
+
+def item_names(count, rng):
+    unique = max(1, count * 3 // 4)
+    names = [f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}" for i in range(unique)]
+    return names + [rng.choice(names) for _ in range(count - unique)]
+
+
+def measure(inventory, names, lookups, turns, change_rate, rng):
+    timings = {}
+
+    t0 = time.perf_counter()
+    for name in names:
+        inventory.add(name)
+    timings["add"] = (time.perf_counter() - t0) / len(names)
+
+    probes = [rng.choice(names) for _ in range(lookups)]
+    t0 = time.perf_counter()
+    for name in probes:
+        inventory.has(name)
+    timings["has"] = (time.perf_counter() - t0) / lookups
+
+    t0 = time.perf_counter()
+    summary_chars = 0
+    for _ in range(turns):
+        if rng.random() < change_rate:
+            inventory.add(rng.choice(names))
+        summary_chars = len(inventory.summary())
+    timings["turn"] = (time.perf_counter() - t0) / turns
+
+    t0 = time.perf_counter()
+    for name in probes:
+        inventory.remove(name)
+    timings["remove"] = (time.perf_counter() - t0) / lookups
+    return timings, summary_chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--change-rate", type=float, default=0.3, help="Fraction of turns that change the inventory")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'inventory':>10} | {'add us':>8} {'has us':>8} {'remove us':>10} "
+          f"{'turn us':>9} | {'prompt chars':>12}")
+    for count in args.items:
+        names = item_names(count, random.Random(args.seed))
+        for label, inventory in (("list", ListInventory()), ("indexed", Inventory())):
+            timings, summary_chars = measure(inventory, names, args.lookups, args.turns, args.change_rate,
+                                             random.Random(args.seed))
+            print(f"{count:>6} {label:>10} | {timings['add'] * 1e6:>8.2f} {timings['has'] * 1e6:>8.2f} "
+                  f"{timings['remove'] * 1e6:>10.2f} {timings['turn'] * 1e6:>9.2f} | {summary_chars:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: prompt size and serialized state size as a game gets longer
+
+Plays N scripted turns into a GameState and reports the storyteller's history
+context (approximate tokens) and the JSON size of the state that is shipped to
+Modal / stored in the session, for the bounded memory and for an unbounded list.
+
+    python benchmarks/bench_memory.py --turns 10 100 1000
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from character import Character
+from gamestate import GameState
+from world_settings import WorldSettings
+
+STORYTELLER_RESPONSE = """DESCRIPTION: Turn {turn}. The path winds deeper into the forest, where the trees
+grow so close that their branches knit together overhead. Somewhere ahead a bell tolls, slow and
+heavy, and the birds fall silent. You notice fresh tracks in the mud, too large to belong to any
+wolf, and a torn banner hanging from a low branch bearing a crest you do not recognise.
+
+OPTIONS:
+1. Follow the tracks
+2. Take the banner
+3. Head towards the bell
+4. [Type your own action]"""
+
+
+def approx_tokens(text):
+    """Rough token estimate: ~4 characters per token for English prose"""
+    return len(text) // 4
+
+
+def play(game_state, turns):
+    history = []
+    for turn in range(turns):
+        for entry in (f"PLAYER: Follow the tracks ({turn})",
+                      "STORYTELLER: " + STORYTELLER_RESPONSE.format(turn=turn)):
+            game_state.add_to_history(entry)
+            history.append(entry)
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    character = Character("Bench", {"strength": 5}, "A tireless benchmark runner")
+    world = WorldSettings("fantasy", "A magical realm of dragons, wizards, and ancient mysteries.")
+
+    print(f"{'turns':>6} | {'unbounded prompt':>16} {'unbounded state':>16} | "
+          f"{'bounded prompt':>14} {'bounded state':>14}")
+    for turns in args.turns:
+        game_state = GameState(character, world)
+        history = play(game_state, turns)
+
+        # Unbounded: the old list kept every entry and shipped it every turn
+        unbounded_prompt = approx_tokens("\n".join(history[-5:]))
+        unbounded_state = len(json.dumps({"history": history}))
+
+        bounded_prompt = approx_tokens(game_state.get_recent_history(5))
+        bounded_state = len(json.dumps({
+            "history": game_state.history,
+            "history_summary": game_state.memory.summary
+        }))
+
+        print(f"{turns:>6} | {unbounded_prompt:>9} tokens {unbounded_state:>10} bytes | "
+              f"{bounded_prompt:>7} tokens {bounded_state:>8} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark: storyteller input tokens per turn with a cacheable prompt prefix
+
+Plays scripted turns against the fake LLM backend, which counts input tokens and,
+like providers with automatic prefix caching, treats a leading system message
+identical to the previous call's as cached. Reports total vs uncached input
+tokens per turn and how often the prefix had to be rebuilt locally.
+
+    python benchmarks/bench_prompt_cache.py --turns 20
+"""
+
+import os
+import sys
+import argparse
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import AdventureGame
+from llm_backends import create_llm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--world", default="fantasy")
+    args = parser.parse_args()
+
+    llm = create_llm("fake")
+    game = AdventureGame(llm=llm)
+    game.select_world(args.world)
+    game.create_character("Bench", {"strength": 5, "intelligence": 5, "dexterity": 5, "charisma": 3, "luck": 2},
+                          "A tireless benchmark runner in a long grey coat")
+    game.initialize_game()
+
+    # Only count storyteller turns, not the introduction
+    llm.reset_stats()
+    for turn in range(args.turns):
+        game.process_user_action(f"Walk further down the road ({turn})")
+
+    total = llm.input_tokens / llm.calls
+    uncached = (llm.input_tokens - llm.cached_input_tokens) / llm.calls
+    print(f"turns: {llm.calls}")
+    print(f"input tokens/turn (everything re-sent): {total:.0f}")
+    print(f"input tokens/turn (prefix cached):      {uncached:.0f}  "
+          f"({100 * (1 - uncached / total):.0f}% fewer)")
+    print(f"prefix builds: {game.storyteller_prompt.prefix_builds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: quest re-evaluation and prompt rendering per turn, full scan vs indexed
+
+Builds a quest log of N quests (chains of prerequisites, visit and obtain
+objectives spread over the world's areas and items) and plays T turns of
+random moves and pickups. The scan baseline checks every quest's objectives
+after each change and renders the whole log into the prompt, as the old list of
+quest dicts had to; the QuestLog only evaluates the quests indexed under what
+changed and reuses its bounded prompt block.
+
+    python benchmarks/bench_quests.py --quests 10 100 1000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from character import Character
+from gamestate import GameState
+from world_settings import WorldSettings
+from mutations import move, add_item
+from quests import Quest, COMPLETED
+
+ITEMS = [f"Relic {i}" for i in range(200)]
+
+
+def build_quests(count, areas, rng):
+    quests = []
+    for i in range(count):
+        objectives = [("visit", rng.choice(areas)[1]), ("obtain", rng.choice(ITEMS))]
+        prerequisites = [f"quest-{i - 1}"] if i % 4 else []
+        quests.append(Quest(f"Quest {i}", objectives, prerequisites))
+    return quests
+
+
+def scan(game_state, quests):
+    """The baseline: check every unfinished quest, then render the whole log"""
+    completed = {quest.id for quest in quests if quest.status == COMPLETED}
+    for quest in quests:
+        if quest.status == COMPLETED or not all(p in completed for p in quest.prerequisites):
+            continue
+        quest.objectives = [objective._replace(done=objective.done or objective.satisfied_by(game_state))
+                            for objective in quest.objectives]
+        if not quest.remaining():
+            quest.status = COMPLETED
+            completed.add(quest.id)
+    return "\n".join(f"{'✓' if quest.status == COMPLETED else '⋯'} {quest.name}" for quest in quests)
+
+
+def play(count, turns, indexed, seed):
+    rng = random.Random(seed)
+    world = WorldSettings("fantasy", "A magical realm of dragons, wizards, and ancient mysteries.")
+    areas = [(region, area) for region, info in world.regions.items() for area in info["areas"]]
+    game_state = GameState(Character("Bench", {"strength": 5}, "A tireless benchmark runner"), world)
+    quests = build_quests(count, areas, rng)
+    if indexed:
+        for quest in quests:
+            game_state.add_quest(quest)
+
+    prompt_chars = 0
+    t0 = time.perf_counter()
+    for _ in range(turns):
+        if rng.random() < 0.5:
+            game_state.mutations.apply([move(*rng.choice(areas))])
+        else:
+            game_state.mutations.apply([add_item(rng.choice(ITEMS))])
+        if indexed:
+            prompt_chars = len(game_state.quest_log.prompt_block())
+        else:
+            prompt_chars = len(scan(game_state, quests))
+    elapsed = (time.perf_counter() - t0) / turns
+
+    if indexed:
+        done = len(game_state.quest_log.with_status(COMPLETED))
+    else:
+        done = sum(quest.status == COMPLETED for quest in quests)
+    return elapsed, done, prompt_chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quests", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'quests':>7} {'mode':>8} | {'turn us':>9} {'completed':>10} {'prompt chars':>13}")
+    for count in args.quests:
+        for label, indexed in (("scan", False), ("indexed", True)):
+            elapsed, done, prompt_chars = play(count, args.turns, indexed, args.seed)
+            print(f"{count:>7} {label:>8} | {elapsed * 1e6:>9.1f} {done:>10} {prompt_chars:>13}")
+
+
+if __name__ == "__main__":
+    main()
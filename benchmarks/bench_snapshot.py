@@ -0,0 +1,100 @@
+"""
+Benchmark: snapshot encode/decode time and size, JSON vs the compact encoding
+
+Builds a game snapshot with N turns of history kept in memory (as an unbounded
+history or a large ConversationMemory would) and times each encoding round trip.
+msgpack rows are skipped when the package is not installed.
+
+    python benchmarks/bench_snapshot.py --turns 10 100 1000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot
+from character import Character
+from gamestate import GameState, NPC
+from world_settings import WorldSettings
+
+STORYTELLER_RESPONSE = """DESCRIPTION: Turn {turn}. The path winds deeper into the forest, where the trees
+grow so close that their branches knit together overhead. Somewhere ahead a bell tolls, slow and
+heavy, and the birds fall silent. You notice fresh tracks in the mud, too large to belong to any
+wolf, and a torn banner hanging from a low branch bearing a crest you do not recognise.
+
+OPTIONS:
+1. Follow the tracks
+2. Take the banner
+3. Head towards the bell
+4. [Type your own action]"""
+
+
+def build_snapshot(turns):
+    character = Character("Bench", {"strength": 5, "luck": 3}, "A tireless benchmark runner")
+    character.add_skill("tracking", 2)
+    world = WorldSettings("fantasy", "A magical realm of dragons, wizards, and ancient mysteries.")
+
+    game_state = GameState(character, world)
+    game_state.memory.max_entries = 2 * turns + 1
+    for turn in range(turns):
+        game_state.add_to_history(f"PLAYER: Follow the tracks ({turn})")
+        game_state.add_to_history("STORYTELLER: " + STORYTELLER_RESPONSE.format(turn=turn))
+    game_state.inventory = [f"item {i}" for i in range(20)]
+    game_state.add_quest({"name": "Find the bell", "completed": False})
+    game_state.add_npc("hermit", NPC("Hermit", "An old man who lives by the river", {"default": "Hello."}))
+
+    return {
+        "v": snapshot.SNAPSHOT_VERSION,
+        "world_key": world.world_type,
+        "character": character.to_snapshot(),
+        "game_state": {**game_state.to_snapshot(), "turn": turns}
+    }
+
+
+def encoders():
+    yield "json", (lambda s: json.dumps(s).encode("utf-8")), json.loads
+    yield "compact json", (lambda s: snapshot.encode_snapshot(s, compress=False, use_msgpack=False)), \
+        snapshot.decode_snapshot
+    yield "json+zlib", (lambda s: snapshot.encode_snapshot(s, use_msgpack=False)), snapshot.decode_snapshot
+    if snapshot.msgpack is not None:
+        yield "msgpack", (lambda s: snapshot.encode_snapshot(s, compress=False, use_msgpack=True)), \
+            snapshot.decode_snapshot
+        yield "msgpack+zlib", (lambda s: snapshot.encode_snapshot(s, use_msgpack=True)), snapshot.decode_snapshot
+
+
+def time_per_call(fn, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    if snapshot.msgpack is None:
+        print("msgpack is not installed; only JSON encodings are measured")
+
+    print(f"{'turns':>6} {'encoding':>14} | {'bytes':>9} {'vs json':>8} | {'encode ms':>10} {'decode ms':>10}")
+    for turns in args.turns:
+        data = build_snapshot(turns)
+        baseline = None
+        for name, encode, decode in encoders():
+            encoded = encode(data)
+            assert decode(encoded) == data
+            baseline = baseline or len(encoded)
+            print(f"{turns:>6} {name:>14} | {len(encoded):>9} {len(encoded) / baseline:>7.0%} | "
+                  f"{time_per_call(encode, data, args.repeat):>10.3f} "
+                  f"{time_per_call(decode, encoded, args.repeat):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: perceived turn latency with speculative pre-generation of options
+
+Plays scripted turns against the fake LLM. After each response the "player" reads
+for --read-time seconds, then picks one of the offered options (or, with
+probability --custom, types their own action). Compares the latency the player
+sees with speculation off and with --budget speculative calls per turn, and reports
+the hit rate and the tokens spent on speculations that were thrown away.
+
+    python benchmarks/bench_speculation.py --turns 20 --latency 0.3 --read-time 0.5
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import AdventureGame
+from llm_backends import create_llm
+
+
+def play(args, budget):
+    llm = create_llm("fake", latency=args.latency)
+    game = AdventureGame(llm=llm, speculation=budget)
+    game.select_world("fantasy")
+    game.create_character("Bench", {"strength": 5, "intelligence": 5, "dexterity": 5, "charisma": 3, "luck": 2},
+                          "A tireless benchmark runner")
+    game.initialize_game()
+    llm.reset_stats()
+
+    rng = random.Random(args.seed)
+    latencies = []
+    for turn in range(args.turns):
+        time.sleep(args.read_time)
+        if rng.random() < args.custom:
+            action = f"Sit down and write a letter ({turn})"
+        else:
+            action = str(rng.randint(1, 3))
+        t0 = time.perf_counter()
+        game.process_user_action(action)
+        latencies.append(time.perf_counter() - t0)
+
+    return game, llm, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake LLM latency in seconds")
+    parser.add_argument("--read-time", type=float, default=0.5, help="Seconds the player reads each response")
+    parser.add_argument("--custom", type=float, default=0.2, help="Probability of a typed custom action")
+    parser.add_argument("--budget", type=int, default=3, help="Speculative calls per turn")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for budget in (0, args.budget):
+        game, llm, latencies = play(args, budget)
+        label = "off" if budget == 0 else f"budget {budget}"
+        print(f"{label:<9} p50: {statistics.median(latencies) * 1000:6.0f} ms  "
+              f"mean: {statistics.mean(latencies) * 1000:6.0f} ms  "
+              f"llm calls: {llm.calls}  output tokens: {llm.output_tokens}")
+        if game.speculative:
+            metrics = game.speculative.metrics()
+            print(f"          hit rate: {metrics['hit_rate']}  launched: {metrics['launched']}  "
+                  f"discarded: {metrics['discarded']}  wasted tokens: "
+                  f"{metrics['wasted_input_tokens']} in / {metrics['wasted_output_tokens']} out")
+            game.speculative.shutdown()
+
+
+if __name__ == "__main__":
+    main()
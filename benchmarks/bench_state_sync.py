@@ -0,0 +1,91 @@
+"""
+Benchmark: bytes on the wire per turn, full-state turns vs delta turns
+
+Plays scripted turns through GameSessionManager with the fake LLM, the way the web
+app drives the Modal GameSessions class, and measures what each turn sends and
+receives (pickled, as Modal does) for:
+
+  dict    the legacy turn: character + whole game_state dict out, whole dict back,
+          which the web app then kept in its signed session cookie
+  packed  the same with the compact packed snapshot
+  delta   version + session key out, changed fields + appended history back
+
+    python benchmarks/bench_state_sync.py --turns 50
+"""
+
+import os
+import sys
+import pickle
+import argparse
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_backends import create_llm
+from sessions import GameSessionManager
+from snapshot import encode_snapshot, decode_snapshot
+from state_delta import apply_delta, snapshot_version
+
+CHARACTER = ("Bench", {"strength": 5, "intelligence": 5, "dexterity": 5, "charisma": 3, "luck": 2},
+             "A tireless benchmark runner")
+
+
+def wire_bytes(*values):
+    return sum(len(pickle.dumps(value)) for value in values)
+
+
+def cookie_bytes(game_state, character):
+    """Size of the signed Flask session cookie holding the legacy state, if Flask is installed"""
+    try:
+        from flask import Flask
+    except ImportError:
+        return None
+    app = Flask(__name__)
+    app.secret_key = "bench"
+    serializer = app.session_interface.get_signing_serializer(app)
+    return len(serializer.dumps({"game_state": game_state, "character": character, "world_key": "fantasy"}))
+
+
+def play(mode, turns):
+    manager = GameSessionManager(llm_factory=lambda: create_llm("fake", latency=0))
+    session_id = f"bench-{mode}"
+    result = manager.start_game(session_id, "fantasy", *CHARACTER, packed=(mode != "dict"))
+    character = dict(zip(("name", "attributes", "description"), CHARACTER))
+
+    game_state = result["game_state"]
+    snapshot = decode_snapshot(game_state) if mode == "delta" else None
+    sizes = []
+    for turn in range(turns):
+        action = str(turn % 3 + 1)
+        if mode == "delta":
+            version = snapshot_version(snapshot)
+            result = manager.run_delta_turn(session_id, version, action)
+            sizes.append(wire_bytes(session_id, version, action) + wire_bytes(result))
+            snapshot = apply_delta(snapshot, result["delta"])
+        else:
+            result = manager.run_turn(session_id, "fantasy", character, game_state, action)
+            sizes.append(wire_bytes(session_id, "fantasy", character, game_state, action) + wire_bytes(result))
+            game_state = result["game_state"]
+
+    if mode == "delta":
+        # The server-side copy must match the live game exactly
+        assert snapshot == manager.games[session_id].to_snapshot()
+        return sizes, None
+    return sizes, cookie_bytes(game_state, character) if mode == "dict" else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'mode':<7} | {'bytes at turn ' + str(args.turns):>18} {'mean bytes/turn':>16} | {'cookie':>8}")
+    for mode in ("dict", "packed", "delta"):
+        sizes, cookie = play(mode, args.turns)
+        print(f"{mode:<7} | {sizes[-1]:>18} {sum(sizes) // len(sizes):>16} | "
+              f"{cookie if cookie is not None else '-':>8}")
+    print("(delta mode keeps the snapshot server-side; the cookie only holds the session ID)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: LLM calls per turn and turn latency, legacy vs stateful sessions
+
+Compares the old run_game_turn flow (fresh AdventureGame + initialize_game() on
+every turn) against GameSessionManager, using a stubbed LLM with fixed latency.
+
+    python benchmarks/bench_turns.py --sessions 5 --turns 20 --latency 0.05
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import AdventureGame
+from llm_backends import create_llm
+from sessions import GameSessionManager
+
+CHARACTER = {
+    "name": "Bench",
+    "attributes": {"strength": 4, "intelligence": 4, "dexterity": 4, "charisma": 4, "luck": 4},
+    "description": "A tireless benchmark runner"
+}
+
+
+def legacy_turn(llm, world_key, game_state_data, user_input):
+    """The pre-session run_game_turn: rebuild and re-initialize the game every turn"""
+    game = AdventureGame(llm=llm)
+    game.select_world(world_key)
+    game.create_character(CHARACTER["name"], CHARACTER["attributes"], CHARACTER["description"])
+    game.initialize_game()
+    game.restore_game(game_state_data)
+    response = game.process_user_action(user_input)
+    return {"response": response, "game_state": game.to_snapshot()["game_state"]}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, llm, latencies, turns):
+    print(f"{name:<10} llm calls/turn: {llm.calls / turns:.2f}  "
+          f"p50: {statistics.median(latencies) * 1000:.1f} ms  "
+          f"p95: {percentile(latencies, 95) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub LLM latency in seconds")
+    parser.add_argument("--world", default="fantasy")
+    args = parser.parse_args()
+
+    total_turns = args.sessions * args.turns
+
+    # Legacy: every turn rebuilds the game from the payload
+    llm = create_llm("fake", latency=args.latency)
+    latencies = []
+    intro_calls = 0
+    for _ in range(args.sessions):
+        game = AdventureGame(llm=llm)
+        game.select_world(args.world)
+        game.create_character(CHARACTER["name"], CHARACTER["attributes"], CHARACTER["description"])
+        game.initialize_game()
+        intro_calls += 1
+        state = game.to_snapshot()["game_state"]
+        for turn in range(args.turns):
+            t0 = time.perf_counter()
+            state = legacy_turn(llm, args.world, state, f"Action {turn}")["game_state"]
+            latencies.append(time.perf_counter() - t0)
+    llm.calls -= intro_calls
+    report("legacy", llm, latencies, total_turns)
+
+    # Stateful: live games are kept in the session manager
+    llm = create_llm("fake", latency=args.latency)
+    sessions = GameSessionManager(llm_factory=lambda: llm)
+    latencies = []
+    intro_calls = 0
+    for session in range(args.sessions):
+        session_id = f"bench-{session}"
+        state = sessions.start_game(session_id, args.world, CHARACTER["name"],
+                                    CHARACTER["attributes"], CHARACTER["description"])["game_state"]
+        intro_calls += 1
+        for turn in range(args.turns):
+            t0 = time.perf_counter()
+            state = sessions.run_turn(session_id, args.world, CHARACTER, state, f"Action {turn}")["game_state"]
+            latencies.append(time.perf_counter() - t0)
+    llm.calls -= intro_calls
+    report("stateful", llm, latencies, total_turns)
+    print(f"session hits: {sessions.stats['hits']}  restores: {sessions.stats['restores']}")
+
+
+if __name__ == "__main__":
+    main()
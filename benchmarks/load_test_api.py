@@ -0,0 +1,104 @@
+"""
+Load test: concurrent game sessions against the React backend
+
+Starts N sessions (create character + init) and then has each play K actions
+concurrently against a running server, reporting turn throughput and latency.
+Run the server with the fake LLM so the numbers measure the server, not Gemini:
+
+    cd react-adventure-game
+    LLM_BACKEND=fake FAKE_LLM_LATENCY=0.5 gunicorn -w 4 -b :5000 api:app           # sync Flask
+    LLM_BACKEND=fake FAKE_LLM_LATENCY=0.5 hypercorn -w 1 -b :5000 async_api:app    # async Quart
+
+    python benchmarks/load_test_api.py --url http://localhost:5000 --sessions 50 --actions 5
+
+To compare the two servers, run them on different ports with the same number of
+workers and pass both as label=url; each is loaded in turn and reported side by side:
+
+    LLM_BACKEND=fake FAKE_LLM_LATENCY=0.5 gunicorn -w 1 --threads 8 -b :5000 api:app
+    LLM_BACKEND=fake FAKE_LLM_LATENCY=0.5 hypercorn -w 1 -b :5001 async_api:app
+
+    python benchmarks/load_test_api.py --url sync=http://localhost:5000 async=http://localhost:5001
+"""
+
+import json
+import time
+import uuid
+import argparse
+import statistics
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def post(url, payload):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return json.loads(response.read())
+
+
+def start_session(base_url, world):
+    session_id = uuid.uuid4().hex
+    post(f"{base_url}/api/character/create", {
+        "sessionId": session_id,
+        "worldKey": world,
+        "name": "Loadtester",
+        "attributes": {"strength": 4, "intelligence": 4, "dexterity": 4, "charisma": 4, "luck": 4},
+        "description": "A tireless load tester"
+    })
+    post(f"{base_url}/api/game/init", {"sessionId": session_id})
+    return session_id
+
+
+def play(base_url, session_id, actions):
+    """Play a session's actions in order, returning each turn's latency"""
+    latencies = []
+    for turn in range(actions):
+        t0 = time.perf_counter()
+        result = post(f"{base_url}/api/game/action", {"sessionId": session_id, "action": f"Look around ({turn})"})
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load(base_url, sessions, actions, world):
+    """Start `sessions` sessions, play them concurrently; returns (wall time, turn latencies)"""
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        session_ids = list(pool.map(lambda _: start_session(base_url, world), range(sessions)))
+
+        t0 = time.perf_counter()
+        results = list(pool.map(lambda session_id: play(base_url, session_id, actions), session_ids))
+        elapsed = time.perf_counter() - t0
+
+    return elapsed, [latency for session in results for latency in session]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", nargs="+", default=["http://localhost:5000"],
+                        help="Server(s) to load, as url or label=url")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--actions", type=int, default=5)
+    parser.add_argument("--world", default="fantasy")
+    args = parser.parse_args()
+
+    print(f"sessions: {args.sessions}  actions per session: {args.actions}")
+    print(f"{'server':>8} | {'turns':>6} {'wall s':>7} {'turns/s':>8} | {'p50 ms':>7} {'p95 ms':>7}")
+    for target in args.url:
+        label, _, base_url = target.rpartition("=")
+        elapsed, latencies = load(base_url, args.sessions, args.actions, args.world)
+        print(f"{label or base_url:>8} | {len(latencies):>6} {elapsed:>7.2f} {len(latencies) / elapsed:>8.1f} | "
+              f"{statistics.median(latencies) * 1000:>7.0f} {percentile(latencies, 95) * 1000:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
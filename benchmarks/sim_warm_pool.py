@@ -0,0 +1,207 @@
+"""
+Simulation: cold-start rate vs idle cost for warm-pool policies
+
+Replays a day of session arrivals against WarmPoolScheduler and a simple model of
+Modal's autoscaler (containers take a fixed time to boot, serve one call at a time
+and are reaped after the scaledown window unless the minimum keeps them). Each
+session spends some time in character creation, then calls the game and image
+functions for its intro and every turn. For each policy it reports how many calls
+(and how many intros) hit a cold container, how long they waited, and the idle
+container-hours paid for.
+
+    python benchmarks/sim_warm_pool.py --sessions 300
+    python benchmarks/sim_warm_pool.py --trace arrivals.txt   # one arrival (seconds into the day) per line
+"""
+
+import os
+import sys
+import heapq
+import random
+import argparse
+import statistics
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from warm_pool import WarmPoolConfig, WarmPoolScheduler
+
+DAY = 24 * 3600
+
+# Relative session arrivals per hour of day: quiet nights, busy evenings
+HOURLY_WEIGHTS = [1, 1, 1, 1, 1, 1, 2, 3, 4, 4, 4, 5, 6, 5, 5, 5, 6, 8, 10, 12, 12, 10, 6, 3]
+
+# cold start and service time in seconds, cost per container-hour in dollars
+FUNCTIONS = {
+    "game": {"cold_start": 8, "service": 3, "cost_per_hour": 0.2},
+    "image": {"cold_start": 90, "service": 5, "cost_per_hour": 31.6}
+}
+
+POLICIES = {
+    "on-demand": {"min_containers": 0, "prewarm": False},
+    "prewarm": {"min_containers": 0, "prewarm": True},
+    "min 1": {"min_containers": 1, "prewarm": False},
+    "evening + prewarm": {
+        "min_containers": 0,
+        "prewarm": True,
+        "schedule": [{"start": 17, "end": 23, "min_containers": 2}]
+    }
+}
+
+
+class ContainerPool:
+    """Containers of one function, following Modal's scale-up / scale-down behaviour"""
+
+    def __init__(self, name, config, cold_start, service):
+        self.name = name
+        self.config = config
+        self.cold_start = cold_start
+        self.service = service
+        self.containers = []  # dicts: launched, ready, busy_until, claimed
+        self.alive_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.calls = 0
+        self.cold_calls = 0
+        self.intros = 0
+        self.cold_intros = 0
+        self.waits = []
+
+    def _launch(self, now):
+        container = {"launched": now, "ready": now + self.cold_start, "busy_until": now + self.cold_start,
+                     "claimed": False}
+        self.containers.append(container)
+        return container
+
+    def reap(self, now):
+        """Drop containers idle past the scaledown window, down to the scheduled minimum"""
+        minimum = self.config.scheduled_minimum(now)
+        idle_since = sorted(self.containers, key=lambda c: c["busy_until"])
+        for container in idle_since:
+            if len(self.containers) <= minimum:
+                break
+            reaped_at = container["busy_until"] + self.config.scaledown_window
+            if reaped_at <= now:
+                self.alive_seconds += reaped_at - container["launched"]
+                self.containers.remove(container)
+
+        while len(self.containers) < minimum:
+            self._launch(now)
+
+    def call(self, now, counted=True, intro=False):
+        """Serve a call arriving at `now`; a ping (counted=False) only wakes a container"""
+        self.reap(now)
+        service = self.service if counted else 0
+
+        idle = [c for c in self.containers if c["busy_until"] <= now]
+        booting = [c for c in self.containers if c["ready"] > now and not c["claimed"]]
+        if idle:
+            container, start = idle[0], now
+        elif booting:
+            container = min(booting, key=lambda c: c["ready"])
+            start = container["ready"]
+        else:
+            if not counted and self.containers:
+                return  # everything is busy, so the pool is warm already
+            container = self._launch(now)
+            start = container["ready"]
+
+        container["claimed"] = counted or container["claimed"]
+        container["busy_until"] = start + service
+        if not counted:
+            return
+
+        self.busy_seconds += service
+        self.calls += 1
+        self.waits.append(start - now)
+        self.intros += intro
+        if start > now:
+            self.cold_calls += 1
+            self.cold_intros += intro
+
+    def finish(self, end):
+        for container in self.containers:
+            self.alive_seconds += max(end, container["busy_until"]) - container["launched"]
+        self.containers = []
+
+
+def synthetic_trace(sessions, seed):
+    rng = random.Random(seed)
+    hours = rng.choices(range(24), weights=HOURLY_WEIGHTS, k=sessions)
+    return sorted(hour * 3600 + rng.uniform(0, 3600) for hour in hours)
+
+
+def session_calls(arrival, rng):
+    """Times at which one session calls the game and image functions"""
+    t = arrival + rng.uniform(20, 90)  # character creation
+    calls = []
+    for _ in range(rng.randint(3, 30)):
+        calls.append(t)
+        t += rng.uniform(15, 60)  # reading and choosing
+    return calls
+
+
+def simulate(policy, arrivals, seed):
+    configs = {
+        name: WarmPoolConfig(name, scaledown_window=300 if name == "game" else 600, **policy)
+        for name in FUNCTIONS
+    }
+    scheduler = WarmPoolScheduler(configs)
+    pools = {
+        name: ContainerPool(name, configs[name], spec["cold_start"], spec["service"])
+        for name, spec in FUNCTIONS.items()
+    }
+
+    rng = random.Random(seed)
+    events = []
+    for arrival in arrivals:
+        heapq.heappush(events, (arrival, "arrive", None))
+        for turn, t in enumerate(session_calls(arrival, rng)):
+            for name in FUNCTIONS:
+                heapq.heappush(events, (t, "call", (name, turn == 0)))
+    for minute in range(0, DAY, 60):
+        heapq.heappush(events, (minute, "tick", None))
+
+    while events:
+        now, kind, call = heapq.heappop(events)
+        if kind == "tick":
+            for pool in pools.values():
+                pool.reap(now)
+        elif kind == "arrive":
+            for woken in scheduler.prewarm(now=now):
+                pools[woken].call(now, counted=False)
+        else:
+            name, intro = call
+            pools[name].call(now, intro=intro)
+            scheduler.note_activity(name, now=now)
+
+    for pool in pools.values():
+        pool.finish(DAY)
+    return pools
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300, help="Sessions in the synthetic day")
+    parser.add_argument("--trace", help="File of session arrivals, in seconds into the day, one per line")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace) as f:
+            arrivals = sorted(float(line) for line in f if line.strip())
+    else:
+        arrivals = synthetic_trace(args.sessions, args.seed)
+    print(f"{len(arrivals)} sessions over 24h\n")
+
+    print(f"{'policy':<18} {'function':<8} | {'calls':>6} {'cold %':>7} {'intro cold %':>13} "
+          f"{'mean wait s':>12} | {'idle h':>7} {'idle $':>8}")
+    for label, policy in POLICIES.items():
+        pools = simulate(policy, arrivals, args.seed)
+        for name, pool in pools.items():
+            idle_hours = (pool.alive_seconds - pool.busy_seconds) / 3600
+            print(f"{label:<18} {name:<8} | {pool.calls:>6} {pool.cold_calls / pool.calls:>7.1%} "
+                  f"{pool.cold_intros / pool.intros:>13.1%} {statistics.mean(pool.waits):>12.2f} | "
+                  f"{idle_hours:>7.1f} {idle_hours * FUNCTIONS[name]['cost_per_hour']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
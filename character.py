@@ -38,6 +38,35 @@ class Character:
         
         return None
     
+    def to_snapshot(self):
+        return {
+            "name": self.name,
+            "attributes": dict(self.attributes),
+            "description": self.description,
+            "level": self.level,
+            "experience": self.experience,
+            "skills": dict(self.skills)
+        }
+    
+    @classmethod
+    def from_snapshot(cls, data):
+        character = cls(data["name"], dict(data["attributes"]), data["description"])
+        character.level = data.get("level", 1)
+        character.experience = data.get("experience", 0)
+        character.skills = dict(data.get("skills") or {})
+        return character
+    
+    def cache_key(self):
+        """Hashable value that changes whenever get_description() would"""
+        return (
+            self.name,
+            self.description,
+            self.level,
+            self.experience,
+            tuple(sorted(self.attributes.items())),
+            tuple(sorted(self.skills.items()))
+        )
+    
     def get_description(self):
         """Get a full description of the character"""
         attribute_desc = ", ".join([f"{attr.capitalize()}: {val}" for attr, val in self.attributes.items()])
@@ -0,0 +1,270 @@
+"""
+Persisted torch.compile artifacts for the FLUX pipelines
+
+Compiling the transformer and VAE decoder with max-autotune takes up to 20 minutes,
+so it should happen once, not in every container. Inductor and Triton keep their
+caches on disk; here each compile configuration (torch/Triton/CUDA version, GPU,
+variant and input shapes) gets its own cache directory on a Modal Volume.
+
+Only the build step (`build` mode, see build_compile_artifacts in flux_backend.py)
+writes there: it compiles into a staging directory, writes the manifest and then
+renames the directory into place, so a reader never sees a half-written cache and
+concurrent builds cannot delete each other's work. Serving containers treat the
+artifacts as read-only, loading them from a local copy:
+
+    blocking    load the compiled pipeline before serving
+    background  serve eagerly straight away; load the compiled pipeline in a
+                thread and switch to it once it is warm
+    eager       never compile
+
+Without valid artifacts for their configuration, serving containers stay eager
+rather than running a max-autotune compile on the GPU they serve from.
+
+torch is only imported inside the functions that need it.
+"""
+
+import os
+import copy
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+import threading
+
+COMPILE_MODES = ("eager", "background", "blocking", "build")
+
+MANIFEST_VERSION = 1
+
+
+def environment_fields():
+    """Versions and hardware that compiled kernels are only valid for"""
+    import torch
+
+    try:
+        import triton
+        triton_version = triton.__version__
+    except ImportError:
+        triton_version = None
+
+    fields = {
+        "torch": torch.__version__,
+        "cuda": torch.version.cuda,
+        "triton": triton_version,
+        "gpu": None,
+        "capability": None
+    }
+    if torch.cuda.is_available():
+        fields["gpu"] = torch.cuda.get_device_name()
+        fields["capability"] = ".".join(map(str, torch.cuda.get_device_capability()))
+    return fields
+
+
+class CompileArtifacts:
+    """The on-disk Inductor/Triton caches for one compile configuration"""
+
+    def __init__(self, root, variant, batch_sizes, resolutions=((1024, 1024),), mode="max-autotune",
+                 environment=None):
+        self.root = root
+        self.fields = {
+            "manifest_version": MANIFEST_VERSION,
+            "variant": variant,
+            "batch_sizes": sorted(set(batch_sizes)),
+            "resolutions": [list(resolution) for resolution in sorted(set(resolutions))],
+            "mode": mode,
+            **(environment if environment is not None else environment_fields())
+        }
+        digest = hashlib.sha256(json.dumps(self.fields, sort_keys=True).encode("utf-8")).hexdigest()
+        self.key = f"{variant}-{digest[:16]}"
+        self.path = os.path.join(root, self.key)
+        self.manifest_path = os.path.join(self.path, "manifest.json")
+
+    def activate(self, path=None):
+        """Point Inductor and Triton at the cache directories under `path` (default: the stored artifacts)"""
+        for name, env in (("inductor", "TORCHINDUCTOR_CACHE_DIR"), ("triton", "TRITON_CACHE_DIR")):
+            directory = os.path.join(path or self.path, name)
+            os.makedirs(directory, exist_ok=True)
+            os.environ[env] = directory
+        os.environ["TORCHINDUCTOR_FX_GRAPH_CACHE"] = "1"
+        os.environ["TORCHINDUCTOR_AUTOGRAD_CACHE"] = "1"
+
+    def manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_valid(self):
+        """True if a finished compile for exactly this configuration is stored"""
+        manifest = self.manifest()
+        if not manifest or manifest.get("fields") != self.fields:
+            return False
+        inductor_dir = os.path.join(self.path, "inductor")
+        return os.path.isdir(inductor_dir) and any(os.scandir(inductor_dir))
+
+    def local_copy(self):
+        """Copy the stored artifacts to a local directory, so serving never writes to the Volume"""
+        local_path = tempfile.mkdtemp(prefix=f"compile-{self.key}-")
+        shutil.copytree(self.path, local_path, dirs_exist_ok=True)
+        return local_path
+
+    def staging_path(self):
+        """A fresh directory for a build, next to where the artifacts are published"""
+        path = f"{self.path}.build-{uuid.uuid4().hex[:8]}"
+        os.makedirs(path)
+        return path
+
+    def publish(self, staging_path, timings):
+        """Write the manifest into a finished build and rename it into place
+
+        A previous (stale or broken) directory is moved aside first and removed only
+        after the new one is in place.
+        """
+        manifest = {"fields": self.fields, "created_at": time.time(), "timings": timings}
+        with open(os.path.join(staging_path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        previous = None
+        if os.path.exists(self.path):
+            previous = f"{self.path}.old-{uuid.uuid4().hex[:8]}"
+            os.rename(self.path, previous)
+        os.rename(staging_path, self.path)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+
+
+def compile_pipeline(pipe):
+    """A copy of `pipe` with its transformer and VAE decoder compiled, sharing the weights"""
+    import torch
+
+    config = torch._inductor.config
+    config.disable_progress = False  # show progress bar
+    config.conv_1x1_as_mm = True  # treat 1x1 convolutions as matrix muls
+    # adjust autotuning algorithm
+    config.coordinate_descent_tuning = True
+    config.coordinate_descent_check_all_directions = True
+    config.epilogue_fusion = False  # do not fuse pointwise ops into matmuls
+
+    # The eager pipeline keeps serving while this one compiles, so compile copies
+    # of the modules rather than patching the ones it is using
+    vae = copy.copy(pipe.vae)
+    vae.decode = torch.compile(pipe.vae.decode, mode="max-autotune", fullgraph=True)
+    transformer = torch.compile(pipe.transformer, mode="max-autotune", fullgraph=True)
+    return type(pipe)(**{**pipe.components, "transformer": transformer, "vae": vae})
+
+
+def warm_up(pipe, batch_sizes, resolutions, num_inference_steps):
+    """Run each batch size and resolution once, which triggers (or loads) compilation for its shapes"""
+    for height, width in resolutions:
+        for batch_size in sorted(set(batch_sizes)):
+            pipe(
+                ["dummy prompt to trigger torch compilation"] * batch_size,
+                output_type="pil",
+                num_inference_steps=num_inference_steps,
+                height=height,
+                width=width,
+            )
+
+
+class CompiledPipeline:
+    """The pipeline to render with: eager until the compiled one is ready
+
+    `pipe` always holds the pipeline to use for the next call; `metrics()` gives
+    the startup breakdown (weights load, eager optimizations, compile, warm-up).
+    Only `build` mode compiles from scratch and writes artifacts.
+    """
+
+    def __init__(self, pipe, artifacts, num_inference_steps, mode="background", persist=None, timings=None):
+        if mode not in COMPILE_MODES:
+            raise ValueError(f"Unknown compile mode: {mode}")
+        self.pipe = pipe
+        self.artifacts = artifacts
+        self.num_inference_steps = num_inference_steps
+        self.mode = mode
+        self.persist = persist  # called after a build published artifacts, e.g. Volume.commit
+        self.started_at = time.time()
+        self.timings = dict(timings or {})
+        self.status = "eager"
+        self.source = None
+        self.error = None
+        self.thread = None
+
+    def start(self):
+        if self.mode == "eager":
+            return self
+
+        if self.mode == "build":
+            self.source = "fresh"
+        elif self.artifacts.is_valid():
+            self.source = "artifacts"
+        else:
+            self.source = "missing"
+            print(f"🔦 no compile artifacts for {self.artifacts.key}, serving eagerly "
+                  "(run build_compile_artifacts to create them)")
+            return self
+
+        if self.mode in ("blocking", "build"):
+            self._compile()
+        else:
+            self.status = "compiling"
+            self.thread = threading.Thread(target=self._compile, name="pipeline-compile", daemon=True)
+            self.thread.start()
+        return self
+
+    def _compile(self):
+        self.status = "compiling"
+        print(f"🔦 compiling pipeline ({self.source} cache {self.artifacts.key})...")
+        building = self.mode == "build"
+        work_path = None
+        try:
+            t0 = time.time()
+            work_path = self.artifacts.staging_path() if building else self.artifacts.local_copy()
+            self.timings["artifacts_copy_s"] = round(time.time() - t0, 2)
+            self.artifacts.activate(work_path)
+            batch_sizes = self.artifacts.fields["batch_sizes"]
+            resolutions = self.artifacts.fields["resolutions"]
+
+            t0 = time.time()
+            compiled = compile_pipeline(self.pipe)
+            warm_up(compiled, batch_sizes, resolutions, self.num_inference_steps)
+            self.timings["compile_s"] = round(time.time() - t0, 2)
+
+            if building:
+                # A second pass shows the steady-state cost once kernels are loaded
+                t0 = time.time()
+                warm_up(compiled, batch_sizes, resolutions, self.num_inference_steps)
+                self.timings["warmup_s"] = round(time.time() - t0, 2)
+
+                self.artifacts.publish(work_path, self.timings)
+                work_path = None
+                if self.persist:
+                    self.persist()
+
+            self.pipe = compiled
+            self.status = "compiled"
+            self.timings["compiled_ready_s"] = round(time.time() - self.started_at, 2)
+            print(f"🔦 finished torch compilation in {self.timings['compile_s']}s")
+        except Exception as e:
+            # Keep serving eagerly; the stored artifacts are left to the next build
+            print(f"Error compiling pipeline, staying in eager mode: {e}")
+            self.status = "failed"
+            self.error = str(e)
+            if building and work_path:
+                shutil.rmtree(work_path, ignore_errors=True)
+
+    def wait(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+        return self.status
+
+    def metrics(self):
+        return {
+            "mode": self.mode,
+            "status": self.status,
+            "source": self.source,
+            "artifact_key": self.artifacts.key,
+            "error": self.error,
+            "timings": dict(self.timings)
+        }
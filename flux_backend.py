@@ -1,8 +1,13 @@
 import time
-from io import BytesIO
+import queue
 from pathlib import Path
 import os
 import modal
+from batching import DynamicBatcher, render_batch
+from warm_pool import load_warm_pool_config
+from compile_cache import CompileArtifacts, CompiledPipeline
+from quality_tiers import TIERS, DEFAULT_TIER, tier_settings, resolutions
+from latent_preview import LatentPreviews
 
 cuda_version = "12.4.0"  # should be no greater than host CUDA version
 flavor = "devel"  # includes full CUDA toolkit
@@ -48,10 +53,14 @@ flux_image = flux_image.env(
 
     }
 
-)
+).add_local_python_source("batching", "warm_pool", "compile_cache", "quality_tiers", "latent_preview")
 
 app = modal.App("adventure-image-gen", image=flux_image)
 
+# Compiled kernels per torch version / GPU / shape, see compile_cache.py
+compile_volume = modal.Volume.from_name("flux-compile-cache", create_if_missing=True)
+COMPILE_CACHE_DIR = "/compile-cache"
+
 with flux_image.imports():
     import torch
     from diffusers import FluxPipeline
@@ -59,11 +68,25 @@ with flux_image.imports():
 
 MINUTES = 300  # seconds
 VARIANT = "dev"  # or "dev", but note [dev] requires you to accept terms and conditions on HF
-NUM_INFERENCE_STEPS = 20  # use ~50 for [dev], smaller for [schnell]
+NUM_INFERENCE_STEPS = tier_settings(DEFAULT_TIER, VARIANT)[2]  # per tier, see quality_tiers.py
+
+# Prompts arriving within MAX_BATCH_WAIT seconds of each other are rendered together
+MAX_BATCH_SIZE = int(os.environ.get("FLUX_MAX_BATCH_SIZE", "4"))
+MAX_BATCH_WAIT = float(os.environ.get("FLUX_MAX_BATCH_WAIT", "0.05"))
+
+# eager, background (serve eagerly until the compiled pipeline is warm) or blocking;
+# both compiled modes only load artifacts made by build_compile_artifacts
+COMPILE_MODE = os.environ.get("FLUX_COMPILE", "background")
+
+# Progressive renders send a latent preview every PREVIEW_EVERY steps, as long as
+# making previews stays under PREVIEW_MAX_OVERHEAD of the render time
+PREVIEW_EVERY = int(os.environ.get("FLUX_PREVIEW_EVERY", "5"))
+PREVIEW_MAX_OVERHEAD = float(os.environ.get("FLUX_PREVIEW_MAX_OVERHEAD", "0.05"))
 
 @app.cls(
     gpu="H100:8",  # fastest GPU on Modal
-    # scaledown_window=20 * MINUTES,
+    # idle containers are kept this long; see warm_pool.py for minimums and pre-warming
+    scaledown_window=load_warm_pool_config()["image"].scaledown_window,
     timeout=5 * MINUTES,  # leave plenty of time for compilation
     volumes={  # add Volumes to store serializable compilation artifacts, see section on torch.compile below
         "/cache": modal.Volume.from_name(
@@ -76,34 +99,97 @@ NUM_INFERENCE_STEPS = 20  # use ~50 for [dev], smaller for [schnell]
         "/root/.inductor-cache": modal.Volume.from_name(
             "inductor-cache", create_if_missing=True
         ),
+        COMPILE_CACHE_DIR: compile_volume,
     },
 )
+@modal.concurrent(max_inputs=MAX_BATCH_SIZE * 2)  # let requests queue up in the batcher
 class Model:
-    compile: int = (  # see section on torch.compile below for details
+    compile: int = (  # 1 builds and publishes compile artifacts; 0 uses COMPILE_MODE
         modal.parameter(default=0)
     )
 
     @modal.enter()
     def enter(self):
+        t0 = time.time()
         pipe = FluxPipeline.from_pretrained(
             f"black-forest-labs/FLUX.1-{VARIANT}", torch_dtype=torch.bfloat16
         ).to("cuda")  # move model to GPU
-        self.pipe = optimize(pipe, compile=bool(self.compile))
+        weights_load_s = time.time() - t0
+
+        t0 = time.time()
+        pipe = optimize(pipe)
+        self.compiled = CompiledPipeline(
+            pipe,
+            CompileArtifacts(COMPILE_CACHE_DIR, VARIANT, batch_sizes=(1, MAX_BATCH_SIZE), resolutions=resolutions()),
+            NUM_INFERENCE_STEPS,
+            mode="build" if self.compile else COMPILE_MODE,
+            persist=compile_volume.commit,
+            timings={"weights_load_s": round(weights_load_s, 2), "optimize_s": round(time.time() - t0, 2)},
+        ).start()
+        # Only prompts of the same tier (resolution and steps) can share a batch;
+        # each item is (prompt, preview subscriber or None)
+        self.batchers = {
+            tier: DynamicBatcher(
+                lambda items, tier=tier: self.render(items, tier),
+                max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_BATCH_WAIT
+            )
+            for tier in TIERS
+        }
+        self.preview_stats = {"renders": 0, "render_seconds": 0.0, "preview_seconds": 0.0,
+                              "sent": 0, "skipped": 0}
+
+    def render(self, items, tier=DEFAULT_TIER):
+        width, height, steps = tier_settings(tier, VARIANT)
+        prompts = [prompt for prompt, _ in items]
+        subscribers = [subscriber for _, subscriber in items]
+        previews = None
+        if any(subscribers):
+            previews = LatentPreviews(subscribers, height, width, steps, max_overhead=PREVIEW_MAX_OVERHEAD)
+
+        print(f"🎨 generating {len(prompts)} {tier} image(s) ({self.compiled.status})...")
+        t0 = time.perf_counter()
+        images = render_batch(self.compiled.pipe, prompts, steps, width=width, height=height, callback=previews)
+
+        if previews is not None:
+            stats = self.preview_stats
+            stats["renders"] += 1
+            stats["render_seconds"] += time.perf_counter() - t0
+            stats["preview_seconds"] += previews.stats["preview_seconds"]
+            stats["sent"] += previews.stats["sent"]
+            stats["skipped"] += previews.stats["skipped"]
+        return images
 
     @modal.method()
-    def inference(self, prompt: str) -> bytes:
-        print("🎨 generating image...")
-        out = self.pipe(
-            prompt,
-            output_type="pil",
-            num_inference_steps=NUM_INFERENCE_STEPS,
-        ).images[0]
-
-        byte_stream = BytesIO()
-        out.save(byte_stream, format="JPEG")
-        return byte_stream.getvalue()
-
-def optimize(pipe, compile=True):
+    def inference(self, prompt: str, tier: str = DEFAULT_TIER) -> bytes:
+        return self.batchers[tier]((prompt, None))
+
+    @modal.method()
+    def inference_progressive(self, prompt: str, tier: str = DEFAULT_TIER, preview_every: int = PREVIEW_EVERY):
+        """Yield {"kind": "preview", ...} frames while rendering, then {"kind": "final", "image": bytes}"""
+        frames = queue.Queue()
+        future = self.batchers[tier].submit((prompt, (max(1, preview_every), frames.put)))
+        while not (future.done() and frames.empty()):
+            try:
+                yield frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        yield {"kind": "final", "image": future.result()}
+
+    @modal.method()
+    def ping(self) -> bool:
+        """No-op call used to start a container (and load FLUX) before it is needed"""
+        return True
+
+    @modal.method()
+    def startup_metrics(self) -> dict:
+        """Startup breakdown and compile status of this container"""
+        stats = self.preview_stats
+        overhead = stats["preview_seconds"] / stats["render_seconds"] if stats["render_seconds"] else None
+        return {**self.compiled.metrics(),
+                "batchers": {tier: batcher.metrics() for tier, batcher in self.batchers.items()},
+                "previews": {**stats, "overhead": round(overhead, 4) if overhead is not None else None}}
+
+def optimize(pipe):
     # fuse QKV projections in Transformer and VAE
     pipe.transformer.fuse_qkv_projections()
     pipe.vae.fuse_qkv_projections()
@@ -112,42 +198,20 @@ def optimize(pipe, compile=True):
     pipe.transformer.to(memory_format=torch.channels_last)
     pipe.vae.to(memory_format=torch.channels_last)
 
-    if not compile:
-        return pipe
-
-    # set torch compile flags
-    config = torch._inductor.config
-    config.disable_progress = False  # show progress bar
-    config.conv_1x1_as_mm = True  # treat 1x1 convolutions as matrix muls
-    # adjust autotuning algorithm
-    config.coordinate_descent_tuning = True
-    config.coordinate_descent_check_all_directions = True
-    config.epilogue_fusion = False  # do not fuse pointwise ops into matmuls
-
-    # tag the compute-intensive modules, the Transformer and VAE decoder, for compilation
-    pipe.transformer = torch.compile(
-        pipe.transformer, mode="max-autotune", fullgraph=True
-    )
-    pipe.vae.decode = torch.compile(
-        pipe.vae.decode, mode="max-autotune", fullgraph=True
-    )
-
-    # trigger torch compilation
-    print("🔦 running torch compiliation (may take up to 20 minutes)...")
-
-    pipe(
-        "dummy prompt to trigger torch compilation",
-        output_type="pil",
-        num_inference_steps=NUM_INFERENCE_STEPS,  # use ~50 for [dev], smaller for [schnell]
-    ).images[0]
-
-    print("🔦 finished torch compilation")
-
+    # torch.compile is handled by compile_cache.CompiledPipeline
     return pipe
 
 
 # def generate
 
+@app.function(timeout=5 * MINUTES)
+def build_compile_artifacts():
+    """One-off build step (`modal run flux_backend.py::build_compile_artifacts`):
+    compile in a GPU container and store the artifacts on the volume"""
+    metrics = Model(compile=1).startup_metrics.remote()
+    print(f"🔦 compile artifacts {metrics['artifact_key']} ({metrics['source']}): {metrics['timings']}")
+    return metrics
+
 @app.local_entrypoint()
 def image_gen_main(
     prompt: str = "a computer screen showing ASCII terminal art of the"
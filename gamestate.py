@@ -1,5 +1,11 @@
-from typing import List, Dict, Any
-import re
+import asyncio
+from typing import List, Dict, Any, Callable, Optional, Awaitable
+from collections import deque
+from contextlib import contextmanager
+from response_parser import parse_response
+from mutations import StateMutations, from_state_changes
+from inventory import Inventory
+from quests import QuestLog
 
 class Location:
     def __init__(self, region: str, area: str, description: str = ""):
@@ -9,6 +15,13 @@ class Location:
     
     def __str__(self):
         return f"{self.region}: {self.area}"
+    
+    def to_snapshot(self) -> Dict[str, Any]:
+        return {"region": self.region, "area": self.area, "description": self.description}
+    
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> "Location":
+        return cls(data["region"], data["area"], data.get("description", ""))
 
 class NPC:
     def __init__(self, name: str, description: str, dialogue: Dict[str, str] = None):
@@ -19,14 +32,161 @@ class NPC:
     
     def __str__(self):
         return f"{self.name} - {self.description[:50]}..."
+    
+    def to_snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "dialogue": self.dialogue,
+            "disposition": self.disposition
+        }
+    
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> "NPC":
+        npc = cls(data["name"], data.get("description", ""), data.get("dialogue"))
+        npc.disposition = data.get("disposition", 50)
+        return npc
+
+def summarize_locally(summary: str, entries: List[str], max_chars: int) -> str:
+    """Fold history entries into a summary without calling an LLM
+    
+    Keeps the player's action and the first sentence of each storyteller response,
+    dropping the oldest sentences once the summary grows past max_chars.
+    """
+    notes = []
+    for entry in entries:
+        if entry.startswith("PLAYER: "):
+            notes.append(f"You: {entry[len('PLAYER: '):].strip()}.")
+        else:
+            text = entry[len("STORYTELLER: "):] if entry.startswith("STORYTELLER: ") else entry
+            description = " ".join((parse_response(text).description or text).split())
+            first_sentence = description.split(". ")[0].rstrip(".")
+            if first_sentence:
+                notes.append(f"{first_sentence}.")
+    
+    summary = " ".join(part for part in [summary] + notes if part)
+    if len(summary) > max_chars:
+        summary = summary[-max_chars:]
+        # Start on a sentence boundary rather than mid-word
+        boundary = summary.find(". ")
+        if boundary != -1:
+            summary = summary[boundary + 2:]
+    return summary
+
+class ConversationMemory:
+    """Bounded game history: a ring buffer of recent entries plus a rolling summary
+    
+    When the buffer overflows, the oldest half of it is folded into the summary in one
+    summarizer call, so both the prompt context and the serialized state stay the same
+    size no matter how long the game runs. Async callers defer compaction for the turn
+    and then await acompact(), so an LLM summarizer does not block the event loop.
+    """
+    def __init__(self, max_entries: int = 12, max_summary_chars: int = 1200,
+                 summarizer: Optional[Callable[[str, List[str], int], str]] = None,
+                 asummarizer: Optional[Callable[[str, List[str], int], Awaitable[str]]] = None):
+        self.max_entries = max_entries
+        self.max_summary_chars = max_summary_chars
+        self.summarizer = summarizer or summarize_locally
+        self.asummarizer = asummarizer
+        self.recent = deque()
+        self.summary = ""
+        self.total_entries = 0
+        self.defer_compaction = False
+    
+    def add(self, entry: str):
+        """Add an entry, compacting the oldest ones into the summary on overflow"""
+        self.recent.append(entry)
+        self.total_entries += 1
+        if len(self.recent) > self.max_entries and not self.defer_compaction:
+            self.compact()
+    
+    def _evict(self):
+        evict_count = len(self.recent) - self.max_entries // 2
+        return [self.recent.popleft() for _ in range(evict_count)]
+    
+    def _set_summary(self, summary):
+        # Summarizers may overshoot; the summary must stay bounded
+        self.summary = summary[-self.max_summary_chars:]
+    
+    def compact(self, summarizer=None):
+        """Fold the oldest half of the buffer into the summary"""
+        evicted = self._evict()
+        try:
+            summary = (summarizer or self.summarizer)(self.summary, evicted, self.max_summary_chars)
+        except Exception as e:
+            print(f"Error summarizing history, using local summary: {e}")
+            summary = summarize_locally(self.summary, evicted, self.max_summary_chars)
+        self._set_summary(summary)
+    
+    async def acompact(self):
+        """Async variant of compact(), run only if the buffer has overflowed"""
+        if len(self.recent) <= self.max_entries:
+            return
+        evicted = self._evict()
+        try:
+            if self.asummarizer is not None:
+                summary = await self.asummarizer(self.summary, evicted, self.max_summary_chars)
+            elif self.summarizer is summarize_locally:
+                summary = summarize_locally(self.summary, evicted, self.max_summary_chars)
+            else:
+                summary = await asyncio.to_thread(self.summarizer, self.summary, evicted, self.max_summary_chars)
+        except Exception as e:
+            print(f"Error summarizing history, using local summary: {e}")
+            summary = summarize_locally(self.summary, evicted, self.max_summary_chars)
+        self._set_summary(summary)
+    
+    @contextmanager
+    def deferred(self):
+        """Let the buffer overflow inside the block; the caller compacts afterwards"""
+        previous = self.defer_compaction
+        self.defer_compaction = True
+        try:
+            yield self
+        finally:
+            self.defer_compaction = previous
+    
+    def load(self, entries: List[str], summary: str = "", total_entries: Optional[int] = None):
+        """Replace the memory contents, compacting if there are too many entries
+        
+        Restores never call an LLM, so overflow is folded with the local summarizer.
+        """
+        self.recent = deque()
+        self.summary = summary
+        self.total_entries = 0
+        for entry in entries:
+            self.recent.append(entry)
+            self.total_entries += 1
+            if len(self.recent) > self.max_entries:
+                self.compact(summarize_locally)
+        if total_entries is not None:
+            self.total_entries = max(total_entries, self.total_entries)
+    
+    def get_context(self, count: int = 5, pending: Optional[List[str]] = None) -> str:
+        """Get the summary and most recent entries, formatted for a prompt
+        
+        `pending` entries are included as if they had already been added, without
+        compacting, so a future prompt can be previewed without changing the memory.
+        """
+        entries = list(self.recent) + list(pending or [])
+        if not entries and not self.summary:
+            return "No history yet."
+        
+        lines = []
+        if self.summary:
+            lines.append(f"Summary of earlier events: {self.summary}")
+        lines.extend(entries[-count:])
+        return "\n".join(lines)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"recent": list(self.recent), "summary": self.summary}
 
 class GameState:
     def __init__(self, character, world_setting):
         self.character = character
         self.world_setting = world_setting
-        self.inventory = []
-        self.quest_log = []
-        self.history = []
+        self._inventory = Inventory()
+        self.quest_log = QuestLog()
+        self.memory = ConversationMemory()
         
         # Initialize location based on world setting
         self.initialize_location()
@@ -39,6 +199,10 @@ class GameState:
         self.health = 100
         self.gold = 50
         
+        # Validated, undoable changes with events for subscribers
+        self.mutations = StateMutations(self)
+        self.mutations.subscribe(self._update_quests)
+        
     def initialize_location(self):
         """Set initial location based on world setting"""
         world_type = self.world_setting.world_type
@@ -62,28 +226,33 @@ class GameState:
             self.location = Location("Unknown", "Starting Area", 
                                      "A mysterious place where your adventure begins.")
     
-    def add_to_inventory(self, item):
+    @property
+    def inventory(self):
+        return self._inventory
+    
+    @inventory.setter
+    def inventory(self, items):
+        self._inventory = items if isinstance(items, Inventory) else Inventory(items)
+    
+    def add_to_inventory(self, item, count=1):
         """Add an item to character inventory"""
-        self.inventory.append(item)
+        self.inventory.add(item, count)
     
-    def remove_from_inventory(self, item):
+    def remove_from_inventory(self, item, count=1):
         """Remove an item from character inventory"""
-        if item in self.inventory:
-            self.inventory.remove(item)
-            return True
-        return False
+        return self.inventory.remove(item, count) is not None
     
     def add_quest(self, quest):
-        """Add a new quest to the quest log"""
-        self.quest_log.append(quest)
+        """Add a new quest (a Quest or a dict) to the quest log"""
+        return self.quest_log.add(quest, self)
     
     def complete_quest(self, quest_name):
         """Mark a quest as completed"""
-        for quest in self.quest_log:
-            if quest["name"] == quest_name and not quest["completed"]:
-                quest["completed"] = True
-                return True
-        return False
+        return self.quest_log.complete(quest_name, self)
+    
+    def _update_quests(self, changes):
+        """Re-evaluate the quests waiting on committed state changes"""
+        self.quest_log.handle_changes(changes, self)
     
     def change_location(self, region, area, description=""):
         """Change the current location"""
@@ -105,20 +274,80 @@ class GameState:
         if npc_id in self.npcs:
             npc = self.npcs[npc_id]
             
-            if interaction_type == "talk" and "default" in npc.dialogue:
-                return npc.dialogue["default"]
+            if interaction_type == "talk":
+                self.quest_log.record_talk(npc.name, self)
+                if "default" in npc.dialogue:
+                    return npc.dialogue["default"]
             
             return f"You attempted to {interaction_type} with {npc.name}."
         
         return f"There is no one named {npc_id} here."
     
+    @property
+    def history(self):
+        """The recent history entries still held in memory"""
+        return list(self.memory.recent)
+    
+    @history.setter
+    def history(self, entries):
+        # Replaces the recent entries only; the rolling summary and count are kept
+        self.memory.load(entries, self.memory.summary, self.memory.total_entries)
+    
     def add_to_history(self, entry):
         """Add an entry to the game history"""
-        self.history.append(entry)
+        self.memory.add(entry)
     
-    def get_recent_history(self, count=5):
-        """Get the most recent history entries"""
-        return "\n".join(self.history[-count:]) if self.history else "No history yet."
+    def get_recent_history(self, count=5, pending=None):
+        """Get a summary of earlier events and the most recent history entries"""
+        return self.memory.get_context(count, pending)
+    
+    def to_snapshot(self):
+        """Everything needed to rebuild this state, as plain data"""
+        return {
+            "inventory": self.inventory.to_snapshot(),
+            "location": self.location.to_snapshot(),
+            "health": self.health,
+            "gold": self.gold,
+            "history": self.history,
+            "history_summary": self.memory.summary,
+            "history_entries": self.memory.total_entries,
+            "quest_log": self.quest_log.to_snapshot(),
+            "npcs": {npc_id: npc.to_snapshot() for npc_id, npc in self.npcs.items()},
+            "active_npcs": list(self.active_npcs)
+        }
+    
+    def restore(self, data):
+        """Load a snapshot into this state; missing fields keep their current values"""
+        if data.get("inventory"):
+            self.inventory = Inventory(data["inventory"])
+        
+        if data.get("location"):
+            self.location = Location.from_snapshot(data["location"])
+        
+        if data.get("health") is not None:
+            self.health = data["health"]
+        
+        if data.get("gold") is not None:
+            self.gold = data["gold"]
+        
+        if data.get("history") or data.get("history_summary"):
+            self.memory.load(list(data.get("history") or []), data.get("history_summary") or "",
+                             data.get("history_entries"))
+        
+        if data.get("quest_log"):
+            self.quest_log = QuestLog.from_snapshot(data["quest_log"], self)
+        
+        if data.get("npcs"):
+            self.npcs = {npc_id: NPC.from_snapshot(npc) for npc_id, npc in data["npcs"].items()}
+        
+        if data.get("active_npcs"):
+            self.active_npcs = list(data["active_npcs"])
+        
+        return self
+    
+    @classmethod
+    def from_snapshot(cls, data, character, world_setting):
+        return cls(character, world_setting).restore(data)
     
     def get_state_description(self):
         """Get a description of the current game state"""
@@ -129,10 +358,10 @@ class GameState:
         Health: {self.health}/100 ({health_status})
         Gold: {self.gold}
         
-        Inventory ({len(self.inventory)} items): {', '.join(self.inventory) if self.inventory else 'Empty'}
+        Inventory ({self.inventory.total} items): {self.inventory.summary() or 'Empty'}
         
         Active Quests:
-        {self._format_quests()}
+        {self.quest_log.prompt_block()}
         
         NPCs Present:
         {', '.join([npc for npc in self.active_npcs]) if self.active_npcs else 'None'}
@@ -140,39 +369,16 @@ class GameState:
         
         return state
     
-    def _format_quests(self):
-        """Format quest log for display"""
-        if not self.quest_log:
-            return "No active quests."
-        
-        quest_strings = []
-        for quest in self.quest_log:
-            status = "✓" if quest.get("completed", False) else "⋯"
-            quest_strings.append(f"{status} {quest['name']}")
-        
-        return "\n".join(quest_strings)
-    
     def parse_state_changes(self, ai_response):
         """
-        Parse the AI response to extract any state changes
-        This is a simple implementation that would be expanded based on game needs
+        Parse the AI response to extract any state changes and apply them
+        """
+        self.apply_state_changes(parse_response(ai_response).state_changes)
+    
+    def apply_state_changes(self, state_changes):
+        """Apply structured state changes produced by the response parser
+        
+        The storyteller's changes are applied as one transaction; invalid ones (unknown
+        locations, items that are not carried, gold that is not there) are skipped.
         """
-        # Example: Detecting location changes
-        location_match = re.search(r"LOCATION_CHANGE: ([^:]+):([^\n]+)", ai_response)
-        if location_match:
-            region, area = location_match.groups()
-            self.change_location(region.strip(), area.strip())
-        
-        # Example: Detecting inventory additions
-        item_add_match = re.search(r"INVENTORY_ADD: ([^\n]+)", ai_response)
-        if item_add_match:
-            item = item_add_match.group(1).strip()
-            self.add_to_inventory(item)
-        
-        # Example: Detecting health changes
-        health_match = re.search(r"HEALTH_CHANGE: ([+-]\d+)", ai_response)
-        if health_match:
-            health_change = int(health_match.group(1))
-            self.health = max(0, min(100, self.health + health_change))
-        
-        # More parsing could be added for other state changes
+        return self.mutations.apply(from_state_changes(state_changes), strict=False, source="storyteller")
@@ -3,14 +3,29 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, StringVar, IntVar, messagebox, Toplevel
 from PIL import Image, ImageTk
 import threading
-import time
+from io import BytesIO
 from dotenv import load_dotenv
 from game import AdventureGame
+from response_parser import parse_response
 import ttkbootstrap as tb  # For modern UI
 
 # Load environment variables
 load_dotenv()
 
+# Render scene images with the deployed FLUX app, showing latent previews as they arrive
+SCENE_IMAGES = os.environ.get("GUI_SCENE_IMAGES", "0") == "1"
+IMAGE_APP_NAME = "adventure-image-gen"
+PREVIEW_EVERY = int(os.environ.get("GUI_PREVIEW_EVERY", "5"))
+
+# Size of the game view's image area
+SCENE_IMAGE_SIZE = (800, 400)
+
+
+def load_scene_image(image_path=None, image_bytes=None):
+    """Decode and resize an image for the game view; slow, so call it off the UI thread"""
+    img = Image.open(BytesIO(image_bytes) if image_bytes else image_path)
+    return img.resize(SCENE_IMAGE_SIZE, Image.LANCZOS)
+
 class AdventureGameGUI:
     def __init__(self, root):
         self.root = root
@@ -22,6 +37,8 @@ class AdventureGameGUI:
         
         self.game = None
         self.story_history = []  # Store full story history
+        self._streaming_started = False  # Whether the current response has started streaming
+        self._scene_render = 0  # Bumped per scene so stale frames are dropped
         self.setup_ui()
         
     def setup_ui(self):
@@ -401,7 +418,7 @@ class AdventureGameGUI:
         if not inventory:
             return "Your inventory is empty."
         
-        return "\n".join([f"• {item}" for item in inventory])
+        return "\n".join([f"• {item}" for item in inventory.items()])
     
     def get_help_content(self):
         """Get help content for popup"""
@@ -622,18 +639,17 @@ You can also click on action buttons or type your own custom action."""
         # Store in history
         self.story_history.append(initial_story)
         
-        # Load placeholder image for now
-        # In the future, this would generate an image based on the story
         self.update_game_image()
+        self.render_scene_image(initial_story)
     
     def update_story_text(self, story_text, stream=False):
         """Update the story text area with the latest narrative"""
         # Extract description part
-        if "DESCRIPTION:" in story_text:
-            description = story_text.split("DESCRIPTION:")[1].split("OPTIONS:")[0].strip()
-        else:
-            description = story_text
-            
+        description = parse_response(story_text).description or story_text
+        self._render_description(description, stream)
+    
+    def _render_description(self, description, stream=False):
+        """Render a description in the story text area, applying formatting markers"""
         # Clear previous content
         self.story_text.config(state=tk.NORMAL)
         self.story_text.delete(1.0, tk.END)
@@ -719,29 +735,31 @@ You can also click on action buttons or type your own custom action."""
         self.story_text.config(state=tk.DISABLED)
     
     def _insert_with_delay(self, text, tag=None):
-        """Insert text with a delay for streaming effect, applying tag if specified"""
+        """Insert a formatted run of text, applying tag if specified"""
         if tag:
             self.story_text.insert(tk.END, text, tag)
         else:
             self.story_text.insert(tk.END, text)
         self.story_text.see(tk.END)
-        self.story_text.update_idletasks()
-        time.sleep(0.01)  # Adjust speed as needed
-
+    
+    def _append_streamed_description(self, text):
+        """Append newly streamed description text to the story area"""
+        self.story_text.config(state=tk.NORMAL)
+        if not self._streaming_started:
+            # First chunk replaces the thinking indicator
+            self.story_text.delete(1.0, tk.END)
+            self._streaming_started = True
+        
+        self.story_text.insert(tk.END, text)
+        self.story_text.see(tk.END)
+        self.story_text.config(state=tk.DISABLED)
+    
     def update_options(self, story_text):
         """Update the option buttons based on available choices"""
-        options = []
-        
-        # Extract options if they exist
-        if "OPTIONS:" in story_text:
-            options_text = story_text.split("OPTIONS:")[1].strip()
-            lines = options_text.split("\n")
-            
-            for line in lines:
-                if line.strip() and any(line.strip().startswith(str(i)) for i in range(1, 4)):  # Only look for options 1-3
-                    option_text = line.strip()[2:].strip()  # Remove number and dot
-                    options.append(option_text)
-        
+        self._set_options(parse_response(story_text).options)
+    
+    def _set_options(self, options):
+        """Show up to three options on the buttons, disabling the unused ones"""
         # Update buttons with options or hide if not available
         for i, button in enumerate(self.option_buttons):
             if i < len(options):
@@ -749,18 +767,23 @@ You can also click on action buttons or type your own custom action."""
             else:
                 button.config(text="", state=tk.DISABLED)
     
-    def update_game_image(self, image_path=None):
-        """Update the game image area with a new image
-        In the future, this would use Modal to generate images"""
-        if image_path and os.path.exists(image_path):
-            try:
-                img = Image.open(image_path)
-                img = img.resize((800, 400), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                self.image_label.config(image=photo)
-                self.image_label.image = photo  # Keep reference
-            except Exception as e:
-                print(f"Error loading image: {e}")
+    def update_game_image(self, image_path=None, image=None):
+        """Update the game image area with an image file, or an image from load_scene_image"""
+        if image is not None:
+            photo = ImageTk.PhotoImage(image)
+            self.image_label.config(image=photo)
+            self.image_label.image = photo  # Keep reference
+        elif image_path and os.path.exists(image_path):
+            # Decode and resize in the background, then show it on the UI thread
+            def load_thread():
+                try:
+                    img = load_scene_image(image_path=image_path)
+                except Exception as e:
+                    print(f"Error loading image: {e}")
+                    return
+                self.root.after(0, lambda: self.update_game_image(image=img))
+            
+            threading.Thread(target=load_thread, daemon=True).start()
         else:
             # Use a placeholder with text
             self.image_label.config(image=self.placeholder_img)
@@ -809,26 +832,70 @@ You can also click on action buttons or type your own custom action."""
             button.config(state=tk.DISABLED)
         
         # Process the action in a separate thread to avoid UI freezing
+        self._streaming_started = False
+        
         def process_thread():
-            # Get response from game
-            response = self.game.process_user_action(action)
+            description_parts = []
+            options = []
+            
+            def on_event(event):
+                # Show narrative text and option buttons as soon as they are parsed
+                if event.kind == "description":
+                    description_parts.append(event.value)
+                    self.root.after(0, lambda text=event.value: self._append_streamed_description(text))
+                elif event.kind == "option":
+                    options.append(event.value["text"])
+                    self.root.after(0, lambda opts=list(options): self._set_options(opts))
+            
+            # Stream the response from the game
+            response = "".join(self.game.stream_user_action(action, on_event=on_event))
             
             # Add to history with formatting
             self.story_history.append(f"> **{action}**\n\n{response}")
             
-            # Update UI on the main thread
-            self.root.after(0, lambda: self.update_story_text(response, stream=True))
-            self.root.after(0, lambda: self.update_options(response))
-            self.root.after(0, lambda: self.update_game_image())  # Future: generate image here
+            # Re-render the finished description with its formatting applied
+            description = "".join(description_parts) or response
+            self.root.after(0, lambda: self._render_description(description, stream=True))
+            self.root.after(0, lambda: self._set_options(options))
+            self.root.after(0, lambda: self.update_game_image())
+            self.root.after(0, lambda: self.render_scene_image(description))
         
         threading.Thread(target=process_thread).start()
     
+    def render_scene_image(self, description):
+        """Render an image of the scene in the background, swapping in each preview frame"""
+        if not SCENE_IMAGES or not description:
+            return
+        self._scene_render += 1
+        render_id = self._scene_render
+        prompt = f"{self.game.world_setting.world_type} adventure scene: {description[:400]}"
+        
+        def render_thread():
+            try:
+                import modal
+                from quality_tiers import STANDARD
+                model = modal.Cls.from_name(IMAGE_APP_NAME, "Model")()
+                for frame in model.inference_progressive.remote_gen(prompt, STANDARD, PREVIEW_EVERY):
+                    if render_id != self._scene_render:
+                        return  # a newer scene has started rendering
+                    img = load_scene_image(image_bytes=frame["image"])
+                    self.root.after(0, lambda img=img: self._show_scene_frame(render_id, img))
+            except Exception as e:
+                print(f"Error rendering scene image: {e}")
+        
+        threading.Thread(target=render_thread, daemon=True).start()
+    
+    def _show_scene_frame(self, render_id, image):
+        if render_id == self._scene_render:
+            self.update_game_image(image=image)
+    
     def new_game(self):
         """Start a new game"""
         if messagebox.askyesno("New Game", "Are you sure you want to start a new game? All progress will be lost."):
             self.show_welcome_view()
             self.game = None
             self.story_history = []
+            self._scene_render += 1
             
             # Reset game state
             self.story_text.config(state=tk.NORMAL)
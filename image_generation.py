@@ -1,8 +1,10 @@
 import time
-from io import BytesIO
 from pathlib import Path
 import os
 import modal
+from batching import DynamicBatcher, render_batch
+from compile_cache import CompileArtifacts, CompiledPipeline
+from quality_tiers import TIERS, DEFAULT_TIER, tier_settings, resolutions
 
 cuda_version = "12.4.0"  # should be no greater than host CUDA version
 flavor = "devel"  # includes full CUDA toolkit
@@ -44,16 +46,28 @@ flux_image = flux_image.env(
         "TORCHINDUCTOR_CACHE_DIR": "/root/.inductor-cache",
         "TORCHINDUCTOR_FX_GRAPH_CACHE": "1",
     }
-)
+).add_local_python_source("batching", "compile_cache", "quality_tiers")
 
 app = modal.App("game-image-generator", image=flux_image)
 
+# Compiled kernels per torch version / GPU / shape, see compile_cache.py
+compile_volume = modal.Volume.from_name("flux-compile-cache", create_if_missing=True)
+COMPILE_CACHE_DIR = "/compile-cache"
+
 with flux_image.imports():
     import torch
     from diffusers import FluxPipeline
 
 VARIANT = "schnell"
-NUM_INFERENCE_STEPS = 4
+NUM_INFERENCE_STEPS = tier_settings(DEFAULT_TIER, VARIANT)[2]  # per tier, see quality_tiers.py
+
+# Prompts arriving within MAX_BATCH_WAIT seconds of each other are rendered together
+MAX_BATCH_SIZE = int(os.environ.get("FLUX_MAX_BATCH_SIZE", "4"))
+MAX_BATCH_WAIT = float(os.environ.get("FLUX_MAX_BATCH_WAIT", "0.05"))
+
+# eager, background (serve eagerly until the compiled pipeline is warm) or blocking;
+# both compiled modes only load artifacts made by build_compile_artifacts
+COMPILE_MODE = os.environ.get("FLUX_COMPILE", "background")
 
 @app.cls(
     gpu="H100",
@@ -63,62 +77,92 @@ NUM_INFERENCE_STEPS = 4
         "/root/.nv": modal.Volume.from_name("nv-cache", create_if_missing=True),
         "/root/.triton": modal.Volume.from_name("triton-cache", create_if_missing=True),
         "/root/.inductor-cache": modal.Volume.from_name("inductor-cache", create_if_missing=True),
+        COMPILE_CACHE_DIR: compile_volume,
     },
 )
+@modal.concurrent(max_inputs=MAX_BATCH_SIZE * 2)  # let requests queue up in the batcher
 class GameImageGenerator:
+    compile: int = modal.parameter(default=0)  # 1 builds and publishes compile artifacts; 0 uses COMPILE_MODE
+
     @modal.enter()
     def enter(self):
+        t0 = time.time()
         pipe = FluxPipeline.from_pretrained(
             f"black-forest-labs/FLUX.1-{VARIANT}",
             torch_dtype=torch.bfloat16
         ).to("cuda")
-        self.pipe = optimize(pipe, compile=False)  # Keeping compile=False for faster startup
+        weights_load_s = time.time() - t0
+
+        # Serve eagerly at once; the compiled pipeline takes over when it is ready
+        t0 = time.time()
+        pipe = optimize(pipe)
+        self.compiled = CompiledPipeline(
+            pipe,
+            CompileArtifacts(COMPILE_CACHE_DIR, VARIANT, batch_sizes=(1, MAX_BATCH_SIZE), resolutions=resolutions()),
+            NUM_INFERENCE_STEPS,
+            mode="build" if self.compile else COMPILE_MODE,
+            persist=compile_volume.commit,
+            timings={"weights_load_s": round(weights_load_s, 2), "optimize_s": round(time.time() - t0, 2)},
+        ).start()
+        # Only prompts of the same tier (resolution and steps) can share a batch
+        self.batchers = {
+            tier: DynamicBatcher(
+                lambda prompts, tier=tier: self.render(prompts, tier),
+                max_batch_size=MAX_BATCH_SIZE,
+                max_wait=MAX_BATCH_WAIT
+            )
+            for tier in TIERS
+        }
+
+    def render(self, prompts, tier=DEFAULT_TIER):
+        width, height, steps = tier_settings(tier, VARIANT)
+        return render_batch(self.compiled.pipe, prompts, steps, width=width, height=height)
 
     @modal.method()
     def generate_scene_image(
         self,
         scene_description: str,
         world_type: str = "fantasy",
-        style: str = "digital art"
+        style: str = "digital art",
+        tier: str = DEFAULT_TIER
     ) -> bytes:
         """Generate an image for a game scene"""
         # Enhance the prompt with style and world context
         enhanced_prompt = f"In the style of {style}, a scene from a {world_type} world: {scene_description}"
         print(f"🎨 Generating image for scene: {enhanced_prompt}")
         
-        out = self.pipe(
-            enhanced_prompt,
-            output_type="pil",
-            num_inference_steps=NUM_INFERENCE_STEPS,
-        ).images[0]
-
-        # Convert to bytes
-        byte_stream = BytesIO()
-        out.save(byte_stream, format="JPEG")
-        return byte_stream.getvalue()
+        # Rendered together with any other prompts of the same tier submitted at the same time
+        return self.batchers[tier](enhanced_prompt)
 
     @modal.method()
     def generate_character_portrait(
         self,
         character_description: str,
         world_type: str = "fantasy",
-        style: str = "detailed character portrait"
+        style: str = "detailed character portrait",
+        tier: str = DEFAULT_TIER
     ) -> bytes:
         """Generate a character portrait"""
         enhanced_prompt = f"In the style of {style}, a portrait of a {world_type} character: {character_description}"
         print(f"🎨 Generating character portrait: {enhanced_prompt}")
         
-        out = self.pipe(
-            enhanced_prompt,
-            output_type="pil",
-            num_inference_steps=NUM_INFERENCE_STEPS,
-        ).images[0]
+        return self.batchers[tier](enhanced_prompt)
+
+    @modal.method()
+    def startup_metrics(self) -> dict:
+        """Startup breakdown and compile status of this container"""
+        return {**self.compiled.metrics(),
+                "batchers": {tier: batcher.metrics() for tier, batcher in self.batchers.items()}}
 
-        byte_stream = BytesIO()
-        out.save(byte_stream, format="JPEG")
-        return byte_stream.getvalue()
+@app.function(timeout=15 * 60)
+def build_compile_artifacts():
+    """One-off build step (`modal run image_generation.py::build_compile_artifacts`):
+    compile in a GPU container and store the artifacts on the volume"""
+    metrics = GameImageGenerator(compile=1).startup_metrics.remote()
+    print(f"🔦 compile artifacts {metrics['artifact_key']} ({metrics['source']}): {metrics['timings']}")
+    return metrics
 
-def optimize(pipe, compile=False):
+def optimize(pipe):
     # fuse QKV projections in Transformer and VAE
     pipe.transformer.fuse_qkv_projections()
     pipe.vae.fuse_qkv_projections()
@@ -127,37 +171,7 @@ def optimize(pipe, compile=False):
     pipe.transformer.to(memory_format=torch.channels_last)
     pipe.vae.to(memory_format=torch.channels_last)
 
-    if not compile:
-        return pipe
-
-    # set torch compile flags
-    config = torch._inductor.config
-    config.disable_progress = False  # show progress bar
-    config.conv_1x1_as_mm = True  # treat 1x1 convolutions as matrix muls
-    # adjust autotuning algorithm
-    config.coordinate_descent_tuning = True
-    config.coordinate_descent_check_all_directions = True
-    config.epilogue_fusion = False  # do not fuse pointwise ops into matmuls
-
-    # tag the compute-intensive modules, the Transformer and VAE decoder, for compilation
-    pipe.transformer = torch.compile(
-        pipe.transformer, mode="max-autotune", fullgraph=True
-    )
-    pipe.vae.decode = torch.compile(
-        pipe.vae.decode, mode="max-autotune", fullgraph=True
-    )
-
-    # trigger torch compilation
-    print("🔦 running torch compiliation (may take up to 20 minutes)...")
-
-    pipe(
-        "dummy prompt to trigger torch compilation",
-        output_type="pil",
-        num_inference_steps=NUM_INFERENCE_STEPS,  # use ~50 for [dev], smaller for [schnell]
-    ).images[0]
-
-    print("🔦 finished torch compilation")
-
+    # torch.compile is handled by compile_cache.CompiledPipeline
     return pipe
 
 @app.function(gpu="H100")
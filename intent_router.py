@@ -0,0 +1,159 @@
+"""
+Local intent router for mechanical player actions
+
+Checking your bag, asking where you are, walking to a known place or dropping an
+item does not need the storyteller, but used to cost a full LLM round-trip unless
+the player typed one of a few exact commands. The router matches the input
+against a small keyword grammar, resolving item and place names against the
+inventory and the world's areas (exactly, by whole words, or fuzzily with
+difflib). Anything it cannot resolve with confidence returns None and goes to
+the storyteller, so narrative actions behave as before.
+"""
+
+import re
+import difflib
+from typing import NamedTuple, Optional
+
+# Built-in commands, by canonical name
+COMMANDS = {
+    "status": ["status", "stats", "state"],
+    "inventory": ["inventory", "items", "i"],
+    "help": ["help", "commands", "?"]
+}
+
+FILLER_WORDS = {"a", "an", "the", "my", "your", "some", "please", "now", "again"}
+
+# Phrases for intents without a target, after normalization
+PHRASES = {
+    "status": [
+        r"(check|show|view|see) (status|stats|health|hp|gold|money|condition)",
+        r"(status|stats|health|hp|gold|money|condition)",
+        r"how (am i|am i doing|is health)",
+        r"how much (gold|money|health) do i have",
+        r"what is (status|health)"
+    ],
+    "inventory": [
+        r"(check|open|search|show|view|empty|look (in|at|through|into)|rummage (in|through)) "
+        r"(bag|backpack|pack|inventory|items|belongings|pockets?|satchel|gear)",
+        r"(bag|backpack|pack|belongings|pockets?|satchel|gear|inv)",
+        r"what (do i have|am i carrying|is in (bag|backpack|pack|pockets?))"
+    ],
+    "help": [
+        r"what can i do",
+        r"how do i play",
+        r"show (help|commands)"
+    ],
+    "location": [
+        r"where am i",
+        r"where are we",
+        r"what is this place",
+        r"(location|whereabouts)",
+        r"(check|show|view) (location|map)"
+    ]
+}
+
+# Intents that resolve a name against the game state
+TRAVEL_RE = re.compile(
+    r"(?:go|travel|walk|head|run|sail|fly|move|return|journey|ride|hurry|set sail|make way)"
+    r"(?: back)? (?:to|towards?|into|for) (?P<target>.+)"
+)
+DROP_RE = re.compile(r"(?:drop|discard|throw away|toss|get rid of|leave behind) (?P<target>.+)")
+
+PHRASE_RES = {
+    name: re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+    for name, patterns in PHRASES.items()
+}
+
+
+class Intent(NamedTuple):
+    """A mechanical action: the intent name and, for travel and drop, what it resolved to"""
+    name: str
+    target: Optional[str] = None
+    region: Optional[str] = None
+
+
+def normalize(text):
+    """Lowercase words without punctuation or filler words"""
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("'", ""))
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def command_name(user_input):
+    """Canonical name of a built-in command typed exactly, or None"""
+    text = user_input.strip().lower()
+    for name, aliases in COMMANDS.items():
+        if text in aliases:
+            return name
+    return None
+
+
+def match_name(target, candidates, cutoff=0.8):
+    """The one candidate `target` refers to, or None if there is none or it is ambiguous
+
+    Tries an exact match, then candidates containing all of the target's words
+    ("sword" for "Rusty Sword"), then difflib's closest match for typos.
+    """
+    wanted = normalize(target)
+    if not wanted:
+        return None
+    by_name = {}
+    for candidate in candidates:
+        by_name.setdefault(normalize(candidate), candidate)
+
+    if wanted in by_name:
+        return by_name[wanted]
+
+    words = set(wanted.split())
+    containing = [candidate for name, candidate in by_name.items() if words <= set(name.split())]
+    if len(set(containing)) == 1:
+        return containing[0]
+    if containing:
+        return None
+
+    close = difflib.get_close_matches(wanted, list(by_name), n=2, cutoff=cutoff)
+    if len(close) == 1 or (close and difflib.SequenceMatcher(None, wanted, close[1]).ratio() < cutoff + 0.05):
+        return by_name[close[0]]
+    return None
+
+
+class IntentRouter:
+    """Classify player input as a mechanical Intent, or None for the storyteller"""
+
+    def __init__(self, fuzzy_cutoff=0.8):
+        self.fuzzy_cutoff = fuzzy_cutoff
+
+    def route(self, user_input, game_state):
+        command = command_name(user_input)
+        if command is not None:
+            return Intent(command)
+
+        text = normalize(user_input)
+        if not text:
+            return None
+
+        for name, pattern in PHRASE_RES.items():
+            if pattern.fullmatch(text):
+                return Intent(name)
+
+        match = TRAVEL_RE.fullmatch(text)
+        if match:
+            return self._travel(match.group("target"), game_state)
+
+        match = DROP_RE.fullmatch(text)
+        if match:
+            item = match_name(match.group("target"), game_state.inventory, self.fuzzy_cutoff)
+            return Intent("drop", item) if item is not None else None
+
+        return None
+
+    def _travel(self, target, game_state):
+        """Resolve a destination to one of the world's areas"""
+        areas = {}
+        for region, info in game_state.world_setting.regions.items():
+            for area in info["areas"]:
+                areas.setdefault(area, region)
+
+        area = match_name(target, areas, self.fuzzy_cutoff)
+        if area is None:
+            return None
+        return Intent("travel", area, areas[area])
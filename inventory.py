@@ -0,0 +1,177 @@
+"""
+Indexed player inventory
+
+Items are stacks keyed by an item ID derived from the name, so picking up a
+second Healing Potion raises a count instead of adding another entry, and
+add, remove and lookups (case-insensitive: "torch" finds "Torch") are dict
+operations rather than list scans. Each stack has a category inferred from its
+name. The text summary that goes into every storyteller prompt is rendered once
+per change and capped, so a player carrying thousands of items does not make
+every turn slower or every prompt longer.
+
+Iterating an Inventory yields stack names. Snapshots store one [name, count]
+pair per stack; `to_list()` gives the flat list of names (one per unit) that the
+API returns.
+"""
+
+import re
+
+# Checked in order; the first category with a matching word wins
+CATEGORY_KEYWORDS = {
+    "weapon": {"sword", "dagger", "axe", "bow", "arrow", "arrows", "spear", "blade", "knife", "mace", "cutlass",
+               "pistol", "blaster", "rifle", "gun", "staff", "wand", "hammer", "crossbow", "club"},
+    "armor": {"armor", "armour", "shield", "helmet", "helm", "boots", "gauntlets", "cloak", "vest", "mail",
+              "breastplate", "suit"},
+    "consumable": {"potion", "elixir", "bread", "ration", "rations", "food", "water", "wine", "rum", "apple",
+                   "meat", "herb", "herbs", "medkit", "bandage", "bandages", "coffee", "tonic", "antidote"},
+    "treasure": {"gold", "coin", "coins", "gem", "gems", "jewel", "ruby", "emerald", "diamond", "pearl",
+                 "crown", "ring", "amulet", "necklace", "treasure", "doubloon", "doubloons", "credits"},
+    "document": {"map", "letter", "scroll", "book", "note", "journal", "chart", "diary", "tome"},
+    "tool": {"torch", "rope", "lantern", "key", "lockpick", "compass", "pickaxe", "shovel", "flint", "tinderbox",
+             "spyglass", "scanner", "phone", "wrench", "hook", "net", "kit"}
+}
+DEFAULT_CATEGORY = "misc"
+CATEGORY_BY_WORD = {word: category for category, keywords in reversed(CATEGORY_KEYWORDS.items()) for word in keywords}
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Stacks listed in the prompt summary before the rest are counted
+MAX_SUMMARY_STACKS = 40
+
+
+def item_id(name):
+    """Stable ID for an item name: lowercase words joined by dashes"""
+    return "-".join(WORD_RE.findall(name.casefold())) or name.strip().casefold()
+
+
+def categorize(name):
+    """Category of an item, from the words in its name"""
+    categories = {CATEGORY_BY_WORD.get(word) for word in WORD_RE.findall(name.casefold())}
+    for category in CATEGORY_KEYWORDS:
+        if category in categories:
+            return category
+    return DEFAULT_CATEGORY
+
+
+class Item:
+    def __init__(self, name, count=1, category=None):
+        self.id = item_id(name)
+        self.name = name
+        self.count = count
+        self.category = category or categorize(name)
+
+    def __str__(self):
+        return self.name if self.count == 1 else f"{self.name} x{self.count}"
+
+    def __repr__(self):
+        return f"Item({self.name!r}, count={self.count}, category={self.category!r})"
+
+
+class Inventory:
+    """Item stacks indexed by ID and category, with a cached prompt summary"""
+
+    def __init__(self, items=None, max_summary_stacks=MAX_SUMMARY_STACKS):
+        self.max_summary_stacks = max_summary_stacks
+        self.stacks = {}  # item id -> Item, in the order items were first picked up
+        self.categories = {}  # category -> {item id: None}, ordered like stacks
+        self.total = 0
+        self._summary = None
+        for entry in items or []:
+            # Names, one per unit (older snapshots and the API), or [name, count] stacks
+            if isinstance(entry, str):
+                self.add(entry)
+            else:
+                self.add(*entry)
+
+    def __len__(self):
+        return len(self.stacks)
+
+    def __iter__(self):
+        return (item.name for item in self.stacks.values())
+
+    def __contains__(self, name):
+        return isinstance(name, str) and item_id(name) in self.stacks
+
+    def __repr__(self):
+        return f"Inventory({self.to_list()!r})"
+
+    def items(self, category=None):
+        """Item stacks, optionally only those in one category"""
+        if category is None:
+            return list(self.stacks.values())
+        return [self.stacks[key] for key in self.categories.get(category, ())]
+
+    def get(self, name):
+        """The stack for an item name, or None"""
+        return self.stacks.get(item_id(name))
+
+    def has(self, name, count=1):
+        item = self.get(name)
+        return item is not None and item.count >= count
+
+    def count(self, name):
+        item = self.get(name)
+        return item.count if item is not None else 0
+
+    def add(self, name, count=1):
+        """Add `count` of an item, stacking onto an existing one with the same ID"""
+        if count <= 0:
+            raise ValueError(f"Cannot add {count} of {name!r}: the count must be positive")
+        name = name.strip()
+        key = item_id(name)
+        item = self.stacks.get(key)
+        if item is None:
+            item = self.stacks[key] = Item(name, 0)
+            self.categories.setdefault(item.category, {})[key] = None
+        item.count += count
+        self.total += count
+        self._summary = None
+        return item
+
+    def remove(self, name, count=1):
+        """Remove up to `count` of an item; returns the stack's name, or None if it was not carried"""
+        if count <= 0:
+            raise ValueError(f"Cannot remove {count} of {name!r}: the count must be positive")
+        key = item_id(name)
+        item = self.stacks.get(key)
+        if item is None:
+            return None
+        removed = min(count, item.count)
+        item.count -= removed
+        self.total -= removed
+        if item.count == 0:
+            del self.stacks[key]
+            category = self.categories[item.category]
+            del category[key]
+            if not category:
+                del self.categories[item.category]
+        self._summary = None
+        return item.name
+
+    def clear(self):
+        self.stacks.clear()
+        self.categories.clear()
+        self.total = 0
+        self._summary = None
+
+    def summary(self):
+        """Stacks as prompt text ("Torch, Healing Potion x2"), rebuilt only after a change"""
+        if self._summary is None:
+            shown = []
+            for item in self.stacks.values():
+                if len(shown) == self.max_summary_stacks:
+                    break
+                shown.append(str(item))
+            hidden = len(self.stacks) - len(shown)
+            if hidden:
+                shown.append(f"and {hidden} more kinds of items")
+            self._summary = ", ".join(shown)
+        return self._summary
+
+    def to_list(self):
+        """One name per unit, in pickup order"""
+        return [item.name for item in self.stacks.values() for _ in range(item.count)]
+
+    def to_snapshot(self):
+        """One [name, count] pair per stack, in pickup order"""
+        return [[item.name, item.count] for item in self.stacks.values()]
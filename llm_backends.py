@@ -0,0 +1,204 @@
+"""
+LLM backend registry
+
+Every LLM in the project is created through create_llm(), which picks a backend
+from the LLM_BACKEND environment variable (default "gemini"):
+
+    gemini  - Google Gemini through langchain-google-genai (needs GOOGLE_API_KEY)
+    openai  - Any OpenAI-compatible HTTP server, e.g. a local vLLM or llama.cpp
+              server, through langchain-openai (OPENAI_BASE_URL, OPENAI_MODEL,
+              OPENAI_API_KEY)
+    fake    - Offline, deterministic stand-in that returns templated responses
+              with configurable latency (FAKE_LLM_LATENCY, FAKE_LLM_TOKEN_DELAY)
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+BACKENDS = {}
+
+
+def register_backend(name):
+    """Register a factory function as an LLM backend"""
+    def decorator(factory):
+        BACKENDS[name] = factory
+        return factory
+    return decorator
+
+
+def create_llm(backend=None, **kwargs):
+    """Create an LLM using the named backend, or the one configured in LLM_BACKEND"""
+    name = backend or os.environ.get("LLM_BACKEND", "gemini")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name} (available: {', '.join(sorted(BACKENDS))})")
+    return BACKENDS[name](**kwargs)
+
+
+# Call options that make each backend return a bare JSON object, by _llm_type
+JSON_MODE_KWARGS = {
+    "chat-google-generative-ai": {"generation_config": {"response_mime_type": "application/json"}},
+    "openai-chat": {"response_format": {"type": "json_object"}},
+    "fake-storyteller": {"json_mode": True}
+}
+
+
+def json_mode(llm):
+    """`llm` bound to its backend's JSON output mode, or unchanged if it has none"""
+    kwargs = JSON_MODE_KWARGS.get(getattr(llm, "_llm_type", None))
+    return llm.bind(**kwargs) if kwargs else llm
+
+
+@register_backend("gemini")
+def gemini_backend(model="gemini-2.0-flash", temperature=0.7, **kwargs):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=os.environ.get("GEMINI_MODEL", model),
+        temperature=temperature,
+        **kwargs
+    )
+
+
+@register_backend("openai")
+def openai_backend(model=None, temperature=0.7, **kwargs):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model or os.environ.get("OPENAI_MODEL", "local-model"),
+        base_url=os.environ.get("OPENAI_BASE_URL", "http://localhost:8000/v1"),
+        api_key=os.environ.get("OPENAI_API_KEY", "not-needed"),
+        temperature=temperature,
+        **kwargs
+    )
+
+
+@register_backend("fake")
+def fake_backend(temperature=None, **kwargs):
+    kwargs.setdefault("latency", float(os.environ.get("FAKE_LLM_LATENCY", "0")))
+    kwargs.setdefault("token_delay", float(os.environ.get("FAKE_LLM_TOKEN_DELAY", "0")))
+    return FakeStorytellerLLM(**kwargs)
+
+
+def approx_tokens(text):
+    """Rough token estimate: ~4 characters per token for English prose"""
+    return len(text) // 4
+
+
+class FakeStorytellerLLM(BaseChatModel):
+    """Deterministic offline chat model for tests, benchmarks and load tests
+
+    Answers storyteller prompts with a templated DESCRIPTION/OPTIONS response built from
+    the user's action (a compact JSON turn when called with json_mode=True), music
+    selection prompts with the first listed track, and anything else with a short
+    generic scene. `responses`, if given, are returned in rotation
+    instead. Sleeps `latency` seconds before the first token and `token_delay` per
+    streamed chunk, and counts calls and tokens. A leading system message identical to
+    the previous call's is counted as cached, like providers with prefix caching.
+    """
+
+    latency: float = 0.0
+    token_delay: float = 0.0
+    responses: Optional[List[str]] = None
+    calls: int = 0
+    input_tokens: int = 0
+    cached_input_tokens: int = 0
+    output_tokens: int = 0
+    last_prefix: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-storyteller"
+
+    def reset_stats(self):
+        self.calls = self.input_tokens = self.cached_input_tokens = self.output_tokens = 0
+
+    def _respond(self, messages, json_mode=False) -> str:
+        self.calls += 1
+        for index, message in enumerate(messages):
+            tokens = approx_tokens(message.content)
+            self.input_tokens += tokens
+            if index == 0 and message.type == "system":
+                if message.content == self.last_prefix:
+                    self.cached_input_tokens += tokens
+                self.last_prefix = message.content
+
+        if self.responses:
+            text = self.responses[(self.calls - 1) % len(self.responses)]
+        elif json_mode:
+            text = self._json_response("\n".join(m.content for m in messages))
+        else:
+            text = self._template_response("\n".join(m.content for m in messages))
+
+        self.output_tokens += approx_tokens(text)
+        return text
+
+    @staticmethod
+    def _template_response(prompt: str) -> str:
+        if "OPTIONS:" in prompt:
+            action = prompt.split("# User Action:")[-1].strip().splitlines()[0] if "# User Action:" in prompt else ""
+            opening = f"You decide to {action.rstrip('.').lower()}." if action else "Your adventure begins."
+            return (
+                f"DESCRIPTION: {opening} The air is still and the path ahead splits in two. "
+                "Somewhere in the distance a bell tolls, and you sense that your choice matters.\n\n"
+                "OPTIONS:\n"
+                "1. Take the left path\n"
+                "2. Take the right path\n"
+                "3. Wait and listen\n"
+                "4. [Type your own action]"
+            )
+
+        if "Available music tracks" in prompt:
+            tracks = prompt.split("Available music tracks (track names only):")[-1].strip().splitlines()
+            return tracks[0].strip() if tracks else ""
+
+        return "A detailed illustration of an adventurer standing at a crossroads, dramatic lighting."
+
+    @staticmethod
+    def _json_response(prompt: str) -> str:
+        action = prompt.split("# User Action:")[-1].strip().splitlines()[0] if "# User Action:" in prompt else ""
+        opening = f"You decide to {action.rstrip('.').lower()}." if action else "Your adventure begins."
+        return json.dumps({
+            "d": f"{opening} The air is still and the path ahead splits in two. "
+                 "Somewhere in the distance a bell tolls, and you sense that your choice matters.",
+            "o": ["Take the left path", "Take the right path", "Wait and listen"],
+            "s": []
+        })
+
+    @staticmethod
+    def _chunks(text: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text = self._respond(messages, kwargs.get("json_mode", False))
+        time.sleep(self.latency + self.token_delay * len(self._chunks(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text = self._respond(messages, kwargs.get("json_mode", False))
+        await asyncio.sleep(self.latency + self.token_delay * len(self._chunks(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        text = self._respond(messages, kwargs.get("json_mode", False))
+        time.sleep(self.latency)
+        for chunk in self._chunks(text):
+            time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        text = self._respond(messages, kwargs.get("json_mode", False))
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(text):
+            await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"latency": self.latency, "token_delay": self.token_delay}
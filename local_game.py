@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from game import AdventureGame
+from response_parser import parse_response
 from flux_backend import *
 
 # Load environment variables for Google API key
@@ -68,7 +69,7 @@ def main():
             elif user_action.lower() in ["inventory", "items", "i"]:
                 print("\n----- INVENTORY -----")
                 if game.game_state.inventory:
-                    for i, item in enumerate(game.game_state.inventory, 1):
+                    for i, item in enumerate(game.game_state.inventory.items(), 1):
                         print(f"{i}. {item}")
                 else:
                     print("Your inventory is empty.")
@@ -89,7 +90,7 @@ def main():
             power_levels = list(str(game.character.attributes[i]) for i in list(game.character.attributes.keys()))
             remaining_levels = [20-sum(list(int(x) for x in power_levels[:i])) for i in range(len(character_skills))]
             character_attr_prompt = ", ".join(character_skills[i]+" of "+power_levels[i]+" out of "+str(remaining_levels[i]) for i in range(len(character_skills)))
-            image_gen_prompt = "Generate an image with a scene as follows: "+str(response[response.find("DESCRIPTION:")+12:response.find("OPTIONS")])+\
+            image_gen_prompt = "Generate an image with a scene as follows: "+str(parse_response(response).description)+\
                 " and a human cartoon character having the following attributes - "+str(character_attr_prompt)+\
                     ", and the cartoon character description as follows - "+str(game.character.description)+\
                     ", in a " +str(game.world_setting.world_type)+ " game world"
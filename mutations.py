@@ -0,0 +1,333 @@
+"""
+Transactional state mutations for GameState
+
+Every change to the player's state (moving, gaining or losing items, health, gold,
+attributes) is a Mutation, and a list of them is applied as one transaction:
+each is validated against the current state (known locations, items actually
+carried, gold that is actually there) and applied in order, and if one fails the
+ones before it are rolled back. Committed transactions go on a bounded undo log
+and are published as Change events, so the UI payload, image and music triggers
+or persistence can react to what changed without diffing the whole state.
+
+Storyteller output is applied leniently: invalid mutations are skipped and
+reported, the valid ones still commit together.
+"""
+
+from contextlib import contextmanager
+from typing import Any, NamedTuple, Optional
+
+from intent_router import match_name
+
+MOVE = "move"
+ADD_ITEM = "add_item"
+REMOVE_ITEM = "remove_item"
+HEALTH = "health"
+GOLD = "gold"
+ATTRIBUTE = "attribute"
+MALFORMED = "malformed"  # a change whose shape could not be read; always rejected
+
+MAX_HEALTH = 100
+ATTRIBUTE_RANGE = (0, 10)
+
+
+class MutationError(ValueError):
+    """A mutation that is not valid for the current state"""
+
+
+class Mutation(NamedTuple):
+    """One state change: `value` is the area, item or amount; `key` the region or attribute"""
+    kind: str
+    value: Any
+    key: Optional[str] = None
+
+
+class Change(NamedTuple):
+    """A committed mutation as seen by subscribers: what `key` was before and is after
+
+    Item changes are keyed by the stack name, with the stack's count before and after.
+    """
+    kind: str
+    key: Optional[str]
+    before: Any
+    after: Any
+    source: str
+
+
+def move(region, area):
+    return Mutation(MOVE, area, region)
+
+
+def add_item(item):
+    return Mutation(ADD_ITEM, item)
+
+
+def remove_item(item):
+    return Mutation(REMOVE_ITEM, item)
+
+
+def change_health(delta):
+    return Mutation(HEALTH, delta)
+
+
+def change_gold(delta):
+    return Mutation(GOLD, delta)
+
+
+def change_attribute(name, delta):
+    return Mutation(ATTRIBUTE, delta, name)
+
+
+def from_state_changes(state_changes):
+    """Mutations for response parser state changes, including STATE_CHANGES dictionaries"""
+    mutations = []
+    for change in state_changes:
+        kind = change["type"]
+        if kind == "location":
+            mutations.append(move(change["region"], change["area"]))
+        elif kind == "inventory_add":
+            mutations.append(add_item(change["item"]))
+        elif kind == "inventory_remove":
+            mutations.append(remove_item(change["item"]))
+        elif kind == "health":
+            mutations.append(change_health(change["delta"]))
+        elif kind == "gold":
+            mutations.append(change_gold(change["delta"]))
+        elif kind == "state_changes":
+            mutations.extend(from_change_dict(change["changes"]))
+    return mutations
+
+
+def _item_list(value):
+    """Item names from a STATE_CHANGES inventory entry: a list of names or a single name"""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list):
+        return value
+    return None
+
+
+def from_change_dict(changes):
+    """Mutations for a {"gold", "inventory_add", "inventory_remove", "attributes"} dictionary
+
+    Parts with the wrong shape become MALFORMED mutations, so applying them reports
+    them instead of failing the turn.
+    """
+    if not isinstance(changes, dict):
+        return [Mutation(MALFORMED, changes)]
+    mutations = []
+    if changes.get("gold"):
+        mutations.append(change_gold(changes["gold"]))
+    for field, make in (("inventory_add", add_item), ("inventory_remove", remove_item)):
+        if not changes.get(field):
+            continue
+        items = _item_list(changes[field])
+        if items is None:
+            mutations.append(Mutation(MALFORMED, {field: changes[field]}))
+        else:
+            mutations.extend(make(item) for item in items)
+    attributes = changes.get("attributes")
+    if isinstance(attributes, dict):
+        mutations.extend(change_attribute(name, delta) for name, delta in attributes.items())
+    elif attributes:
+        mutations.append(Mutation(MALFORMED, {"attributes": attributes}))
+    return mutations
+
+
+def changes_payload(changes):
+    """Summarize Change events in the `stateChanges` shape the frontend reads"""
+    payload = {}
+    for change in changes:
+        if change.kind == GOLD:
+            payload["gold"] = payload.get("gold", 0) + change.after - change.before
+        elif change.kind == HEALTH:
+            payload["health"] = payload.get("health", 0) + change.after - change.before
+        elif change.kind == ADD_ITEM:
+            payload.setdefault("inventory_add", []).append(change.key)
+        elif change.kind == REMOVE_ITEM:
+            payload.setdefault("inventory_remove", []).append(change.key)
+        elif change.kind == ATTRIBUTE:
+            attributes = payload.setdefault("attributes", {})
+            attributes[change.key] = attributes.get(change.key, 0) + change.after - change.before
+        elif change.kind == MOVE:
+            payload["location"] = change.after
+    return payload
+
+
+def resolve_location(world_setting, region, area):
+    """The world's (region, area) a storyteller's names refer to, or None for what does not match
+
+    Names are matched like the intent router matches them (case, filler words, typos).
+    An area that is not in the named region is looked up in the whole world, since
+    storytellers often get the region wrong.
+    """
+    regions = world_setting.regions
+    region = match_name(region, regions) if region else None
+    if region is not None:
+        match = match_name(area, regions[region]["areas"])
+        if match is not None:
+            return region, match
+
+    areas = {}
+    for name, info in regions.items():
+        for candidate in info["areas"]:
+            areas.setdefault(candidate, name)
+    match = match_name(area, areas)
+    if match is None:
+        return region, None
+    return areas[match], match
+
+
+def _as_int(value, kind):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise MutationError(f"{kind} needs an integer amount, got {value!r}")
+
+
+class StateMutations:
+    """Applies mutation transactions to a GameState, with an undo log and subscribers"""
+
+    def __init__(self, game_state, max_undo=20):
+        self.game_state = game_state
+        self.max_undo = max_undo
+        self.undo_log = []  # committed transactions (lists of Change), oldest first
+        self.subscribers = []
+        self.rejected = []  # (mutation, error) skipped by the last lenient apply
+
+    def subscribe(self, callback):
+        """Call `callback(changes)` after every committed transaction; returns an unsubscribe function"""
+        self.subscribers.append(callback)
+        return lambda: self.subscribers.remove(callback)
+
+    @contextmanager
+    def recording(self):
+        """Collect the Change events committed inside the block"""
+        changes = []
+        unsubscribe = self.subscribe(changes.extend)
+        try:
+            yield changes
+        finally:
+            unsubscribe()
+
+    def apply(self, mutations, strict=True, source="game"):
+        """Apply mutations as one transaction and return the committed Changes
+
+        With `strict` an invalid mutation rolls back the whole transaction and raises
+        MutationError; otherwise it is skipped and recorded in `rejected`.
+        """
+        self.rejected = []
+        changes = []
+        for mutation in mutations:
+            try:
+                try:
+                    changes.append(self._apply(mutation, source))
+                except (TypeError, AttributeError, KeyError) as e:
+                    raise MutationError(f"Malformed {mutation.kind} change: {e}") from e
+            except MutationError as e:
+                if strict:
+                    self._revert(changes)
+                    raise
+                self.rejected.append((mutation, str(e)))
+                print(f"Skipping invalid state change {mutation}: {e}")
+        self._commit(changes)
+        return changes
+
+    def undo(self):
+        """Revert the last committed transaction, publishing the reverse changes"""
+        if not self.undo_log:
+            return []
+        changes = self.undo_log.pop()
+        self._revert(changes)
+        reverse = [Change(change.kind, change.key, change.after, change.before, "undo")
+                   for change in reversed(changes)]
+        self._publish(reverse)
+        return reverse
+
+    def _commit(self, changes):
+        if not changes:
+            return
+        self.undo_log.append(changes)
+        del self.undo_log[:-self.max_undo]
+        self._publish(changes)
+
+    def _publish(self, changes):
+        for callback in list(self.subscribers):
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f"Error in state change subscriber: {e}")
+
+    def _apply(self, mutation, source):
+        state = self.game_state
+        kind, value, key = mutation
+
+        if kind == MOVE:
+            region, area = resolve_location(state.world_setting, str(key), str(value))
+            if not state.world_setting.is_valid_location(region, area):
+                raise MutationError(f"Unknown location {key}: {value}")
+            before = state.location.to_snapshot()
+            state.change_location(region, area, state.world_setting.get_region_description(region))
+            return Change(kind, "location", before, state.location.to_snapshot(), source)
+
+        if kind == ADD_ITEM:
+            item = str(value).strip()
+            if not item:
+                raise MutationError("Cannot add an item without a name")
+            stack = state.inventory.add(item)
+            return Change(kind, stack.name, stack.count - 1, stack.count, source)
+
+        if kind == REMOVE_ITEM:
+            item = str(value).strip()
+            before = state.inventory.count(item)
+            if not before:
+                raise MutationError(f"{item} is not in the inventory")
+            name = state.inventory.remove(item)
+            return Change(kind, name, before, before - 1, source)
+
+        if kind == HEALTH:
+            before = state.health
+            state.health = max(0, min(MAX_HEALTH, before + _as_int(value, kind)))
+            return Change(kind, "health", before, state.health, source)
+
+        if kind == GOLD:
+            before = state.gold
+            after = before + _as_int(value, kind)
+            if after < 0:
+                raise MutationError(f"Not enough gold: have {before}, need {-_as_int(value, kind)}")
+            state.gold = after
+            return Change(kind, "gold", before, after, source)
+
+        if kind == ATTRIBUTE:
+            attributes = state.character.attributes
+            name = str(key).lower()
+            if name not in attributes:
+                raise MutationError(f"Unknown attribute: {key}")
+            before = attributes[name]
+            low, high = ATTRIBUTE_RANGE
+            attributes[name] = max(low, min(high, before + _as_int(value, kind)))
+            return Change(kind, name, before, attributes[name], source)
+
+        if kind == MALFORMED:
+            raise MutationError(f"Malformed state change: {value!r}")
+
+        raise MutationError(f"Unknown mutation: {kind}")
+
+    def _revert(self, changes):
+        """Undo applied changes, newest first"""
+        from gamestate import Location
+
+        state = self.game_state
+        for change in reversed(changes):
+            if change.kind == MOVE:
+                state.location = Location.from_snapshot(change.before)
+                state.update_active_npcs()
+            elif change.kind == ADD_ITEM:
+                state.inventory.remove(change.key)
+            elif change.kind == REMOVE_ITEM:
+                state.inventory.add(change.key)
+            elif change.kind == HEALTH:
+                state.health = change.before
+            elif change.kind == GOLD:
+                state.gold = change.before
+            elif change.kind == ATTRIBUTE:
+                state.character.attributes[change.key] = change.before
@@ -0,0 +1,235 @@
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import Future
+from langchain.prompts import PromptTemplate
+from langchain_core.messages import SystemMessage, HumanMessage
+
+# Stable part of the storyteller prompt: only changes when the world or character does.
+# Keeping it first and byte-identical between turns lets providers reuse their cache.
+STORYTELLER_PREFIX = PromptTemplate(
+    input_variables=["world", "character", "places"],
+    template="""
+            You are the AI storyteller for an adventure game set in {world}.
+
+            # Character Information:
+            {character}
+
+            # Places (region: areas):
+            {places}
+
+            For every user action, respond with:
+            1. A vivid description of what happens based on the user's action
+            2. Three specific choice options for the player
+            3. A reminder that they can also type a custom action
+
+            Format your response as:
+            DESCRIPTION: [your detailed narrative here]
+
+            OPTIONS:
+            1. [option 1]
+            2. [option 2]
+            3. [option 3]
+            4. [Type your own action]
+
+            When the player arrives at one of the places above, add the line:
+            LOCATION_CHANGE: [region]: [area]
+            """
+)
+
+# Prefix for structured output (STORYTELLER_FORMAT=json), see structured_output.py
+STORYTELLER_JSON_PREFIX = PromptTemplate(
+    input_variables=["world", "character", "places"],
+    template="""
+            You are the AI storyteller for an adventure game set in {world}.
+
+            # Character Information:
+            {character}
+
+            # Places (region: areas):
+            {places}
+
+            For every user action, describe what happens and offer three specific
+            choices. Reply with only a JSON object, no prose or code fences:
+            {{"d": "<your detailed narrative>", "o": ["<option 1>", "<option 2>", "<option 3>"], "s": [<state changes>]}}
+
+            State changes, only for things that actually happen ("s" may be empty):
+            {{"k": "move", "r": "<region>", "v": "<area>"}}  {{"k": "add", "v": "<item>"}}  {{"k": "remove", "v": "<item>"}}
+            {{"k": "health", "v": <change, e.g. -10>}}  {{"k": "gold", "v": <change, e.g. 25>}}
+            Only "move" to the places listed above.
+            """
+)
+
+OUTPUT_FORMATS = {"text": STORYTELLER_PREFIX, "json": STORYTELLER_JSON_PREFIX}
+
+# Per-turn part of the storyteller prompt
+STORYTELLER_SUFFIX = PromptTemplate(
+    input_variables=["game_state", "history", "user_input"],
+    template="""
+            # Current Game State:
+            {game_state}
+
+            # History:
+            {history}
+
+            # User Action:
+            {user_input}
+            """
+)
+
+
+def world_places(world_setting):
+    """The world's regions and their areas, one region per line"""
+    return "\n            ".join(f"{region}: {', '.join(info['areas'])}"
+                                  for region, info in world_setting.regions.items())
+
+
+def fingerprint(*parts):
+    """Short stable hash of the given values"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class GeminiContextCache:
+    """Provider-side context caching for Gemini
+
+    Uploads a prefix once as cached content and returns its name, which is passed to
+    the model as `cached_content` so the prefix is not re-sent every turn. Handles are
+    kept by prefix fingerprint until shortly before their TTL runs out, and one cache is
+    shared by every game in the process (see default_provider_cache()), so games with
+    the same world and character reuse one upload.
+
+    Gemini only caches contexts above a minimum size (4096 tokens for 2.0 Flash), and
+    the storyteller prefix is only about 400 tokens, so with the default threshold
+    lookups return None and the prefix is sent inline. The cache only takes effect for
+    prefixes that grow past the minimum, e.g. with long world or character
+    descriptions; PROMPT_CACHE_MIN_TOKENS can lower the threshold for models that
+    accept smaller contexts.
+    """
+
+    def __init__(self, model="models/gemini-2.0-flash", min_tokens=4096, ttl_seconds=3600):
+        self.model = model
+        self.min_tokens = min_tokens
+        self.ttl_seconds = ttl_seconds
+        self.handles = {}  # prefix fingerprint -> (cached content name, expiry time)
+        self.uploads = {}  # prefix fingerprint -> Future of the name, while its upload runs
+        self.lock = threading.Lock()
+
+    def lookup(self, key, prefix):
+        if len(prefix) // 4 < self.min_tokens:
+            return None
+        with self.lock:
+            handle = self.handles.get(key)
+            # Leave a minute of TTL so a turn never references an expiring handle
+            if handle is not None and handle[1] - 60 > time.time():
+                return handle[0]
+            upload = self.uploads.get(key)
+            uploading = upload is None
+            if uploading:
+                upload = self.uploads[key] = Future()
+
+        if not uploading:
+            # Another game is uploading the same prefix; share its result (or its error)
+            return upload.result()
+
+        # Upload outside the lock, so games with other prefixes are not held up by it
+        try:
+            name = self._upload(prefix)
+        except BaseException as e:
+            with self.lock:
+                del self.uploads[key]
+            upload.set_exception(e)
+            raise
+        with self.lock:
+            self.handles[key] = (name, time.time() + self.ttl_seconds)
+            del self.uploads[key]
+        upload.set_result(name)
+        return name
+
+    def _upload(self, prefix):
+        """Create the cached content for a prefix and return its name"""
+        import datetime
+        from google.generativeai import caching
+
+        cached = caching.CachedContent.create(
+            model=self.model,
+            system_instruction=prefix,
+            ttl=datetime.timedelta(seconds=self.ttl_seconds)
+        )
+        return cached.name
+
+
+class StorytellerPrompt:
+    """Storyteller prompt split into a cacheable prefix and a small per-turn suffix
+
+    The rendered prefix is kept against a fingerprint of the world and character, so it
+    is only rebuilt when one of them changes. If a provider cache is configured and
+    holds the prefix, only the suffix is sent.
+    """
+
+    def __init__(self, provider_cache=None, output_format="text"):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown storyteller output format: {output_format}")
+        self.provider_cache = provider_cache
+        self.output_format = output_format
+        self.prefix_key = None
+        self.prefix = None
+        self.prefix_builds = 0
+
+    def get_prefix(self, world_setting, character):
+        """Return the rendered prefix and its fingerprint, rebuilding only on change"""
+        places = world_places(world_setting)
+        key = fingerprint(world_setting.description, places, character.cache_key(), self.output_format)
+        if key != self.prefix_key:
+            self.prefix = OUTPUT_FORMATS[self.output_format].format(
+                world=world_setting.description,
+                character=character.get_description(),
+                places=places
+            )
+            self.prefix_key = key
+            self.prefix_builds += 1
+        return self.prefix, key
+
+    def build(self, world_setting, character, game_state, history, user_input):
+        """Build the messages for a turn
+
+        Returns (messages, cached_content) where cached_content is the provider cache
+        handle holding the prefix, or None if the prefix is sent inline.
+        """
+        prefix, key = self.get_prefix(world_setting, character)
+        suffix = STORYTELLER_SUFFIX.format(game_state=game_state, history=history, user_input=user_input)
+
+        cached_content = None
+        if self.provider_cache is not None:
+            try:
+                cached_content = self.provider_cache.lookup(key, prefix)
+            except Exception as e:
+                print(f"Provider prompt cache unavailable, sending prefix inline: {e}")
+
+        if cached_content:
+            return [HumanMessage(content=suffix)], cached_content
+        return [SystemMessage(content=prefix), HumanMessage(content=suffix)], None
+
+
+_provider_caches = {}
+_provider_caches_lock = threading.Lock()
+
+
+def default_provider_cache():
+    """Provider cache selected by the PROMPT_CACHE environment variable
+    
+    One instance per provider is shared by every game in the process, so new games and
+    restores reuse uploaded prefixes instead of creating another cached context each.
+    """
+    provider = os.environ.get("PROMPT_CACHE", "").lower()
+    if provider != "gemini":
+        return None
+    with _provider_caches_lock:
+        if provider not in _provider_caches:
+            min_tokens = int(os.environ.get("PROMPT_CACHE_MIN_TOKENS", "4096"))
+            _provider_caches[provider] = GeminiContextCache(min_tokens=min_tokens)
+        return _provider_caches[provider]
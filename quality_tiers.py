@@ -0,0 +1,50 @@
+"""
+Image quality tiers
+
+Scene images are shown as a 2:1 banner, so every tier renders at that aspect
+instead of the pipeline's square default. A `preview` is cheap enough to come back
+quickly even under load; a `standard` render then replaces it when the image queue
+has room. Nothing here imports torch, so the web servers and the Modal functions
+share the same settings.
+"""
+
+PREVIEW = "preview"
+STANDARD = "standard"
+AUTO = "auto"
+
+# Width and height must be multiples of 16 for FLUX
+TIERS = {
+    PREVIEW: {"width": 512, "height": 256, "steps": {"dev": 8, "schnell": 2}},
+    STANDARD: {"width": 1024, "height": 512, "steps": {"dev": 20, "schnell": 4}}
+}
+
+DEFAULT_TIER = STANDARD
+
+
+def tier_settings(tier, variant):
+    """(width, height, num_inference_steps) for a tier on a model variant"""
+    if tier not in TIERS:
+        raise ValueError(f"Unknown quality tier: {tier}")
+    settings = TIERS[tier]
+    return settings["width"], settings["height"], settings["steps"][variant]
+
+
+def resolutions():
+    """Every (height, width) a pipeline may be asked to render"""
+    return sorted({(settings["height"], settings["width"]) for settings in TIERS.values()})
+
+
+def plan_tiers(quality, queue_depth, refine_max_queue):
+    """Tiers to render, in order, for a request of `quality` at the current queue depth
+
+    `auto` always starts with a preview, and only queues the standard render behind
+    it while fewer than `refine_max_queue` jobs are waiting, so latency stays bounded
+    under load.
+    """
+    if quality in TIERS:
+        return [quality]
+    if quality != AUTO:
+        raise ValueError(f"Unknown quality tier: {quality}")
+    if queue_depth < refine_max_queue:
+        return [PREVIEW, STANDARD]
+    return [PREVIEW]
@@ -0,0 +1,304 @@
+"""
+Quest log with status and trigger indexes
+
+A quest has objectives (visit a place, obtain an item, talk to someone) and may
+require other quests to be completed first; it is locked until they are, then
+active until every objective is done. Quests are indexed by status and by the
+location, item or NPC each objective waits for, so after a state change only
+the quests that change could affect are re-evaluated, and completing a quest
+only looks at the quests that depend on it.
+
+The prompt gets `prompt_block()`: the active quests and what is left of them,
+capped in count and length and rendered again only after a quest changes.
+"""
+
+from typing import NamedTuple
+
+from inventory import WORD_RE, item_id
+from mutations import MOVE, ADD_ITEM
+
+LOCKED = "locked"
+ACTIVE = "active"
+COMPLETED = "completed"
+FAILED = "failed"
+STATUSES = (LOCKED, ACTIVE, COMPLETED, FAILED)
+
+VISIT = "visit"
+OBTAIN = "obtain"
+TALK = "talk"
+OBJECTIVE_VERBS = {VISIT: "visit", OBTAIN: "obtain", TALK: "talk to"}
+
+MAX_PROMPT_QUESTS = 5
+MAX_PROMPT_CHARS = 600
+
+
+def quest_key(name):
+    """Stable ID for a quest name: lowercase words joined by dashes"""
+    return "-".join(WORD_RE.findall(name.casefold())) or name.strip().casefold()
+
+
+def trigger_key(kind, target):
+    """Index key of the event an objective waits for"""
+    return (kind, item_id(target) if kind == OBTAIN else target.strip().casefold())
+
+
+def change_triggers(changes):
+    """Trigger keys for Change events published by StateMutations"""
+    keys = []
+    for change in changes:
+        if change.kind == MOVE:
+            keys.append(trigger_key(VISIT, change.after["area"]))
+            keys.append(trigger_key(VISIT, change.after["region"]))
+        elif change.kind == ADD_ITEM:
+            keys.append(trigger_key(OBTAIN, change.key))
+    return keys
+
+
+class Objective(NamedTuple):
+    kind: str
+    target: str
+    done: bool = False
+
+    @property
+    def key(self):
+        return trigger_key(self.kind, self.target)
+
+    def satisfied_by(self, game_state):
+        """Whether the current state meets the objective; talking is only known from events"""
+        if self.kind == VISIT:
+            wanted = self.target.strip().casefold()
+            location = game_state.location
+            return wanted in (location.area.casefold(), location.region.casefold())
+        if self.kind == OBTAIN:
+            return self.target in game_state.inventory
+        return False
+
+    def __str__(self):
+        return f"{OBJECTIVE_VERBS.get(self.kind, self.kind)} {self.target}"
+
+
+class Quest:
+    def __init__(self, name, objectives=None, prerequisites=None, description="", quest_id=None, status=None):
+        self.id = quest_id or quest_key(name)
+        self.name = name
+        self.description = description
+        self.objectives = [objective if isinstance(objective, Objective) else Objective(*objective)
+                           for objective in objectives or []]
+        # Stored as IDs, so prerequisites can be given by name
+        self.prerequisites = [quest_key(prerequisite) for prerequisite in prerequisites or []]
+        self.status = status
+
+    @property
+    def completed(self):
+        return self.status == COMPLETED
+
+    def remaining(self):
+        return [objective for objective in self.objectives if not objective.done]
+
+    def to_snapshot(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "objectives": [[objective.kind, objective.target, objective.done] for objective in self.objectives],
+            "prerequisites": list(self.prerequisites),
+            "status": self.status,
+            "completed": self.completed
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Rebuild a quest, including the {"name", "completed"} dicts of older snapshots"""
+        status = data.get("status") or (COMPLETED if data.get("completed") else None)
+        return cls(data["name"], data.get("objectives"), data.get("prerequisites"),
+                   data.get("description", ""), data.get("id"), status)
+
+
+class QuestLog:
+    """Quests indexed by ID, status, trigger and dependency"""
+
+    def __init__(self, max_prompt_quests=MAX_PROMPT_QUESTS, max_prompt_chars=MAX_PROMPT_CHARS):
+        self.max_prompt_quests = max_prompt_quests
+        self.max_prompt_chars = max_prompt_chars
+        self.quests = {}  # id -> Quest, in the order they were added
+        self.by_status = {status: {} for status in STATUSES}  # status -> {id: None}
+        self.by_trigger = {}  # trigger key -> {id: None} for quests with an objective waiting on it
+        self.dependents = {}  # prerequisite id -> {id: None}
+        self._prompt_block = None
+
+    def __len__(self):
+        return len(self.quests)
+
+    def __iter__(self):
+        return iter(self.quests.values())
+
+    def get(self, name_or_id):
+        return self.quests.get(name_or_id) or self.quests.get(quest_key(name_or_id))
+
+    def with_status(self, status):
+        return [self.quests[key] for key in self.by_status[status]]
+
+    def add(self, quest, game_state=None):
+        """Add a quest (a Quest or a snapshot dict); it starts active if its prerequisites are completed
+
+        Raises ValueError for a duplicate ID or a prerequisite cycle.
+        """
+        if not isinstance(quest, Quest):
+            quest = Quest.from_snapshot(quest)
+        if quest.id in self.quests:
+            raise ValueError(f"Quest {quest.id} already exists")
+        if self._creates_cycle(quest):
+            raise ValueError(f"Quest {quest.id} would depend on itself")
+
+        self.quests[quest.id] = quest
+        for prerequisite in quest.prerequisites:
+            self.dependents.setdefault(prerequisite, {})[quest.id] = None
+
+        status = quest.status
+        quest.status = None
+        if status in (COMPLETED, FAILED):
+            self._set_status(quest, status)
+        else:
+            for objective in quest.remaining():
+                self.by_trigger.setdefault(objective.key, {})[quest.id] = None
+            self._set_status(quest, ACTIVE if self._unlocked(quest) else LOCKED)
+            if quest.status == ACTIVE and game_state is not None:
+                self._evaluate(quest, game_state)
+        # Dependents added earlier may be waiting for this quest
+        if quest.status == COMPLETED:
+            self._unlock_dependents(quest, game_state)
+        return quest
+
+    def complete(self, name_or_id, game_state=None):
+        """Mark a quest completed; returns False if it is unknown or already finished"""
+        quest = self.get(name_or_id)
+        if quest is None or quest.status in (COMPLETED, FAILED):
+            return False
+        self._finish(quest, COMPLETED, game_state)
+        return True
+
+    def fail(self, name_or_id):
+        quest = self.get(name_or_id)
+        if quest is None or quest.status in (COMPLETED, FAILED):
+            return False
+        self._finish(quest, FAILED)
+        return True
+
+    def trigger(self, keys, game_state=None):
+        """Re-evaluate the active quests waiting on any of the trigger keys
+
+        Returns the quests that were completed.
+        """
+        affected = {}
+        for key in keys:
+            for qid in self.by_trigger.get(key, ()):
+                if qid in self.by_status[ACTIVE]:
+                    affected[qid] = None
+        completed = []
+        for qid in affected:
+            quest = self.quests[qid]
+            if quest.status == ACTIVE and self._evaluate(quest, game_state, set(keys)):
+                completed.append(quest)
+        return completed
+
+    def handle_changes(self, changes, game_state):
+        """StateMutations subscriber: re-evaluate quests affected by committed changes"""
+        return self.trigger(change_triggers(changes), game_state)
+
+    def record_talk(self, npc_name, game_state=None):
+        return self.trigger([trigger_key(TALK, npc_name)], game_state)
+
+    def prompt_block(self):
+        """Active quests and their remaining objectives, bounded for the prompt"""
+        if self._prompt_block is None:
+            active = self.with_status(ACTIVE)
+            lines = []
+            length = 0
+            for quest in active[:self.max_prompt_quests]:
+                remaining = "; ".join(str(objective) for objective in quest.remaining())
+                line = f"⋯ {quest.name}" + (f" ({remaining})" if remaining else "")
+                if length + len(line) > self.max_prompt_chars:
+                    break
+                lines.append(line)
+                length += len(line) + 1
+            hidden = len(active) - len(lines)
+            if hidden:
+                lines.append(f"and {hidden} more active quests")
+            if self.by_status[COMPLETED]:
+                lines.append(f"✓ {len(self.by_status[COMPLETED])} completed")
+            self._prompt_block = "\n".join(lines) or "No active quests."
+        return self._prompt_block
+
+    def to_snapshot(self):
+        return [quest.to_snapshot() for quest in self.quests.values()]
+
+    @classmethod
+    def from_snapshot(cls, data, game_state=None):
+        quest_log = cls()
+        for quest in data:
+            quest_log.add(quest, game_state)
+        return quest_log
+
+    def _unlocked(self, quest):
+        return all(prerequisite in self.by_status[COMPLETED] for prerequisite in quest.prerequisites)
+
+    def _creates_cycle(self, quest):
+        """Whether adding `quest` closes a loop in the prerequisite graph"""
+        stack = list(quest.prerequisites)
+        seen = set()
+        while stack:
+            qid = stack.pop()
+            if qid == quest.id:
+                return True
+            if qid in seen or qid not in self.quests:
+                continue
+            seen.add(qid)
+            stack.extend(self.quests[qid].prerequisites)
+        return False
+
+    def _set_status(self, quest, status):
+        if quest.status is not None:
+            del self.by_status[quest.status][quest.id]
+        quest.status = status
+        self.by_status[status][quest.id] = None
+        self._prompt_block = None
+
+    def _evaluate(self, quest, game_state, keys=None):
+        """Mark objectives that are now met, completing the quest when none remain"""
+        changed = False
+        for index, objective in enumerate(quest.objectives):
+            if objective.done or (keys is not None and objective.key not in keys):
+                continue
+            met = objective.kind == TALK and keys is not None
+            if met or (game_state is not None and objective.satisfied_by(game_state)):
+                quest.objectives[index] = objective._replace(done=True)
+                self._unindex(quest.id, objective.key)
+                changed = True
+        if changed:
+            self._prompt_block = None
+            if quest.objectives and not quest.remaining():
+                self._finish(quest, COMPLETED, game_state)
+                return True
+        return False
+
+    def _unindex(self, qid, key):
+        waiting = self.by_trigger.get(key)
+        if waiting is not None:
+            waiting.pop(qid, None)
+            if not waiting:
+                del self.by_trigger[key]
+
+    def _finish(self, quest, status, game_state=None):
+        for objective in quest.remaining():
+            self._unindex(quest.id, objective.key)
+        self._set_status(quest, status)
+        if status == COMPLETED:
+            self._unlock_dependents(quest, game_state)
+
+    def _unlock_dependents(self, quest, game_state):
+        for qid in self.dependents.get(quest.id, ()):
+            dependent = self.quests.get(qid)
+            if dependent is not None and dependent.status == LOCKED and self._unlocked(dependent):
+                self._set_status(dependent, ACTIVE)
+                if game_state is not None:
+                    self._evaluate(dependent, game_state)
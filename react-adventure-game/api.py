@@ -1,15 +1,19 @@
 import os
 import json
 import logging
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import sys
 
 # Add parent directory to path so we can import game modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from game import AdventureGame
+from game import AdventureGame, AVAILABLE_WORLDS
 from character import Character
+from response_parser import parse_response, ParsedResponse
+from game_payloads import sse, story_payload, collect_event
+from mutations import MutationError, add_item, remove_item, change_gold, changes_payload
+from session_store import create_session_store, SessionConflict
 from dotenv import load_dotenv
 from image_api import image_api  # Import the image API blueprint
 from music_api import music_api  # Import the music API blueprint
@@ -30,21 +34,21 @@ app.register_blueprint(image_api, url_prefix='/api/image')
 # Register the music API blueprint
 app.register_blueprint(music_api, url_prefix='/api/music')
 
-# Store active games by session ID
-active_games = {}
-logger.info(f"Active games on startup: {active_games}")
+# Active games by session ID, kept in memory and persisted so that every worker
+# process (and a restarted server) can pick up any session
+sessions = create_session_store()
+logger.info(f"Session store ready: {type(sessions.backend).__name__}")
 
 @app.route('/api/worlds', methods=['GET'])
 def get_worlds():
     """Get all available game worlds"""
-    temp_game = AdventureGame()
     return jsonify({
         'worlds': [
             {
                 'key': key,
                 'name': key.capitalize(),
                 'description': description
-            } for key, description in temp_game.available_worlds.items()
+            } for key, description in AVAILABLE_WORLDS.items()
         ]
     })
 
@@ -65,13 +69,13 @@ def create_character():
         return jsonify({'error': 'All fields are required'}), 400
     
     # Create game instance for this session
-    game = AdventureGame()
+    game = AdventureGame(llm=sessions.llm_factory())
     game.select_world(world_key)
     
     try:
         game.create_character(name, attributes, description)
-        active_games[session_id] = game
-        logger.info(f"Created character and added to active_games. Active sessions: {list(active_games.keys())}")
+        sessions.create(session_id, game)
+        logger.info(f"Created character for session {session_id}")
         
         return jsonify({
             'success': True,
@@ -92,62 +96,42 @@ def initialize_game():
     session_id = data.get('sessionId')
     
     logger.info(f"Initializing game for session {session_id}")
-    logger.info(f"Current active sessions: {list(active_games.keys())}")
     
     if not session_id:
         logger.error("No sessionId provided")
         return jsonify({'error': 'SessionId is required'}), 400
     
-    if session_id not in active_games:
-        logger.error(f"Session {session_id} not found in active_games")
-        return jsonify({'error': 'No character found. Create a character first.'}), 400
-    
-    game = active_games[session_id]
-    
-    try:
-        # Initialize the game with an intro prompt
-        logger.info("Calling game.initialize_game()")
-        response = game.initialize_game()
-        logger.info(f"Response from initialize_game: {response[:100]}...") # Print the first 100 chars
+    with sessions.session_locks(session_id):
+        game = sessions.get(session_id)
+        if game is None:
+            logger.error(f"Session {session_id} not found in the session store")
+            return jsonify({'error': 'No character found. Create a character first.'}), 400
         
-        # Extract options from response
-        options = []
-        if "OPTIONS:" in response:
-            options_text = response.split("OPTIONS:")[1].strip()
-            lines = options_text.split("\n")
+        try:
+            # Initialize the game with an intro prompt
+            logger.info("Calling game.initialize_game()")
+            response = game.initialize_game()
+            sessions.save(session_id, game)
+            logger.info(f"Response from initialize_game: {response[:100]}...") # Print the first 100 chars
             
-            for line in lines:
-                if line.strip() and any(line.strip().startswith(str(i)) for i in range(1, 10)):
-                    option_text = line.strip()[2:].strip()  # Remove number and dot
-                    options.append(option_text)
-        
-        # Extract description
-        description = ""
-        if "DESCRIPTION:" in response:
-            description = response.split("DESCRIPTION:")[1].split("OPTIONS:")[0].strip()
-        else:
-            description = response
+            payload = story_payload(response, scene_kind='intro')
+            print(f"Extracted description: {payload['description'][:100]}...") # Print the first 100 chars
             
-        print(f"Extracted description: {description[:100]}...") # Print the first 100 chars
-        
-        # Limit the description length if it's extremely long
-        if len(description) > 2000:
-            description = description[:2000] + "..."
-        
-        result = {
-            'success': True,
-            'story': response,
-            'description': description,
-            'options': options
-        }
-        
-        print(f"Options extracted: {options}")
-        return jsonify(result)
-    except Exception as e:
-        print(f"Error in initialize_game: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+            result = {
+                'success': True,
+                **payload
+            }
+            
+            print(f"Options extracted: {payload['options']}")
+            return jsonify(result)
+        except SessionConflict:
+            return jsonify({'error': 'Game was updated by another request, please retry'}), 409
+        except Exception as e:
+            sessions.discard(session_id)
+            print(f"Error in initialize_game: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': str(e)}), 500
 
 @app.route('/api/game/action', methods=['POST'])
 def process_action():
@@ -161,78 +145,108 @@ def process_action():
             'error': 'Missing sessionId or action'
         }), 400
     
-    if session_id not in active_games:
+    with sessions.session_locks(session_id):
+        game = sessions.get(session_id)
+        if game is None:
+            return jsonify({
+                'error': 'No active game found for this session'
+            }), 404
+        
+        try:
+            # Process the action, collecting the state changes it commits
+            with game.game_state.mutations.recording() as changes:
+                response = game.process_user_action(action)
+            
+            parsed = parse_response(response)
+            sessions.save(session_id, game)
+            
+            return jsonify({
+                'success': True,
+                **story_payload(response, parsed, game.scene_kind),
+                'stateChanges': changes_payload(changes)  # Return state changes to the frontend
+            })
+        except SessionConflict:
+            return jsonify({
+                'error': 'Game was updated by another request, please retry'
+            }), 409
+        except Exception as e:
+            sessions.discard(session_id)
+            return jsonify({
+                'error': str(e)
+            }), 500
+
+@app.route('/api/game/action/stream', methods=['POST'])
+def stream_action():
+    """Process a player action, streaming the storyteller response as Server-Sent Events
+    
+    Emits `description` events with narrative text as the LLM produces it, `option` and
+    `state_change` events as soon as each line is complete, followed by a single `done`
+    event with the parsed description and options (or an `error` event).
+    """
+    data = request.json
+    session_id = data.get('sessionId')
+    action = data.get('action')
+    
+    if not session_id or not action:
+        return jsonify({
+            'error': 'Missing sessionId or action'
+        }), 400
+    
+    if sessions.get(session_id) is None:
         return jsonify({
             'error': 'No active game found for this session'
         }), 404
     
-    game = active_games[session_id]
-    
-    try:
-        # Process the action using the correct method
-        response = game.process_user_action(action)
-        
-        # Extract state changes from response if present
-        state_changes = {}
-        if "STATE_CHANGES:" in response:
-            state_changes_text = response.split("STATE_CHANGES:")[1].split("\n")[0].strip()
+    def generate():
+        chunks = []
+        events = []
+        parsed = ParsedResponse("", [], [])
+        # Held until the turn is saved, so a second request waits for this one's game
+        with sessions.session_locks(session_id):
+            game = sessions.get(session_id)
+            if game is None:
+                # Deleted or expired since the request was checked
+                yield sse('error', {'error': 'No active game found for this session'})
+                return
+            saved = False
             try:
-                # Parse state changes as a dictionary
-                import json
-                state_changes = json.loads(state_changes_text)
-                
-                # Apply state changes to the game
-                if 'gold' in state_changes and hasattr(game.character, 'modify_gold'):
-                    game.character.modify_gold(state_changes['gold'])
-                    
-                if 'inventory_add' in state_changes and hasattr(game.character, 'add_to_inventory'):
-                    for item in state_changes['inventory_add']:
-                        game.character.add_to_inventory(item)
+                with game.game_state.mutations.recording() as changes:
+                    stream = game.stream_user_action(action, on_event=events.append)
+                    while True:
+                        text = next(stream, None)
+                        for event in events:
+                            if event.kind == 'description':
+                                yield sse('description', {'text': event.value})
+                            elif event.kind in ('option', 'state_change'):
+                                yield sse(event.kind, event.value)
+                            parsed = collect_event(parsed, event)
+                        events.clear()
                         
-                if 'inventory_remove' in state_changes and hasattr(game.character, 'remove_from_inventory'):
-                    for item in state_changes['inventory_remove']:
-                        game.character.remove_from_inventory(item)
+                        if text is None:
+                            break
+                        chunks.append(text)
                 
-                # Handle attribute changes
-                if 'attributes' in state_changes and hasattr(game.character, 'modify_attribute'):
-                    for attr, value in state_changes['attributes'].items():
-                        game.character.modify_attribute(attr, value)
+                response = "".join(chunks)
+                sessions.save(session_id, game)
+                saved = True
+                yield sse('done', {
+                    'success': True,
+                    **story_payload(response, parsed, game.scene_kind),
+                    'stateChanges': changes_payload(changes)
+                })
             except Exception as e:
-                print(f"Error processing state changes: {str(e)}")
-        
-        # Extract options from response
-        options = []
-        if "OPTIONS:" in response:
-            options_text = response.split("OPTIONS:")[1].strip()
-            lines = options_text.split("\n")
-            
-            for line in lines:
-                if line.strip() and any(line.strip().startswith(str(i)) for i in range(1, 10)):
-                    option_text = line.strip()[2:].strip()  # Remove number and dot
-                    options.append(option_text)
-        
-        # Extract description
-        description = ""
-        if "DESCRIPTION:" in response:
-            description = response.split("DESCRIPTION:")[1].split("OPTIONS:")[0].strip()
-        else:
-            description = response
-        
-        # Limit the description length if it's extremely long
-        if len(description) > 2000:
-            description = description[:2000] + "..."
-        
-        return jsonify({
-            'success': True,
-            'story': response,
-            'description': description,
-            'options': options,
-            'stateChanges': state_changes  # Return state changes to the frontend
-        })
-    except Exception as e:
-        return jsonify({
-            'error': str(e)
-        }), 500
+                logger.error(f"Error streaming action: {str(e)}")
+                yield sse('error', {'error': str(e)})
+            finally:
+                # Failed or abandoned by the client part way: serve the saved snapshot next time
+                if not saved:
+                    sessions.discard(session_id)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/game/inventory/add', methods=['POST'])
 def add_to_inventory():
@@ -246,29 +260,30 @@ def add_to_inventory():
             'error': 'Missing sessionId or item'
         }), 400
     
-    if session_id not in active_games:
-        return jsonify({
-            'error': 'No active game found for this session'
-        }), 404
-    
-    game = active_games[session_id]
-    
-    try:
-        # Add item to inventory
-        if hasattr(game.character, 'add_to_inventory'):
-            game.character.add_to_inventory(item)
+    with sessions.session_locks(session_id):
+        game = sessions.get(session_id)
+        if game is None:
+            return jsonify({
+                'error': 'No active game found for this session'
+            }), 404
+        
+        try:
+            # Add item to inventory
+            game.game_state.mutations.apply([add_item(item)], source="api")
+            sessions.save(session_id, game)
             return jsonify({
                 'success': True,
                 'message': f'Added {item} to inventory'
             })
-        else:
+        except MutationError as e:
+            return jsonify({
+                'error': str(e)
+            }), 400
+        except Exception as e:
+            sessions.discard(session_id)
             return jsonify({
-                'error': 'Character does not support inventory management'
+                'error': str(e)
             }), 500
-    except Exception as e:
-        return jsonify({
-            'error': str(e)
-        }), 500
 
 @app.route('/api/game/inventory/remove', methods=['POST'])
 def remove_from_inventory():
@@ -282,34 +297,30 @@ def remove_from_inventory():
             'error': 'Missing sessionId or item'
         }), 400
     
-    if session_id not in active_games:
-        return jsonify({
-            'error': 'No active game found for this session'
-        }), 404
-    
-    game = active_games[session_id]
-    
-    try:
-        # Remove item from inventory
-        if hasattr(game.character, 'remove_from_inventory'):
-            success = game.character.remove_from_inventory(item)
-            if success:
-                return jsonify({
-                    'success': True,
-                    'message': f'Removed {item} from inventory'
-                })
-            else:
-                return jsonify({
-                    'error': f'Item {item} not found in inventory'
-                }), 404
-        else:
+    with sessions.session_locks(session_id):
+        game = sessions.get(session_id)
+        if game is None:
             return jsonify({
-                'error': 'Character does not support inventory management'
+                'error': 'No active game found for this session'
+            }), 404
+        
+        try:
+            # Remove item from inventory
+            game.game_state.mutations.apply([remove_item(item)], source="api")
+            sessions.save(session_id, game)
+            return jsonify({
+                'success': True,
+                'message': f'Removed {item} from inventory'
+            })
+        except MutationError:
+            return jsonify({
+                'error': f'Item {item} not found in inventory'
+            }), 404
+        except Exception as e:
+            sessions.discard(session_id)
+            return jsonify({
+                'error': str(e)
             }), 500
-    except Exception as e:
-        return jsonify({
-            'error': str(e)
-        }), 500
 
 @app.route('/api/game/currency/modify', methods=['POST'])
 def modify_currency():
@@ -323,41 +334,41 @@ def modify_currency():
             'error': 'Missing sessionId or amount'
         }), 400
     
-    if session_id not in active_games:
-        return jsonify({
-            'error': 'No active game found for this session'
-        }), 404
-    
-    game = active_games[session_id]
-    
-    try:
-        # Modify currency
-        if hasattr(game.character, 'modify_gold'):
-            game.character.modify_gold(amount)
+    with sessions.session_locks(session_id):
+        game = sessions.get(session_id)
+        if game is None:
+            return jsonify({
+                'error': 'No active game found for this session'
+            }), 404
+        
+        try:
+            # Modify currency
+            game.game_state.mutations.apply([change_gold(amount)], source="api")
+            sessions.save(session_id, game)
             return jsonify({
                 'success': True,
                 'message': f'Modified gold by {amount}',
-                'newAmount': game.character.gold if hasattr(game.character, 'gold') else 0
+                'newAmount': game.game_state.gold
             })
-        else:
+        except MutationError as e:
+            return jsonify({
+                'error': str(e)
+            }), 400
+        except Exception as e:
+            sessions.discard(session_id)
             return jsonify({
-                'error': 'Character does not support currency management'
+                'error': str(e)
             }), 500
-    except Exception as e:
-        return jsonify({
-            'error': str(e)
-        }), 500
 
 @app.route('/api/game/status', methods=['GET'])
 def get_status():
     """Get the current game status"""
     session_id = request.args.get('sessionId', 'default')
     
-    if session_id not in active_games:
+    game = sessions.get(session_id)
+    if game is None:
         return jsonify({'error': 'No game found. Create a character first.'}), 400
     
-    game = active_games[session_id]
-    
     if not game.game_state:
         return jsonify({'error': 'Game not initialized'}), 400
     
@@ -370,16 +381,15 @@ def get_inventory():
     """Get the player's inventory"""
     session_id = request.args.get('sessionId', 'default')
     
-    if session_id not in active_games:
+    game = sessions.get(session_id)
+    if game is None:
         return jsonify({'error': 'No game found. Create a character first.'}), 400
     
-    game = active_games[session_id]
-    
     if not game.game_state:
         return jsonify({'error': 'Game not initialized'}), 400
     
     return jsonify({
-        'inventory': game.game_state.inventory
+        'inventory': game.game_state.inventory.to_list()
     })
 
 @app.route('/api/game/history', methods=['GET'])
@@ -387,17 +397,22 @@ def get_history():
     """Get the game history"""
     session_id = request.args.get('sessionId', 'default')
     
-    if session_id not in active_games:
+    game = sessions.get(session_id)
+    if game is None:
         return jsonify({'error': 'No game found. Create a character first.'}), 400
     
-    game = active_games[session_id]
-    
     if not game.game_state:
         return jsonify({'error': 'Game not initialized'}), 400
     
     return jsonify({
-        'history': game.game_state.history
+        'history': game.game_state.history,
+        'summary': game.game_state.memory.summary
     })
 
+@app.route('/api/sessions/metrics', methods=['GET'])
+def session_metrics():
+    """Session store hit, rehydration and eviction counts for this worker"""
+    return jsonify(sessions.metrics())
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,686 @@
+"""
+Async (ASGI) version of the game API server
+
+Serves the same routes as api.py, but game actions, image generation and music
+selection are awaited instead of blocking a worker, so a single process can keep
+many turns in flight at once. Also adds /api/game/turn, which runs an action and
+then generates the scene image and selects music concurrently.
+
+    pip install quart quart-cors hypercorn
+    hypercorn async_api:app --bind 0.0.0.0:5000
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from quart import Quart, request, jsonify, Response, send_file
+from quart_cors import cors
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import AdventureGame, AVAILABLE_WORLDS
+from response_parser import parse_response, ParsedResponse
+from game_payloads import sse, story_payload, collect_event
+from mutations import MutationError, add_item, remove_item, change_gold, changes_payload
+from session_store import create_session_store, SessionConflict, SessionLocks
+from image_prompt_agent import ImagePromptAgent
+from image_jobs import AsyncImageJobQueue, DONE, CANCELLED, FINISHED
+from image_store import IMMUTABLE_MAX_AGE
+from image_variants import SIZES, FULL
+from quality_tiers import AUTO, STANDARD
+from scene_images import (
+    SceneImages, PREVIEW_EVERY, scene_params, job_params, fixed_prompt, renders_progressively, preview_progress,
+    refine_params, image_response
+)
+from warm_pool import warm_pool_scheduler
+from music_api import get_available_tracks, aselect_music_for_scene, scenes_are_similar, track_selections, TRACKS_DIR
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+app = cors(Quart(__name__))
+
+# Active games by session ID, shared with any other server processes through the store
+sessions = create_session_store()
+
+# Requests for one session share its live game, so each turn runs under the session's lock
+session_locks = SessionLocks(asyncio.Lock)
+
+# Rendered images, their variants and each session's latest, shared with image_api.py's logic
+scene_images = SceneImages()
+
+# Modal session for image generation, started when the server starts
+modal_session = None
+
+prompt_agent = ImagePromptAgent()
+
+@app.before_serving
+async def start_modal():
+    """Start the Modal app used for image generation"""
+    global modal_session
+    try:
+        from flux_backend import app as modal_app
+        modal_session = modal_app.run()
+        modal_session.__enter__()
+        logger.info("Modal session initialized for image generation API")
+    except Exception as e:
+        logger.error(f"Error initializing Modal session: {str(e)}")
+
+@app.after_serving
+async def stop_modal():
+    await image_jobs.shutdown()
+    if modal_session is not None:
+        modal_session.__exit__(None, None, None)
+
+async def get_game(session_id):
+    """Return the active game for a session, or None"""
+    return await asyncio.to_thread(sessions.get, session_id)
+
+async def save_game(session_id, game):
+    """Persist a game after it changed"""
+    await asyncio.to_thread(sessions.save, session_id, game)
+
+@app.route('/api/worlds', methods=['GET'])
+async def get_worlds():
+    """Get all available game worlds"""
+    return jsonify({
+        'worlds': [
+            {
+                'key': key,
+                'name': key.capitalize(),
+                'description': description
+            } for key, description in AVAILABLE_WORLDS.items()
+        ]
+    })
+
+@app.route('/api/character/create', methods=['POST'])
+async def create_character():
+    """Create a new character with the given attributes"""
+    data = await request.get_json()
+    session_id = data.get('sessionId')
+    world_key = data.get('worldKey')
+    name = data.get('name')
+    attributes = data.get('attributes')
+    description = data.get('description', f"A brave adventurer named {name}")
+    
+    if not session_id or not world_key or not name or not attributes:
+        return jsonify({'error': 'All fields are required'}), 400
+    
+    game = AdventureGame(llm=sessions.llm_factory())
+    game.select_world(world_key)
+    
+    try:
+        game.create_character(name, attributes, description)
+        await asyncio.to_thread(sessions.create, session_id, game)
+        
+        return jsonify({
+            'success': True,
+            'character': {
+                'name': game.character.name,
+                'attributes': game.character.attributes,
+                'description': game.character.description
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error creating character: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/game/init', methods=['POST'])
+async def initialize_game():
+    """Initialize a new game with the selected world and character"""
+    data = await request.get_json()
+    session_id = data.get('sessionId')
+    
+    if not session_id:
+        return jsonify({'error': 'SessionId is required'}), 400
+    
+    async with session_locks(session_id):
+        game = await get_game(session_id)
+        if game is None:
+            return jsonify({'error': 'No character found. Create a character first.'}), 400
+        
+        try:
+            response = await game.ainitialize_game()
+            await save_game(session_id, game)
+            return jsonify({
+                'success': True,
+                **story_payload(response, scene_kind='intro')
+            })
+        except Exception as e:
+            sessions.discard(session_id)
+            logger.error(f"Error in initialize_game: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+async def run_action(session_id, game, action):
+    """Run a player action and build the response payload
+    
+    Call it holding the session's lock. A turn that fails or is cancelled part way
+    drops the live game, so the next request starts from the saved snapshot.
+    """
+    try:
+        with game.game_state.mutations.recording() as changes:
+            response = await game.aprocess_user_action(action)
+        parsed = parse_response(response)
+        await save_game(session_id, game)
+    except BaseException:
+        sessions.discard(session_id)
+        raise
+    return {
+        'success': True,
+        **story_payload(response, parsed, game.scene_kind),
+        'stateChanges': changes_payload(changes)
+    }
+
+@app.route('/api/game/action', methods=['POST'])
+async def process_action():
+    """Process a player action and return the updated game state"""
+    data = await request.get_json()
+    session_id = data.get('sessionId')
+    action = data.get('action')
+    
+    if not session_id or not action:
+        return jsonify({'error': 'Missing sessionId or action'}), 400
+    
+    async with session_locks(session_id):
+        game = await get_game(session_id)
+        if game is None:
+            return jsonify({'error': 'No active game found for this session'}), 404
+        
+        try:
+            return jsonify(await run_action(session_id, game, action))
+        except SessionConflict:
+            return jsonify({'error': 'Game was updated by another request, please retry'}), 409
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+@app.route('/api/game/action/stream', methods=['POST'])
+async def stream_action():
+    """Process a player action, streaming the storyteller response as Server-Sent Events"""
+    data = await request.get_json()
+    session_id = data.get('sessionId')
+    action = data.get('action')
+    
+    if not session_id or not action:
+        return jsonify({'error': 'Missing sessionId or action'}), 400
+    
+    if await get_game(session_id) is None:
+        return jsonify({'error': 'No active game found for this session'}), 404
+    
+    async def generate():
+        chunks = []
+        events = []
+        parsed = ParsedResponse("", [], [])
+        # Held until the turn is saved, so a second request waits for this one's game
+        async with session_locks(session_id):
+            game = await get_game(session_id)
+            if game is None:
+                # Deleted or expired since the request was checked
+                yield sse('error', {'error': 'No active game found for this session'})
+                return
+            saved = False
+            try:
+                with game.game_state.mutations.recording() as changes:
+                    async for text in game.astream_user_action(action, on_event=events.append):
+                        chunks.append(text)
+                        for event in events:
+                            if event.kind == 'description':
+                                yield sse('description', {'text': event.value})
+                            elif event.kind in ('option', 'state_change'):
+                                yield sse(event.kind, event.value)
+                            parsed = collect_event(parsed, event)
+                        events.clear()
+                
+                    # Events emitted when the parser is closed after the last chunk
+                    for event in events:
+                        if event.kind == 'description':
+                            yield sse('description', {'text': event.value})
+                        elif event.kind in ('option', 'state_change'):
+                            yield sse(event.kind, event.value)
+                        parsed = collect_event(parsed, event)
+                
+                response = "".join(chunks)
+                await save_game(session_id, game)
+                saved = True
+                yield sse('done', {
+                    'success': True,
+                    **story_payload(response, parsed, game.scene_kind),
+                    'stateChanges': changes_payload(changes)
+                })
+            except Exception as e:
+                logger.error(f"Error streaming action: {str(e)}")
+                yield sse('error', {'error': str(e)})
+            finally:
+                # Failed or abandoned by the client part way: serve the saved snapshot next time
+                if not saved:
+                    sessions.discard(session_id)
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None
+    return response
+
+async def generate_scene_image(session_id, description, character_description, world_type, scene_kind=None):
+    """Render a scene at standard quality through the job queue, superseding the session's previous job"""
+    job = image_jobs.submit(session_id, scene_params(description, character_description, world_type, scene_kind,
+                                                     STANDARD))
+    await image_jobs.result(job)
+    if job.status == CANCELLED:
+        raise RuntimeError('Superseded by a newer image request')
+    if job.status != DONE:
+        raise RuntimeError(job.error)
+    return job.result['imagePath']
+
+async def select_scene_music(session_id, scene_description, moved=False):
+    """Pick music for a scene, keeping the current track while the scene is similar
+    
+    `moved` (the turn changed location) always asks for a new selection.
+    """
+    prev_description = None
+    if session_id and session_id in track_selections:
+        prev_description = track_selections.get(f"{session_id}_description")
+    
+    if session_id:
+        track_selections[f"{session_id}_description"] = scene_description
+    
+    force_new_selection = bool(prev_description) and (moved or not scenes_are_similar(prev_description, scene_description))
+    
+    selected_track = await aselect_music_for_scene(
+        scene_description,
+        session_id=session_id,
+        force_new_selection=force_new_selection
+    )
+    return selected_track, force_new_selection or prev_description is None
+
+async def run_image_job(job):
+    """Build the image prompt and render it on Modal for a queued job, without blocking the event loop"""
+    from flux_backend import Model
+    session_id = job.session_id
+    params = job.params
+    
+    image_prompt = fixed_prompt(prompt_agent, params)
+    if image_prompt is None:
+        image_prompt = await prompt_agent.acreate_prompt(
+            description=params['description'],
+            character_description=params['character_description'],
+            world_type=params['world_type']
+        )
+    
+    # Store lookups and writes touch files, so they run in a thread
+    tiers, key, stored = await asyncio.to_thread(scene_images.plan, params, image_prompt,
+                                                 image_jobs.metrics()['queueDepth'])
+    tier = tiers[0]
+    if not stored:
+        t0 = time.time()
+        if renders_progressively(params, tier):
+            image_bytes = await render_progressive(job, image_prompt, tier)
+        else:
+            image_bytes = await Model().inference.remote.aio(image_prompt, tier)
+        logger.info(f"Image generation latency: {time.time() - t0:.2f} seconds")
+        
+        # Store the image even if the job was superseded meanwhile, it may be asked for again
+        await asyncio.to_thread(scene_images.save, key, image_bytes)
+        job.check_cancelled()
+    
+    result = scene_images.result(session_id, key, tier)
+    
+    if len(tiers) > 1:
+        # Queue the refined render behind this preview; a newer scene supersedes it
+        refine = image_jobs.submit(session_id, refine_params(job, tiers[1], image_prompt), supersede=False)
+        result['refineJobId'] = refine.id
+    
+    return result
+
+async def render_progressive(job, image_prompt, tier):
+    """Render through the streaming endpoint, publishing each latent preview on the job
+    
+    Cancelling the job's task stops reading, which ends the remote generator.
+    """
+    from flux_backend import Model
+    image_bytes = None
+    async for frame in Model().inference_progressive.remote_gen.aio(image_prompt, tier, PREVIEW_EVERY):
+        if frame['kind'] == 'preview':
+            image_jobs.report_progress(job, preview_progress(frame))
+        else:
+            image_bytes = frame['image']
+    return image_bytes
+
+# Image generation jobs, each run as a task; a session's new job supersedes its previous one
+image_jobs = AsyncImageJobQueue(run_image_job, max_workers=int(os.environ.get("IMAGE_JOB_WORKERS", "2")))
+
+def submit_image_job(data, default_quality=AUTO):
+    """Queue an image job from a request body, or return None if it has no session"""
+    request_job = job_params(data, default_quality)
+    if request_job is None:
+        return None
+    return image_jobs.submit(*request_job)
+
+@app.route('/api/image/generate', methods=['POST'])
+async def generate_image():
+    """Generate an image based on the current game state, waiting for the result"""
+    job = submit_image_job(await request.get_json(), default_quality=STANDARD)
+    if job is None:
+        return jsonify({'error': 'SessionId is required'}), 400
+    
+    await image_jobs.result(job)
+    if job.status == DONE:
+        return jsonify({'success': True, **job.result})
+    if job.status == CANCELLED:
+        return jsonify({'error': 'Superseded by a newer image request'}), 409
+    
+    logger.error(f"Error generating image: {job.error}")
+    return jsonify({'error': job.error}), 500
+
+@app.route('/api/image/jobs', methods=['POST'])
+async def create_image_job():
+    """Start an image job and return its ID immediately, cancelling the session's previous job"""
+    job = submit_image_job(await request.get_json())
+    if job is None:
+        return jsonify({'error': 'SessionId is required'}), 400
+    
+    return jsonify({'success': True, **job.to_dict()}), 202
+
+@app.route('/api/image/jobs/<job_id>', methods=['GET'])
+async def get_image_job(job_id):
+    """Get the status of an image job"""
+    job = image_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict())
+
+@app.route('/api/image/jobs/<job_id>', methods=['DELETE'])
+async def delete_image_job(job_id):
+    """Cancel an image job"""
+    if not image_jobs.cancel(job_id):
+        return jsonify({'error': 'Job not found or already finished'}), 404
+    
+    return jsonify({'success': True})
+
+@app.route('/api/image/jobs/<job_id>/events', methods=['GET'])
+async def image_job_events(job_id):
+    """Push an image job's status changes as Server-Sent Events until it finishes"""
+    if image_jobs.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    async def generate():
+        version = -1
+        while True:
+            job = await image_jobs.wait(job_id, version, timeout=15)
+            if job is None:
+                return
+            if job.version == version:
+                # Keep the connection alive through proxies
+                yield ": keepalive\n\n"
+                continue
+            
+            version = job.version
+            yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.status in FINISHED:
+                return
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None
+    return response
+
+@app.route('/api/image/metrics', methods=['GET'])
+async def image_job_metrics():
+    """Image queue depth, job timing and image store hit rate"""
+    return jsonify({**image_jobs.metrics(), **scene_images.metrics()})
+
+@app.route('/api/image/prewarm', methods=['POST'])
+async def prewarm_image_model():
+    """Start an image container while the player creates their character"""
+    woken = warm_pool_scheduler().prewarm(["image"])
+    if woken:
+        try:
+            from flux_backend import Model
+            await Model().ping.spawn.aio()
+        except Exception as e:
+            logger.error(f"Error pre-warming image model: {str(e)}")
+            return jsonify({'prewarmed': [], 'error': str(e)}), 500
+    
+    return jsonify({'prewarmed': woken})
+
+async def serve_image(key, max_age=None):
+    """Serve a stored image at the requested ?size= in the best format the client accepts,
+    answering conditional and range requests"""
+    size = request.args.get('size', FULL)
+    if size not in SIZES:
+        return jsonify({'error': f'Unknown size: {size}'}), 400
+    
+    # variant() reads originals from memory or disk itself and renders variants in its worker
+    # pool, so it runs in a thread to keep disk reads off the event loop
+    entry = None
+    if key:
+        future = await asyncio.to_thread(scene_images.variant, key, size, request.headers.get('Accept'))
+        entry = await asyncio.wrap_future(future)
+    if entry is None:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    response = image_response(Response, entry, max_age)
+    return await response.make_conditional(request, accept_ranges=True, complete_length=len(entry[0]))
+
+@app.route('/api/image/view/<session_id>', methods=['GET'])
+async def view_image(session_id):
+    """Serve the session's latest image; it changes, so clients revalidate with If-None-Match"""
+    return await serve_image(scene_images.latest.get(session_id))
+
+@app.route('/api/image/stored/<key>', methods=['GET'])
+async def stored_image(key):
+    """Serve an image from the content-addressed store"""
+    return await serve_image(key, max_age=IMMUTABLE_MAX_AGE)
+
+@app.route('/api/music/select', methods=['POST'])
+async def select_music():
+    """Select appropriate music for a scene"""
+    data = await request.get_json()
+    scene_description = data.get('description', '')
+    session_id = data.get('sessionId')
+    
+    if not scene_description:
+        return jsonify({'error': 'Scene description is required'}), 400
+    
+    selected_track, is_new_selection = await select_scene_music(session_id, scene_description)
+    if not selected_track:
+        return jsonify({'error': 'No suitable track found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'track': selected_track,
+        'is_new_selection': is_new_selection
+    })
+
+@app.route('/api/music/tracks', methods=['GET'])
+async def get_tracks():
+    """Get list of all available tracks"""
+    return jsonify({
+        'success': True,
+        'tracks': get_available_tracks()
+    })
+
+@app.route('/api/music/track/<track_id>', methods=['GET'])
+async def get_track(track_id):
+    """Serve a music track file"""
+    track_path = os.path.join(TRACKS_DIR, track_id)
+    if not os.path.exists(track_path):
+        return jsonify({'error': 'Track not found'}), 404
+    
+    return await send_file(track_path)
+
+@app.route('/api/game/turn', methods=['POST'])
+async def play_turn():
+    """Run a player action, then generate the scene image and select music concurrently
+    
+    Saves the client two extra round trips per turn. Image or music failures are
+    reported alongside the story rather than failing the whole turn.
+    """
+    data = await request.get_json()
+    session_id = data.get('sessionId')
+    action = data.get('action')
+    
+    if not session_id or not action:
+        return jsonify({'error': 'Missing sessionId or action'}), 400
+    
+    async with session_locks(session_id):
+        game = await get_game(session_id)
+        if game is None:
+            return jsonify({'error': 'No active game found for this session'}), 404
+        
+        try:
+            result = await run_action(session_id, game, action)
+        except SessionConflict:
+            return jsonify({'error': 'Game was updated by another request, please retry'}), 409
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    image, music = await asyncio.gather(
+        generate_scene_image(session_id, result['description'],
+                             game.character.description, game.world_key, result['sceneKind']),
+        select_scene_music(session_id, result['description'], 'location' in result['stateChanges']),
+        return_exceptions=True
+    )
+    
+    if isinstance(image, Exception):
+        result['imageError'] = str(image)
+    else:
+        result['imagePath'] = image
+    
+    if isinstance(music, Exception):
+        result['musicError'] = str(music)
+    else:
+        result['track'], result['isNewTrack'] = music
+    
+    return jsonify(result)
+
+@app.route('/api/game/inventory/add', methods=['POST'])
+async def add_to_inventory():
+    """Add an item to the player's inventory"""
+    data = await request.get_json()
+    session_id = data.get('sessionId')
+    item = data.get('item')
+    
+    if not session_id or not item:
+        return jsonify({'error': 'Missing sessionId or item'}), 400
+    
+    async with session_locks(session_id):
+        game = await get_game(session_id)
+        if game is None:
+            return jsonify({'error': 'No active game found for this session'}), 404
+        
+        try:
+            game.game_state.mutations.apply([add_item(item)], source="api")
+            await save_game(session_id, game)
+            return jsonify({'success': True, 'message': f'Added {item} to inventory'})
+        except MutationError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            sessions.discard(session_id)
+            return jsonify({'error': str(e)}), 500
+
+@app.route('/api/game/inventory/remove', methods=['POST'])
+async def remove_from_inventory():
+    """Remove an item from the player's inventory"""
+    data = await request.get_json()
+    session_id = data.get('sessionId')
+    item = data.get('item')
+    
+    if not session_id or not item:
+        return jsonify({'error': 'Missing sessionId or item'}), 400
+    
+    async with session_locks(session_id):
+        game = await get_game(session_id)
+        if game is None:
+            return jsonify({'error': 'No active game found for this session'}), 404
+        
+        try:
+            game.game_state.mutations.apply([remove_item(item)], source="api")
+            await save_game(session_id, game)
+            return jsonify({'success': True, 'message': f'Removed {item} from inventory'})
+        except MutationError:
+            return jsonify({'error': f'Item {item} not found in inventory'}), 404
+        except Exception as e:
+            sessions.discard(session_id)
+            return jsonify({'error': str(e)}), 500
+
+@app.route('/api/game/currency/modify', methods=['POST'])
+async def modify_currency():
+    """Modify the player's currency amount"""
+    data = await request.get_json()
+    session_id = data.get('sessionId')
+    amount = data.get('amount')
+    
+    if not session_id or amount is None:
+        return jsonify({'error': 'Missing sessionId or amount'}), 400
+    
+    async with session_locks(session_id):
+        game = await get_game(session_id)
+        if game is None:
+            return jsonify({'error': 'No active game found for this session'}), 404
+        
+        try:
+            game.game_state.mutations.apply([change_gold(amount)], source="api")
+            await save_game(session_id, game)
+            return jsonify({
+                'success': True,
+                'message': f'Modified gold by {amount}',
+                'newAmount': game.game_state.gold
+            })
+        except MutationError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            sessions.discard(session_id)
+            return jsonify({'error': str(e)}), 500
+
+@app.route('/api/game/status', methods=['GET'])
+async def get_status():
+    """Get the current game status"""
+    game = await get_game(request.args.get('sessionId', 'default'))
+    if game is None:
+        return jsonify({'error': 'No game found. Create a character first.'}), 400
+    if not game.game_state:
+        return jsonify({'error': 'Game not initialized'}), 400
+    
+    return jsonify({'status': game.game_state.get_state_description()})
+
+@app.route('/api/game/inventory', methods=['GET'])
+async def get_inventory():
+    """Get the player's inventory"""
+    game = await get_game(request.args.get('sessionId', 'default'))
+    if game is None:
+        return jsonify({'error': 'No game found. Create a character first.'}), 400
+    if not game.game_state:
+        return jsonify({'error': 'Game not initialized'}), 400
+    
+    return jsonify({'inventory': game.game_state.inventory.to_list()})
+
+@app.route('/api/game/history', methods=['GET'])
+async def get_history():
+    """Get the game history"""
+    game = await get_game(request.args.get('sessionId', 'default'))
+    if game is None:
+        return jsonify({'error': 'No game found. Create a character first.'}), 400
+    if not game.game_state:
+        return jsonify({'error': 'Game not initialized'}), 400
+    
+    return jsonify({
+        'history': game.game_state.history,
+        'summary': game.game_state.memory.summary
+    })
+
+@app.route('/api/sessions/metrics', methods=['GET'])
+async def session_metrics():
+    """Session store hit, rehydration and eviction counts for this worker"""
+    return jsonify(sessions.metrics())
+
+if __name__ == '__main__':
+    app.run(debug=True, port=5000)
@@ -0,0 +1,42 @@
+"""
+Helpers shared by the Flask and async game servers for turning storyteller
+responses into JSON payloads and Server-Sent Events.
+"""
+
+import json
+from response_parser import parse_response
+
+
+def sse(event, data):
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def story_payload(response, parsed=None, scene_kind='story'):
+    """Split a storyteller response into its description and options
+    
+    `scene_kind` tells the client which image to ask for: 'intro' and the built-in
+    command names have fixed images shared by every session.
+    """
+    parsed = parsed or parse_response(response)
+    description = parsed.description or response
+    
+    # Limit the description length if it's extremely long
+    if len(description) > 2000:
+        description = description[:2000] + "..."
+    
+    return {
+        'story': response,
+        'description': description,
+        'options': parsed.options,
+        'sceneKind': scene_kind
+    }
+
+def collect_event(parsed, event):
+    """Fold a streamed ResponseEvent into a ParsedResponse"""
+    if event.kind == 'description':
+        return parsed._replace(description=parsed.description + event.value)
+    if event.kind == 'option':
+        return parsed._replace(options=parsed.options + [event.value['text']])
+    if event.kind == 'state_change':
+        return parsed._replace(state_changes=parsed.state_changes + [event.value])
+    return parsed
@@ -1,23 +1,30 @@
 import os
 import sys
 import time
+import json
 import threading
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 
 # Add parent directory to path so we can import game modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import image generation modules
-from flux_backend import app as modal_app, image_gen_main, Model
+from flux_backend import app as modal_app, image_gen_main, Model, VARIANT
 from image_prompt_agent import ImagePromptAgent
+from image_jobs import ImageJobQueue, DONE, CANCELLED, FINISHED
+from image_store import IMMUTABLE_MAX_AGE
+from image_variants import SIZES, FULL
+from warm_pool import warm_pool_scheduler
+from quality_tiers import AUTO, STANDARD
+from scene_images import (
+    SceneImages, PREVIEW_EVERY, job_params, fixed_prompt, renders_progressively, preview_progress, refine_params,
+    image_response
+)
 
 # Create the blueprint
 image_api = Blueprint('image_api', __name__)
 
-# Store image paths by session ID
-image_cache = {}
-
 # Modal session management
 modal_session = None
 modal_lock = threading.Lock()
@@ -25,6 +32,9 @@ modal_lock = threading.Lock()
 # Initialize image prompt agent
 prompt_agent = ImagePromptAgent()
 
+# Rendered images, their variants and each session's latest, shared with async_api.py's logic
+scene_images = SceneImages()
+
 def ensure_modal_running():
     """Ensure that the Modal session is running, starting it if needed"""
     global modal_session
@@ -47,78 +57,194 @@ except Exception as e:
     print(f"Error initializing Modal session: {str(e)}")
     print("Image generation will attempt to restart Modal for each request")
 
-@image_api.route('/generate', methods=['POST'])
-def generate_image():
-    """Generate an image based on the current game state"""
-    global modal_session  # Move global declaration to the top of the function
-    
-    data = request.json
-    # print("Encountering generate_image")
-    # import ipdb; ipdb.set_trace()
-    session_id = data.get('sessionId')
-    
-    if not session_id:
-        return jsonify({'error': 'SessionId is required'}), 400
-    
-    # Get parameters for image generation
-    description = data.get('description', '')
-    character_description = data.get('characterDescription', '')
-    world_type = data.get('worldType', 'fantasy')
-    
-    # Create an optimized prompt using the ImagePromptAgent
-    print(f"Creating optimized image prompt for world: {world_type}")
-    image_prompt = prompt_agent.create_prompt(
-        description=description,
-        character_description=character_description,
-        world_type=world_type
-    )
+def run_image_job(job):
+    """Build the image prompt and run inference for a queued job"""
+    session_id = job.session_id
+    params = job.params
     
+    image_prompt = fixed_prompt(prompt_agent, params)
+    if image_prompt is None:
+        print(f"Creating optimized image prompt for world: {params['world_type']}")
+        image_prompt = prompt_agent.create_prompt(
+            description=params['description'],
+            character_description=params['character_description'],
+            world_type=params['world_type']
+        )
     print(f"Generated image prompt: {image_prompt[:100]}...")
+    job.check_cancelled()
     
-    # Generate image 
-    try:
+    tiers, key, stored = scene_images.plan(params, image_prompt, image_jobs.metrics()['queueDepth'])
+    tier = tiers[0]
+    if not stored:
         # Ensure Modal is running (will reuse existing session if available)
         if modal_session is None:
             ensure_modal_running()
         
-        # Generate the image using the existing Modal session
         print(f"Generating image for session {session_id[:8]}...")
         t0 = time.time()
         
-        # Call the model inference directly without restarting Modal
-        output_path = os.path.join(os.getcwd(), f"image_{session_id}.jpg")
-        
-        # Use Model directly without starting a new Modal session
-        image_bytes = Model().inference.remote(image_prompt)
+        if renders_progressively(params, tier):
+            image_bytes = render_progressive(job, image_prompt, tier)
+        else:
+            # Spawn the inference so a superseded job can cancel it on the GPU side
+            call = Model().inference.spawn(image_prompt, tier)
+            job.attach_remote_call(call)
+            image_bytes = call.get()
         
         print(f"Image generation latency: {time.time() - t0:.2f} seconds")
         
-        # Save the image
-        with open(output_path, "wb") as f:
-            f.write(image_bytes)
+        # Store the image even if the job was superseded meanwhile, it may be asked for again
+        scene_images.save(key, image_bytes)
+        job.check_cancelled()
+    else:
+        print(f"Reusing stored image {key[:12]} for session {session_id[:8]}")
+    
+    result = scene_images.result(session_id, key, tier)
+    
+    if len(tiers) > 1:
+        # Queue the refined render behind this preview; a newer scene supersedes it
+        job.check_cancelled()
+        refine = image_jobs.submit(session_id, refine_params(job, tiers[1], image_prompt), supersede=False)
+        result['refineJobId'] = refine.id
+    
+    return result
+
+def render_progressive(job, image_prompt, tier):
+    """Render through the streaming endpoint, publishing each latent preview on the job"""
+    image_bytes = None
+    for frame in Model().inference_progressive.remote_gen(image_prompt, tier, PREVIEW_EVERY):
+        # Stops reading (and so ends the remote generator) once the job is superseded
+        job.check_cancelled()
+        if frame['kind'] == 'preview':
+            image_jobs.report_progress(job, preview_progress(frame))
+        else:
+            image_bytes = frame['image']
+    return image_bytes
+
+# Image generation jobs, run in the background by a small worker pool
+image_jobs = ImageJobQueue(run_image_job, max_workers=int(os.environ.get("IMAGE_JOB_WORKERS", "2")))
+
+def submit_image_job(data, default_quality=AUTO):
+    """Queue an image job from a request body, or return None if it has no session"""
+    request_job = job_params(data, default_quality)
+    if request_job is None:
+        return None
+    return image_jobs.submit(*request_job)
+
+@image_api.route('/generate', methods=['POST'])
+def generate_image():
+    """Generate an image based on the current game state, waiting for the result"""
+    job = submit_image_job(request.json, default_quality=STANDARD)
+    if job is None:
+        return jsonify({'error': 'SessionId is required'}), 400
+    
+    try:
+        job.future.result()
+    except Exception:
+        pass
+    
+    if job.status == DONE:
+        return jsonify({'success': True, **job.result})
+    if job.status == CANCELLED:
+        return jsonify({'error': 'Superseded by a newer image request'}), 409
+    
+    print(f"Error generating image: {job.error}")
+    return jsonify({'error': job.error}), 500
+
+@image_api.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue an image generation job and return its ID immediately"""
+    job = submit_image_job(request.json)
+    if job is None:
+        return jsonify({'error': 'SessionId is required'}), 400
+    
+    return jsonify({'success': True, **job.to_dict()}), 202
+
+@image_api.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status of an image job, including the image path once it is done"""
+    job = image_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict())
+
+@image_api.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel an image job"""
+    if not image_jobs.cancel(job_id):
+        return jsonify({'error': 'Job not found or already finished'}), 404
+    
+    return jsonify({'success': True})
+
+@image_api.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Push an image job's status changes as Server-Sent Events until it finishes"""
+    if image_jobs.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def generate():
+        version = -1
+        while True:
+            job = image_jobs.wait(job_id, version, timeout=15)
+            if job is None:
+                return
+            if job.version == version:
+                # Keep the connection alive through proxies
+                yield ": keepalive\n\n"
+                continue
             
-        print(f"Saved image to {output_path}")
-        
-        # Cache the image path
-        image_cache[session_id] = output_path
-        
-        # Add timestamp for cache busting
-        timestamp = int(time.time())
-        
-        # Return success response with image path
-        return jsonify({
-            'success': True,
-            'imagePath': f'/api/image/view/{session_id}?t={timestamp}'
-        })
-        
-    except Exception as e:
-        print(f"Error generating image: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+            version = job.version
+            yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.status in FINISHED:
+                return
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-@image_api.route('/view/<session_id>', methods=['GET'])
-def view_image(session_id):
-    """Serve the generated image"""
-    if session_id not in image_cache:
+@image_api.route('/metrics', methods=['GET'])
+def job_metrics():
+    """Image queue depth, job timing and image store hit rate"""
+    return jsonify({**image_jobs.metrics(), **scene_images.metrics()})
+
+@image_api.route('/prewarm', methods=['POST'])
+def prewarm_image_model():
+    """Start an image container while the player creates their character"""
+    woken = warm_pool_scheduler().prewarm(["image"])
+    if woken:
+        try:
+            if modal_session is None:
+                ensure_modal_running()
+            Model().ping.spawn()
+        except Exception as e:
+            print(f"Error pre-warming image model: {str(e)}")
+            return jsonify({'prewarmed': [], 'error': str(e)}), 500
+    
+    return jsonify({'prewarmed': woken})
+
+def serve_image(key, max_age=None):
+    """Serve a stored image at the requested ?size= in the best format the client accepts,
+    answering conditional and range requests"""
+    size = request.args.get('size', FULL)
+    if size not in SIZES:
+        return jsonify({'error': f'Unknown size: {size}'}), 400
+    
+    entry = scene_images.variant(key, size, request.headers.get('Accept')).result() if key else None
+    if entry is None:
         return jsonify({'error': 'Image not found'}), 404
     
-    return send_file(image_cache[session_id], mimetype='image/jpeg')
+    response = image_response(Response, entry, max_age)
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(entry[0]))
+
+@image_api.route('/view/<session_id>', methods=['GET'])
+def view_image(session_id):
+    """Serve the session's latest image; it changes, so clients revalidate with If-None-Match"""
+    return serve_image(scene_images.latest.get(session_id))
+
+@image_api.route('/stored/<key>', methods=['GET'])
+def stored_image(key):
+    """Serve an image from the content-addressed store"""
+    return serve_image(key, max_age=IMMUTABLE_MAX_AGE)
@@ -0,0 +1,359 @@
+"""
+Background job queue for image generation
+
+Requests submit a job and get its ID back immediately; a small worker pool builds
+the image prompt and runs inference. Each session only cares about its latest
+scene, so submitting a new job cancels the session's previous one: a queued job
+never starts, and a running one has its remote call cancelled (if it supports it)
+and its result discarded.
+
+ImageJobQueue runs jobs on a thread pool (the Flask server); AsyncImageJobQueue
+keeps the same lifecycle and metrics for an asyncio server, running each job as a
+task and cancelling the task when the job is superseded.
+"""
+
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job runner when its job has been cancelled"""
+
+
+class ImageJob:
+    """A single image generation request and its progress"""
+
+    def __init__(self, session_id, params):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.params = params
+        self.status = QUEUED
+        self.result = None
+        self.progress = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self.future = None
+        self.remote_call = None
+        self.cancel_requested = False
+
+    def check_cancelled(self):
+        """Stop the runner if the job was cancelled while it was working"""
+        if self.cancel_requested:
+            raise JobCancelled(self.id)
+
+    def attach_remote_call(self, call):
+        """Remember an in-flight remote call so cancelling the job can cancel it too"""
+        self.remote_call = call
+        self.check_cancelled()
+
+    def to_dict(self):
+        return {
+            'jobId': self.id,
+            'sessionId': self.session_id,
+            'status': self.status,
+            'result': self.result,
+            'progress': self.progress,
+            'error': self.error,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at
+        }
+
+
+class JobBook:
+    """Job bookkeeping shared by the queues: lookups, supersession, status changes and metrics
+
+    Subclasses run the jobs, guard these methods as their concurrency model needs and
+    implement `_notify()` to wake anyone waiting for a job to change.
+    """
+
+    def __init__(self, max_workers=2, max_finished=500):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()
+        self.latest_by_session = {}
+        self.stats = {'submitted': 0, DONE: 0, FAILED: 0, CANCELLED: 0, 'superseded': 0}
+        self.wait_times = []
+        self.run_times = []
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def latest(self, session_id):
+        """Most recently submitted job for a session"""
+        return self.jobs.get(self.latest_by_session.get(session_id))
+
+    def _add(self, session_id, params, supersede):
+        job = ImageJob(session_id, params)
+        previous = self.jobs.get(self.latest_by_session.get(session_id))
+        if supersede and previous is not None and previous.status not in FINISHED:
+            self.stats['superseded'] += 1
+            self._cancel(previous)
+
+        self.jobs[job.id] = job
+        self.latest_by_session[session_id] = job.id
+        self.stats['submitted'] += 1
+        self._forget_finished()
+        return job
+
+    def _metrics(self):
+        queued = sum(1 for job in self.jobs.values() if job.status == QUEUED)
+        running = sum(1 for job in self.jobs.values() if job.status == RUNNING)
+        return {
+            'queueDepth': queued,
+            'running': running,
+            'workers': self.max_workers,
+            'submitted': self.stats['submitted'],
+            'completed': self.stats[DONE],
+            'failed': self.stats[FAILED],
+            'cancelled': self.stats[CANCELLED],
+            'superseded': self.stats['superseded'],
+            'avgWaitSeconds': _average(self.wait_times),
+            'avgRunSeconds': _average(self.run_times)
+        }
+
+    def _start(self, job):
+        job.started_at = time.time()
+        self._update(job, RUNNING)
+        self._record(self.wait_times, job.started_at - job.created_at)
+
+    def _complete(self, job, status, result, error):
+        if job.status == CANCELLED:
+            return
+        job.result = result
+        job.error = error
+        self._finish(job, status)
+        self._record(self.run_times, job.finished_at - job.started_at)
+
+    def _progress(self, job, progress):
+        if job.status != RUNNING:
+            return
+        job.progress = progress
+        job.version += 1
+        self._notify()
+
+    def _cancel(self, job):
+        job.cancel_requested = True
+        if job.future is not None:
+            job.future.cancel()
+        if job.remote_call is not None:
+            try:
+                job.remote_call.cancel()
+            except Exception as e:
+                print(f"Could not cancel remote call for job {job.id}: {e}")
+        self._finish(job, CANCELLED)
+
+    def _finish(self, job, status):
+        job.finished_at = time.time()
+        self.stats[status] += 1
+        self._update(job, status)
+
+    def _update(self, job, status):
+        job.status = status
+        job.version += 1
+        self._notify()
+
+    def _notify(self):
+        raise NotImplementedError
+
+    def _changed_since(self, job_id, version):
+        return (job_id not in self.jobs or self.jobs[job_id].version > version
+                or self.jobs[job_id].status in FINISHED)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            job = self.jobs.pop(job_id)
+            if self.latest_by_session.get(job.session_id) == job_id:
+                del self.latest_by_session[job.session_id]
+
+    @staticmethod
+    def _record(samples, value, keep=200):
+        samples.append(value)
+        del samples[:-keep]
+
+
+class ImageJobQueue(JobBook):
+    """Thread pool that runs image jobs, with per-session supersession and metrics
+
+    `run_job(job)` does the actual work and returns the job result; it should call
+    `job.check_cancelled()` between expensive steps. Finished jobs are kept for
+    `max_finished` lookups before being forgotten.
+    """
+
+    def __init__(self, run_job, max_workers=2, max_finished=500):
+        super().__init__(max_workers, max_finished)
+        self.run_job = run_job
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-job')
+        self.changed = threading.Condition()
+
+    def submit(self, session_id, params, supersede=True):
+        """Queue a job, cancelling the session's previous unfinished job unless `supersede` is False"""
+        with self.changed:
+            job = self._add(session_id, params, supersede)
+
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job; returns False if it does not exist or has already finished"""
+        with self.changed:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            self._cancel(job)
+            return True
+
+    def report_progress(self, job, progress):
+        """Publish intermediate output of a running job (e.g. a preview frame) to waiters"""
+        with self.changed:
+            self._progress(job, progress)
+
+    def wait(self, job_id, version=-1, timeout=None):
+        """Block until the job changes past `version` (or finishes), then return it"""
+        with self.changed:
+            self.changed.wait_for(lambda: self._changed_since(job_id, version), timeout=timeout)
+            return self.jobs.get(job_id)
+
+    def metrics(self):
+        """Queue depth, worker usage and job timing"""
+        with self.changed:
+            return self._metrics()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job):
+        with self.changed:
+            if job.cancel_requested:
+                return
+            self._start(job)
+
+        try:
+            result = self.run_job(job)
+            job.check_cancelled()
+            status, result, error = DONE, result, None
+        except JobCancelled:
+            status, result, error = CANCELLED, None, None
+        except Exception as e:
+            if job.cancel_requested:
+                status, result, error = CANCELLED, None, None
+            else:
+                status, result, error = FAILED, None, str(e)
+
+        with self.changed:
+            self._complete(job, status, result, error)
+
+    def _notify(self):
+        self.changed.notify_all()
+
+
+class AsyncImageJobQueue(JobBook):
+    """ImageJobQueue for asyncio servers: each job runs as a task, at most `max_workers` at once
+
+    `run_job(job)` is a coroutine function returning the job result. Cancelling a job
+    cancels its task, which raises CancelledError at the await it is blocked on (a
+    queued job never starts, a remote call being awaited is cancelled). Call the
+    methods from the event loop's thread.
+    """
+
+    def __init__(self, run_job, max_workers=2, max_finished=500):
+        super().__init__(max_workers, max_finished)
+        self.run_job = run_job
+        self.slots = asyncio.Semaphore(max_workers)
+        self.changed = asyncio.Event()
+
+    def submit(self, session_id, params, supersede=True):
+        """Queue a job, cancelling the session's previous unfinished job unless `supersede` is False"""
+        job = self._add(session_id, params, supersede)
+        job.future = asyncio.create_task(self._run(job))
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job; returns False if it does not exist or has already finished"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return False
+        self._cancel(job)
+        return True
+
+    def report_progress(self, job, progress):
+        """Publish intermediate output of a running job (e.g. a preview frame) to waiters"""
+        self._progress(job, progress)
+
+    async def wait(self, job_id, version=-1, timeout=None):
+        """Wait until the job changes past `version` (or finishes), then return it"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._changed_since(job_id, version):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self.jobs.get(job_id)
+
+    async def result(self, job):
+        """Wait for a job to finish without being cancelled along with it; returns the job"""
+        await asyncio.wait([job.future])
+        return job
+
+    def metrics(self):
+        """Queue depth, worker usage and job timing"""
+        return self._metrics()
+
+    async def shutdown(self):
+        for job in list(self.jobs.values()):
+            if job.status not in FINISHED:
+                self._cancel(job)
+        pending = [job.future for job in self.jobs.values() if job.future is not None]
+        if pending:
+            await asyncio.wait(pending)
+
+    async def _run(self, job):
+        try:
+            async with self.slots:
+                if job.cancel_requested:
+                    return
+                self._start(job)
+                try:
+                    result = await self.run_job(job)
+                    job.check_cancelled()
+                    status, result, error = DONE, result, None
+                except JobCancelled:
+                    status, result, error = CANCELLED, None, None
+                except Exception as e:
+                    if job.cancel_requested:
+                        status, result, error = CANCELLED, None, None
+                    else:
+                        print(f"Error running image job {job.id}: {e}")
+                        status, result, error = FAILED, None, str(e)
+                self._complete(job, status, result, error)
+        except asyncio.CancelledError:
+            # Cancelled through _cancel, which already marked the job
+            pass
+
+    def _notify(self):
+        # Wake every waiter, then start a fresh event for the next change
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+def _average(values):
+    return round(sum(values) / len(values), 3) if values else None
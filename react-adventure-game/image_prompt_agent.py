@@ -9,22 +9,46 @@ import logging
 from typing import Dict, Any, Optional
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 # Add parent directory to path to import game modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from llm_backends import create_llm
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# World-specific style guidance
+WORLD_STYLES = {
+    "fantasy": "fantasy art style, magical, mystical, detailed, vibrant colors",
+    "space": "sci-fi art style, futuristic, space, technology, cosmic, stars",
+    "pirate": "pirate art style, naval, ships, treasure, ocean, swashbuckling adventure",
+    "regular": "realistic art style, modern world, detailed environment",
+    "hackathon": "cyber art style, digital, neon, glowing, technology themed"
+}
+
+# Fixed prompts for scenes that look the same in every session, so their images
+# can be rendered once and reused from the image store
+SCENE_PROMPTS = {
+    "intro": "A sweeping establishing shot of the world where the adventure begins, "
+             "an inviting road leading into the distance, {style}. "
+             "Dramatic lighting, detailed environment, professional quality rendering.",
+    "status": "An adventurer's journal open on a wooden table beside a map and a compass, "
+              "{style}. Warm candlelight, detailed, professional quality rendering.",
+    "inventory": "An open travel pack with its belongings laid out on the ground, "
+                 "{style}. Soft lighting, detailed still life, professional quality rendering.",
+    "help": "An ancient guidebook with glowing illustrated pages, {style}. "
+            "Soft lighting, detailed, professional quality rendering."
+}
+
 class ImagePromptAgent:
     """Agent that creates optimized image prompts based on game context"""
     
     def __init__(self):
-        # Initialize Gemini LLM
+        # Initialize the configured LLM backend
         try:
-            self.llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
+            self.llm = create_llm(temperature=0.3)
             
             # Define prompt template for image prompt creation
             self.prompt_template = PromptTemplate(
@@ -54,10 +78,10 @@ class ImagePromptAgent:
             # Create the prompt generation chain
             self.prompt_chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
             self.has_llm = True
-            logger.info("Gemini LLM initialized for image prompt generation")
+            logger.info("LLM initialized for image prompt generation")
             
         except Exception as e:
-            logger.error(f"Error initializing Gemini LLM: {str(e)}")
+            logger.error(f"Error initializing LLM: {str(e)}")
             self.has_llm = False
             logger.warning("Using fallback prompt generation without LLM")
     
@@ -88,22 +112,36 @@ class ImagePromptAgent:
             # Fall back to basic prompt
             return self._create_basic_prompt(description, character_description, world_type)
     
+    async def acreate_prompt(self, 
+                            description: str, 
+                            character_description: Optional[str] = None,
+                            world_type: str = "fantasy") -> str:
+        """Async version of create_prompt, for use from the async API server"""
+        if not self.has_llm:
+            return self._create_basic_prompt(description, character_description, world_type)
+            
+        try:
+            inputs = self._llm_prompt_inputs(description, character_description, world_type)
+            prompt = (await self.prompt_chain.arun(inputs)).strip()
+            logger.info(f"Generated image prompt: {prompt[:100]}...")
+            return prompt
+        except Exception as e:
+            logger.error(f"Error creating optimized prompt: {str(e)}")
+            return self._create_basic_prompt(description, character_description, world_type)
+    
+    def create_scene_prompt(self, scene_kind: Optional[str], world_type: str = "fantasy") -> Optional[str]:
+        """Return the fixed prompt for a shared scene (intro, status, ...) or None"""
+        if scene_kind not in SCENE_PROMPTS:
+            return None
+        return SCENE_PROMPTS[scene_kind].format(style=WORLD_STYLES.get(world_type, WORLD_STYLES["fantasy"]))
+    
     def _create_basic_prompt(self, 
                            description: str, 
                            character_description: Optional[str],
                            world_type: str) -> str:
         """Create a basic prompt without using an LLM"""
         
-        # World-specific style guidance
-        style_map = {
-            "fantasy": "fantasy art style, magical, mystical, detailed, vibrant colors",
-            "space": "sci-fi art style, futuristic, space, technology, cosmic, stars",
-            "pirate": "pirate art style, naval, ships, treasure, ocean, swashbuckling adventure",
-            "regular": "realistic art style, modern world, detailed environment",
-            "hackathon": "cyber art style, digital, neon, glowing, technology themed"
-        }
-        
-        style_guidance = style_map.get(world_type, style_map["fantasy"])
+        style_guidance = WORLD_STYLES.get(world_type, WORLD_STYLES["fantasy"])
         
         # Create the prompt with structured format
         prompt = f"A detailed illustration in {style_guidance}. Scene: {description}"
@@ -116,11 +154,11 @@ class ImagePromptAgent:
         
         return prompt
     
-    def _create_llm_prompt(self, 
-                         description: str, 
-                         character_description: Optional[str],
-                         world_type: str) -> str:
-        """Use Gemini to create an optimized image generation prompt"""
+    def _llm_prompt_inputs(self, 
+                           description: str, 
+                           character_description: Optional[str],
+                           world_type: str) -> Dict[str, Any]:
+        """Build the prompt chain inputs for a scene"""
         
         # World descriptions for context
         world_descriptions = {
@@ -137,13 +175,23 @@ class ImagePromptAgent:
         if character_description is None:
             character_description = "None"
         
-        # Generate the prompt using LangChain
-        prompt = self.prompt_chain.run({
+        return {
             "description": description,
             "character_description": character_description,
             "world_type": world_type,
             "world_context": world_context
-        }).strip()
+        }
+    
+    def _create_llm_prompt(self, 
+                         description: str, 
+                         character_description: Optional[str],
+                         world_type: str) -> str:
+        """Use Gemini to create an optimized image generation prompt"""
+        
+        # Generate the prompt using LangChain
+        prompt = self.prompt_chain.run(
+            self._llm_prompt_inputs(description, character_description, world_type)
+        ).strip()
         
         logger.info(f"Generated image prompt: {prompt[:100]}...")
         
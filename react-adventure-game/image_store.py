@@ -0,0 +1,215 @@
+"""
+Content-addressed on-disk store for generated images
+
+Images are stored under a hash of the normalized final prompt, the model variant,
+the step count and the resolution, so any session that asks for the same scene reuses the file
+instead of rendering it again. The store is capped in bytes and evicts the least
+recently used images first. MemoryImageCache keeps the most recently served bytes
+in memory on top of it, with a strong ETag per image, so repeated views are served
+without touching disk and revalidations can be answered with 304 Not Modified.
+"""
+
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """Canonical form of a prompt: lowercase, single spaces, no trailing punctuation"""
+    return re.sub(r"\s+", " ", prompt).strip().lower().rstrip(" .!,;")
+
+
+def image_key(prompt, variant, steps, size=None):
+    """Content address of the image a prompt renders to, at (width, height) if given"""
+    digest = hashlib.sha256()
+    resolution = f"{size[0]}x{size[1]}\0" if size else ""
+    digest.update(f"{variant}\0{steps}\0{resolution}{normalize_prompt(prompt)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ImageStore:
+    """LRU-capped image files keyed by image_key()"""
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, extension="jpg"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.{self.extension}")
+
+    def get(self, key):
+        """Return the path of a stored image, or None, counting the hit or miss"""
+        with self.lock:
+            if key not in self.entries:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+        path = self.path(key)
+        try:
+            # Keep recency across restarts
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def contains(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def put(self, key, data):
+        """Store image bytes under a key and return their path"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.total_bytes -= self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self.total_bytes += len(data)
+            self.stats['writes'] += 1
+            self._evict()
+        return path
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hitRate': round(self.stats['hits'] / lookups, 3) if lookups else None,
+                'images': len(self.entries),
+                'bytes': self.total_bytes,
+                'maxBytes': self.max_bytes
+            }
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.stats['evictions'] += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def _load(self):
+        """Index images already on disk, oldest access first"""
+        found = []
+        suffix = f".{self.extension}"
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(suffix):
+                    stat = os.stat(os.path.join(directory, filename))
+                    found.append((stat.st_mtime, filename[:-len(suffix)], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+
+# Content-addressed URLs never change what they point to
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def content_etag(data):
+    """Strong ETag for a response body"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def set_cache_headers(response, etag, max_age=None):
+    """ETag and Cache-Control for an image response (Flask or Quart)
+
+    With `max_age` the response may be cached that long without revalidation;
+    without it browsers must revalidate, which costs a 304 when nothing changed.
+    """
+    response.set_etag(etag)
+    if max_age is None:
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+    return response
+
+
+class MemoryImageCache:
+    """Recently served image bytes and their ETags, in front of an ImageStore
+
+    Capped in bytes and evicted least recently used first; misses are read from the
+    store's files, and images written through `put` are cached straight away.
+    """
+
+    def __init__(self, store, max_bytes=64 * 1024 * 1024):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (bytes, etag)
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'diskReads': 0, 'evictions': 0}
+
+    def get(self, key):
+        """Return (bytes, etag) for a stored image, or None if it is not in the store"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry
+            self.stats['misses'] += 1
+
+        path = self.store.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        with self.lock:
+            self.stats['diskReads'] += 1
+        return self._add(key, data)
+
+    def put(self, key, data):
+        """Write image bytes to the store and keep them in memory; returns the path"""
+        path = self.store.put(key, data)
+        self._add(key, data)
+        return path
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hitRate': round(self.stats['hits'] / lookups, 3) if lookups else None,
+                'images': len(self.entries),
+                'bytes': self.total_bytes,
+                'maxBytes': self.max_bytes
+            }
+
+    def _add(self, key, data):
+        entry = (data, content_etag(data))
+        if len(data) > self.max_bytes:
+            return entry
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous[0])
+            self.entries[key] = entry
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+                self.stats['evictions'] += 1
+        return entry
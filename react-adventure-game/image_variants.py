@@ -0,0 +1,211 @@
+"""
+Sized and re-encoded variants of stored scene images
+
+FLUX renders one full-size JPEG per scene, but the game view only needs a display
+sized copy and the history a thumbnail, and most browsers accept WebP or AVIF,
+which are much smaller at the same quality. Variants are made from the original
+in a small worker pool, once per (image, size, format): concurrent requests for
+the same variant wait for the same render, and finished variants are kept in a
+byte-capped LRU alongside their ETags. New images can be pre-rendered as soon as
+they are stored, so the first view does not wait either.
+
+PIL is only imported inside the functions that need it; without it every request
+is served the original JPEG.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from image_store import content_etag
+
+FULL = "full"
+DISPLAY = "display"
+THUMB = "thumb"
+
+# Bounding boxes; scenes are rendered at 2:1, so these keep that aspect
+SIZES = {
+    THUMB: (256, 128),
+    DISPLAY: (800, 400),
+    FULL: None
+}
+
+# Server preference, smallest first
+FORMATS = {
+    "avif": {"mimetype": "image/avif", "pil": "AVIF", "options": {"quality": 55}},
+    "webp": {"mimetype": "image/webp", "pil": "WEBP", "options": {"quality": 75, "method": 4}},
+    "jpeg": {"mimetype": "image/jpeg", "pil": "JPEG", "options": {"quality": 82, "optimize": True,
+                                                                 "progressive": True}}
+}
+ORIGINAL_FORMAT = "jpeg"
+
+
+def encodable_formats():
+    """Formats this Pillow build can write, in preference order"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    Image.init()
+    return [name for name, spec in FORMATS.items() if spec["pil"] in Image.SAVE]
+
+
+def negotiate_format(accept_header, available):
+    """Best of `available` formats that the Accept header lists explicitly
+
+    Browsers send `*/*` with every image request, so wildcards do not count as
+    support for a modern format; JPEG is always acceptable.
+    """
+    accepted = {}
+    for part in (accept_header or "").split(","):
+        mimetype, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[mimetype.strip().lower()] = quality
+
+    for name in available:
+        if accepted.get(FORMATS[name]["mimetype"], 0) > 0:
+            return name
+    return ORIGINAL_FORMAT
+
+
+def render_variant(data, size, image_format):
+    """Resize (within the size's bounding box) and re-encode original image bytes"""
+    from io import BytesIO
+    from PIL import Image
+
+    img = Image.open(BytesIO(data))
+    img.load()
+    box = SIZES[size]
+    if box is not None:
+        img.thumbnail(box, Image.LANCZOS)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    spec = FORMATS[image_format]
+    byte_stream = BytesIO()
+    img.save(byte_stream, format=spec["pil"], **spec["options"])
+    return byte_stream.getvalue()
+
+
+class VariantCache:
+    """Variants rendered in a worker pool and kept in a byte-capped LRU
+
+    `source(key)` returns (bytes, etag) of the original image or None, e.g.
+    MemoryImageCache.get.
+    """
+
+    def __init__(self, source, max_bytes=32 * 1024 * 1024, max_workers=2, formats=None):
+        self.source = source
+        self.max_bytes = max_bytes
+        self.formats = encodable_formats() if formats is None else formats
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-variant")
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (key, size, format) -> (bytes, etag, mimetype)
+        self.pending = {}  # (key, size, format) -> Future
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'renders': 0, 'joined': 0, 'failures': 0, 'evictions': 0,
+                      'originalBytes': 0, 'variantBytes': 0}
+
+    def choose_format(self, accept_header):
+        return negotiate_format(accept_header, self.formats)
+
+    def get(self, key, size, image_format):
+        """A Future of (bytes, etag, mimetype) for a variant, or of None if the image is not stored"""
+        if size not in SIZES:
+            raise ValueError(f"Unknown image size: {size}")
+        if size == FULL and image_format == ORIGINAL_FORMAT or not self.formats:
+            # Originals come from memory or the store; they must not queue behind encodes
+            future = Future()
+            try:
+                future.set_result(self._original(key))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        variant = (key, size, image_format)
+        with self.lock:
+            entry = self.entries.get(variant)
+            if entry is not None:
+                self.entries.move_to_end(variant)
+                self.stats['hits'] += 1
+                future = Future()
+                future.set_result(entry)
+                return future
+            future = self.pending.get(variant)
+            if future is not None:
+                self.stats['joined'] += 1
+                return future
+            future = self.executor.submit(self._render, variant)
+            self.pending[variant] = future
+            return future
+
+    def prerender(self, key, sizes=(DISPLAY, THUMB)):
+        """Queue the variants a new image will be asked for, in the preferred format"""
+        for size in sizes:
+            for image_format in self.formats[:1]:
+                self.get(key, size, image_format)
+
+    def metrics(self):
+        with self.lock:
+            saved = self.stats['originalBytes'] - self.stats['variantBytes']
+            return {
+                **self.stats,
+                'formats': list(self.formats),
+                'savedRatio': round(saved / self.stats['originalBytes'], 3) if self.stats['originalBytes'] else None,
+                'variants': len(self.entries),
+                'bytes': self.total_bytes,
+                'maxBytes': self.max_bytes
+            }
+
+    def _original(self, key):
+        original = self.source(key)
+        if original is None:
+            return None
+        return (*original, FORMATS[ORIGINAL_FORMAT]["mimetype"])
+
+    def _render(self, variant):
+        key, size, image_format = variant
+        try:
+            original = self._original(key)
+            if original is None:
+                return None
+            try:
+                data = render_variant(original[0], size, image_format)
+            except Exception as e:
+                # Serve the original rather than fail the request
+                print(f"Error rendering {size} {image_format} variant of {key[:12]}: {e}")
+                with self.lock:
+                    self.stats['failures'] += 1
+                return original
+
+            entry = (data, content_etag(data), FORMATS[image_format]["mimetype"])
+            with self.lock:
+                self.stats['renders'] += 1
+                self.stats['originalBytes'] += len(original[0])
+                self.stats['variantBytes'] += len(data)
+                self._add(variant, entry)
+            return entry
+        finally:
+            with self.lock:
+                self.pending.pop(variant, None)
+
+    def _add(self, variant, entry):
+        if len(entry[0]) > self.max_bytes:
+            return
+        previous = self.entries.pop(variant, None)
+        if previous is not None:
+            self.total_bytes -= len(previous[0])
+        self.entries[variant] = entry
+        self.total_bytes += len(entry[0])
+        while self.total_bytes > self.max_bytes:
+            _, (evicted, _, _) = self.entries.popitem(last=False)
+            self.total_bytes -= len(evicted)
+            self.stats['evictions'] += 1
+
@@ -7,11 +7,12 @@ from langchain.agents import initialize_agent, Tool
 from langchain.agents import AgentType
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 # Add parent directory to path so we can import game modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from llm_backends import create_llm
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -42,8 +43,8 @@ def get_available_tracks():
                 })
     return tracks
 
-# Initialize LLM for music selection
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
+# Initialize LLM for music selection using the configured backend
+llm = create_llm(temperature=0.3)
 
 # Define music selection prompt
 music_prompt = PromptTemplate(
@@ -68,6 +69,26 @@ music_prompt = PromptTemplate(
 # Create the music selection chain
 music_selector_chain = LLMChain(llm=llm, prompt=music_prompt)
 
+def match_track(tracks, track_name):
+    """Find the track matching the name chosen by the LLM, falling back to the first track"""
+    # Find the track object that matches the selected name
+    selected_track = next((t for t in tracks if t['name'].lower() == track_name.lower()), None)
+    
+    # If no exact match, find closest match
+    if not selected_track and tracks:
+        # Try searching for partial matches
+        for t in tracks:
+            if track_name.lower() in t['name'].lower() or t['name'].lower() in track_name.lower():
+                selected_track = t
+                break
+                
+        # If still no match, return the first track
+        if not selected_track:
+            selected_track = tracks[0]
+            logger.warning(f"No matching track found for '{track_name}', defaulting to {selected_track['name']}")
+    
+    return selected_track
+
 # Music selection function
 def select_music_for_scene(scene_description, session_id=None, force_new_selection=False):
     """Select the most appropriate music track for a scene"""
@@ -96,21 +117,7 @@ def select_music_for_scene(scene_description, session_id=None, force_new_selecti
         
         logger.info(f"Selected track: {track_name}")
         
-        # Find the track object that matches the selected name
-        selected_track = next((t for t in tracks if t['name'].lower() == track_name.lower()), None)
-        
-        # If no exact match, find closest match
-        if not selected_track and tracks:
-            # Try searching for partial matches
-            for t in tracks:
-                if track_name.lower() in t['name'].lower() or t['name'].lower() in track_name.lower():
-                    selected_track = t
-                    break
-                    
-            # If still no match, return the first track
-            if not selected_track:
-                selected_track = tracks[0]
-                logger.warning(f"No matching track found for '{track_name}', defaulting to {selected_track['name']}")
+        selected_track = match_track(tracks, track_name)
         
         # Store the selection for this session
         if session_id:
@@ -123,6 +130,41 @@ def select_music_for_scene(scene_description, session_id=None, force_new_selecti
             return tracks[0]  # Return first track as fallback
         return None
 
+async def aselect_music_for_scene(scene_description, session_id=None, force_new_selection=False):
+    """Async version of select_music_for_scene for the async API server"""
+    tracks = []
+    try:
+        tracks = get_available_tracks()
+        
+        if not tracks:
+            logger.warning("No music tracks found in tracks directory")
+            return None
+        
+        if not force_new_selection and session_id and session_id in track_selections:
+            logger.info(f"Using existing track selection for session {session_id}")
+            return track_selections[session_id]
+        
+        track_names = [track['name'] for track in tracks]
+        
+        track_name = (await music_selector_chain.arun({
+            "scene_description": scene_description,
+            "available_tracks": "\n".join(track_names)
+        })).strip()
+        
+        logger.info(f"Selected track: {track_name}")
+        
+        selected_track = match_track(tracks, track_name)
+        
+        if session_id:
+            track_selections[session_id] = selected_track
+        
+        return selected_track
+    except Exception as e:
+        logger.error(f"Error selecting music: {str(e)}")
+        if tracks:
+            return tracks[0]  # Return first track as fallback
+        return None
+
 # Function to compare scene descriptions for similarity
 def scenes_are_similar(prev_description, current_description):
     """Determine if scenes are similar enough to maintain the same music"""
@@ -0,0 +1,156 @@
+"""
+Scene image pipeline shared by the Flask (image_api.py) and async (async_api.py) servers
+
+Both servers build job parameters from the same request bodies, plan quality tiers
+the same way, keep renders in the same content-addressed store and serve them with
+the same sizes, formats and cache headers. Those steps live here; each server only
+keeps its glue: calling the prompt agent and Modal, and blocking on or awaiting the
+results. SceneImages methods that touch the store's files block, so the async
+server runs them in a thread.
+"""
+
+import os
+import base64
+
+from image_store import ImageStore, MemoryImageCache, image_key, set_cache_headers
+from image_variants import VariantCache, DISPLAY, THUMB
+from quality_tiers import AUTO, STANDARD, TIERS, tier_settings, plan_tiers
+from warm_pool import warm_pool_scheduler
+
+# Refined renders are only queued behind a preview while fewer jobs than this are waiting
+REFINE_MAX_QUEUE = int(os.environ.get("IMAGE_REFINE_MAX_QUEUE", os.environ.get("IMAGE_JOB_WORKERS", "2")))
+
+# Standard renders stream latent previews to the client while they denoise
+PROGRESSIVE = os.environ.get("IMAGE_PROGRESSIVE", "1") == "1"
+PREVIEW_EVERY = int(os.environ.get("IMAGE_PREVIEW_EVERY", "5"))
+
+
+def scene_params(description, character_description, world_type, scene_kind=None, quality=AUTO):
+    """Parameters of an image job for a scene"""
+    return {
+        'description': description,
+        'character_description': character_description,
+        'world_type': world_type,
+        'scene_kind': scene_kind,
+        'quality': quality
+    }
+
+def job_params(data, default_quality=AUTO):
+    """(session ID, job parameters) from an image request body, or None if it has no session"""
+    session_id = data.get('sessionId')
+    if not session_id:
+        return None
+
+    # `auto` returns a preview first and refines it when the queue has room
+    quality = data.get('quality', default_quality)
+    if quality != AUTO and quality not in TIERS:
+        quality = default_quality
+
+    return session_id, scene_params(data.get('description', ''), data.get('characterDescription', ''),
+                                    data.get('worldType', 'fantasy'), data.get('sceneKind'), quality)
+
+def fixed_prompt(prompt_agent, params):
+    """The prompt a job renders without asking the agent, or None
+
+    Shared scenes use a fixed prompt, and refine jobs carry the prompt their preview
+    was rendered from.
+    """
+    return params.get('prompt') or prompt_agent.create_scene_prompt(params.get('scene_kind'), params['world_type'])
+
+def renders_progressively(params, tier):
+    """Whether a render should stream latent previews: nothing is on screen yet for it"""
+    return PROGRESSIVE and tier == STANDARD and 'refines' not in params
+
+def preview_progress(frame):
+    """Job progress for a preview frame from Model.inference_progressive"""
+    return {
+        'step': frame['step'],
+        'steps': frame['steps'],
+        'preview': 'data:image/jpeg;base64,' + base64.b64encode(frame['image']).decode('ascii')
+    }
+
+def refine_params(job, tier, image_prompt):
+    """Parameters of the job that refines `job`'s preview at `tier`"""
+    return {**job.params, 'quality': tier, 'prompt': image_prompt, 'refines': job.id}
+
+def stored_image_key(image_prompt, tier):
+    """Image store key for a prompt rendered at a quality tier"""
+    from flux_backend import VARIANT
+    width, height, steps = tier_settings(tier, VARIANT)
+    return image_key(image_prompt, VARIANT, steps, (width, height))
+
+def image_response(response_class, entry, max_age=None):
+    """A Flask or Quart response for a (bytes, etag, mimetype) variant, before make_conditional"""
+    data, etag, mimetype = entry
+    response = set_cache_headers(response_class(data, mimetype=mimetype), etag, max_age)
+    response.vary.add('Accept')
+    return response
+
+
+class SceneImages:
+    """Rendered scene images: the store, recently served bytes, variants and each session's latest"""
+
+    def __init__(self, root=None):
+        # Rendered images shared by every session, keyed by prompt, model variant and steps
+        self.store = ImageStore(
+            root or os.environ.get("IMAGE_STORE_DIR",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_store")),
+            max_bytes=int(os.environ.get("IMAGE_STORE_MAX_MB", "512")) * 1024 * 1024
+        )
+
+        # Recently served image bytes, so repeated views do not read the files again
+        self.memory = MemoryImageCache(self.store,
+                                       max_bytes=int(os.environ.get("IMAGE_MEMORY_MAX_MB", "64")) * 1024 * 1024)
+
+        # Thumbnail / display sized and WebP / AVIF copies, rendered once in a worker pool
+        self.variants = VariantCache(
+            self.memory.get,
+            max_bytes=int(os.environ.get("IMAGE_VARIANTS_MAX_MB", "32")) * 1024 * 1024,
+            max_workers=int(os.environ.get("IMAGE_VARIANT_WORKERS", "2"))
+        )
+
+        # Each session's latest image key by session ID
+        self.latest = {}
+
+    def plan(self, params, image_prompt, queue_depth):
+        """(tiers, key, stored) for a job: the tiers to render in order, the store key of
+        the first and whether it is already stored"""
+        tiers = plan_tiers(params.get('quality', STANDARD), queue_depth, REFINE_MAX_QUEUE)
+        if len(tiers) > 1 and self.store.contains(stored_image_key(image_prompt, tiers[-1])):
+            # The full-quality image already exists, so there is nothing to preview
+            tiers = tiers[-1:]
+
+        key = stored_image_key(image_prompt, tiers[0])
+        return tiers, key, self.store.get(key) is not None
+
+    def save(self, key, image_bytes):
+        """Store a new render and queue the variants it will be asked for"""
+        warm_pool_scheduler().note_activity("image")
+        self.memory.put(key, image_bytes)
+        self.variants.prerender(key)
+
+    def result(self, session_id, key, tier):
+        """A finished job's result, remembered as the session's latest image"""
+        self.latest[session_id] = key
+
+        # The URLs are content-addressed, so browsers can cache them forever
+        return {
+            'imagePath': f'/api/image/stored/{key}?size={DISPLAY}',
+            'thumbnailPath': f'/api/image/stored/{key}?size={THUMB}',
+            'tier': tier
+        }
+
+    def variant(self, key, size, accept_header):
+        """A Future of (bytes, etag, mimetype) for an image in the best format the client accepts
+
+        Originals are read inline, from memory or the store's files.
+        """
+        return self.variants.get(key, size, self.variants.choose_format(accept_header))
+
+    def metrics(self):
+        return {
+            'store': self.store.metrics(),
+            'memory': self.memory.metrics(),
+            'variants': self.variants.metrics(),
+            'warmPool': warm_pool_scheduler().metrics()
+        }
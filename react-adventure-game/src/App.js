@@ -8,6 +8,32 @@ import WelcomeScreen from './components/WelcomeScreen';
 import CharacterCreation from './components/CharacterCreation';
 import GameScreen from './components/GameScreen';
 
+// Read a text/event-stream response body, calling onEvent(event, data) for each event
+const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    
+    buffer += decoder.decode(value, { stream: true });
+    const messages = buffer.split('\n\n');
+    buffer = messages.pop();
+    
+    for (const message of messages) {
+      let event = 'message';
+      let data = '';
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+};
+
 function App() {
   // Game state
   const [sessionId, setSessionId] = useState(() => {
@@ -58,6 +84,11 @@ function App() {
   const selectWorld = (world) => {
     setSelectedWorld(world);
     setStage('character');
+    
+    // Wake the image model now so the intro image does not wait for a cold start
+    fetch('/api/image/prewarm', { method: 'POST' }).catch((err) => {
+      console.error('Error pre-warming image model:', err);
+    });
   };
 
   // Handle character creation
@@ -107,6 +138,7 @@ function App() {
         story: gameData.story,
         description: gameData.description,
         options: gameData.options,
+        sceneKind: gameData.sceneKind,
         history: [gameData.description]
       });
       
@@ -119,13 +151,13 @@ function App() {
     }
   };
 
-  // Handle player action
+  // Handle player action, streaming the storyteller response as it is generated
   const processAction = async (action) => {
     try {
       setIsLoading(true);
       setError(null);
       
-      const response = await fetch('/api/game/action', {
+      const response = await fetch('/api/game/action/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -136,19 +168,46 @@ function App() {
         }),
       });
       
-      const data = await response.json();
-      
-      if (data.error) {
-        throw new Error(data.error);
+      if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.error || 'Failed to process action');
       }
       
-      // Update game state with new info
+      let description = '';
+      let options = [];
       setGameState(prev => ({
-        story: data.story,
-        description: data.description,
-        options: data.options,
-        history: [...prev.history, `> ${action}`, data.description]
+        ...prev,
+        options: [],
+        history: [...prev.history, `> ${action}`]
       }));
+      
+      await readEventStream(response, (event, data) => {
+        if (event === 'error') {
+          throw new Error(data.error);
+        }
+        
+        // Narrative text and options arrive as soon as the server has parsed them
+        if (event === 'description') {
+          description += data.text;
+          setGameState(prev => ({ ...prev, description }));
+        }
+        
+        if (event === 'option') {
+          options = [...options, data.text];
+          setGameState(prev => ({ ...prev, options }));
+        }
+        
+        if (event === 'done') {
+          // Update game state with the final parsed response
+          setGameState(prev => ({
+            story: data.story,
+            description: data.description,
+            options: data.options,
+            sceneKind: data.sceneKind,
+            history: [...prev.history, data.description]
+          }));
+        }
+      });
     } catch (err) {
       console.error('Error processing action:', err);
       setError(err.message || 'Failed to process action. Please try again.');
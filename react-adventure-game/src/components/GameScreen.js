@@ -76,9 +76,11 @@ const GameScreen = () => {
   const [imageError, setImageError] = useState(null);
   const [isImageModalOpen, setIsImageModalOpen] = useState(false);
   const [imageUrl, setImageUrl] = useState(null);
+  const [previewUrl, setPreviewUrl] = useState(null);
   
   // References
   const storyTextRef = useRef(null);
+  const imageJobRef = useRef(null);
   
   // Text streaming configuration
   const streamingSpeed = 20; // ms between updates
@@ -553,11 +555,18 @@ const GameScreen = () => {
   const generateImage = useCallback(async () => {
     if (!gameState.description || !character || !selectedWorld) return;
     
+    // Stop listening to the previous scene's job; the server cancels it on submit
+    if (imageJobRef.current) {
+      imageJobRef.current.close();
+      imageJobRef.current = null;
+    }
+    
     try {
       setIsGeneratingImage(true);
       setImageError(null);
+      setPreviewUrl(null);
       
-      const response = await fetch('/api/image/generate', {
+      const response = await fetch('/api/image/jobs', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -566,26 +575,117 @@ const GameScreen = () => {
           sessionId,
           description: gameState.description,
           characterDescription: character.description,
-          worldType: selectedWorld.key
+          worldType: selectedWorld.key,
+          sceneKind: gameState.sceneKind
         }),
       });
       
       const data = await response.json();
       
       if (!response.ok) {
-        throw new Error(data.error || 'Failed to generate image');
+        throw new Error(data.error || 'Failed to queue image');
       }
       
-      // Set the image URL
-      setImageUrl(data.imagePath);
-      console.log("Updated game image URL:", data.imagePath);
+      // A preview arrives first; followImageJob swaps in the refined image when it is ready
+      followImageJob(data.jobId);
     } catch (err) {
       console.error('Error generating image:', err);
       setImageError('Failed to generate scene image. The game will continue without visuals.');
-    } finally {
       setIsGeneratingImage(false);
     }
-  }, [gameState.description, character, selectedWorld, sessionId]);
+  }, [gameState.description, gameState.sceneKind, character, selectedWorld, sessionId]);
+
+  // Show an image job's result when it is pushed by the server, then follow its refinement
+  const followImageJob = (jobId, refining = false) => {
+    const events = new EventSource(`/api/image/jobs/${jobId}/events`);
+    imageJobRef.current = events;
+    
+    // Latent previews of the render so far, while the final image is denoising
+    events.addEventListener('running', (event) => {
+      const job = JSON.parse(event.data);
+      if (job.progress && job.progress.preview) {
+        setPreviewUrl(job.progress.preview);
+      }
+    });
+    
+    events.addEventListener('done', (event) => {
+      const job = JSON.parse(event.data);
+      setImageUrl(job.result.imagePath);
+      setPreviewUrl(null);
+      console.log(`Updated game image URL (${job.result.tier}):`, job.result.imagePath);
+      setIsGeneratingImage(false);
+      events.close();
+      if (job.result.refineJobId && imageJobRef.current === events) {
+        followImageJob(job.result.refineJobId, true);
+      }
+    });
+    
+    events.addEventListener('failed', (event) => {
+      const job = JSON.parse(event.data);
+      console.error('Error generating image:', job.error);
+      // A failed refinement keeps the preview on screen
+      if (!refining) {
+        setImageError('Failed to generate scene image. The game will continue without visuals.');
+      }
+      setIsGeneratingImage(false);
+      events.close();
+    });
+    
+    events.addEventListener('cancelled', () => {
+      events.close();
+    });
+    
+    events.onerror = () => {
+      // The stream dropped before the job finished; fall back to polling its status
+      events.close();
+      if (imageJobRef.current === events) {
+        imageJobRef.current = null;
+        pollImageJob(jobId);
+      }
+    };
+  };
+
+  // Poll an image job (and its refinement) until it finishes
+  const pollImageJob = async (jobId) => {
+    try {
+      while (jobId) {
+        const response = await fetch(`/api/image/jobs/${jobId}`);
+        const job = await response.json();
+        
+        if (!response.ok) {
+          throw new Error(job.error || 'Failed to get image job');
+        }
+        
+        if (job.status === 'done') {
+          setImageUrl(job.result.imagePath);
+          setIsGeneratingImage(false);
+          jobId = job.result.refineJobId;
+          continue;
+        }
+        if (job.status === 'failed') {
+          throw new Error(job.error);
+        }
+        if (job.status === 'cancelled') {
+          return;
+        }
+        
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+      }
+    } catch (err) {
+      console.error('Error generating image:', err);
+      setImageError('Failed to generate scene image. The game will continue without visuals.');
+    }
+    setIsGeneratingImage(false);
+  };
+
+  // Close any open image job stream when leaving the game screen
+  useEffect(() => {
+    return () => {
+      if (imageJobRef.current) {
+        imageJobRef.current.close();
+      }
+    };
+  }, []);
 
   // Generate image when game state changes
   useEffect(() => {
@@ -679,6 +779,8 @@ const GameScreen = () => {
           <ImageContainer onClick={handleImageClick}>
             {imageUrl && !isGeneratingImage && !imageError ? (
               <img src={imageUrl} alt="Game scene" style={{ width: '100%', height: 'auto', borderRadius: '8px', boxShadow: '0 4px 8px rgba(0,0,0,0.3)' }} />
+            ) : isGeneratingImage && previewUrl ? (
+              <img src={previewUrl} alt="Game scene (rendering)" style={{ width: '100%', height: 'auto', borderRadius: '8px', filter: 'blur(2px)' }} />
             ) : isGeneratingImage ? (
               <Flex direction="column" align="center" justify="center" style={{ padding: '2rem' }}>
                 <LoadingSpinner size="40px" />
@@ -0,0 +1,186 @@
+import re
+import json
+from collections import namedtuple
+
+# Events emitted while parsing:
+#   ("description", text)   - a piece of narrative text, in order
+#   ("option", {"number": n, "text": text}) - a numbered option, once its line is complete
+#   ("options", [text, ...]) - the complete option list, once the OPTIONS section ends
+#   ("state_change", {"type": ..., ...}) - a structured state change line
+ResponseEvent = namedtuple("ResponseEvent", ["kind", "value"])
+
+ParsedResponse = namedtuple("ParsedResponse", ["description", "options", "state_changes"])
+
+HEADERS = ("DESCRIPTION:", "OPTIONS:")
+STATE_CHANGE_KEYS = ("LOCATION_CHANGE:", "INVENTORY_ADD:", "HEALTH_CHANGE:", "STATE_CHANGES:")
+MARKERS = HEADERS + STATE_CHANGE_KEYS
+
+HEADER_RE = re.compile(r"^[\s*#]*(DESCRIPTION|OPTIONS):[\s*]*(.*)$")
+OPTION_RE = re.compile(r"^\s*(\d+)[.)]\s*(.+?)\s*$")
+LOCATION_RE = re.compile(r"LOCATION_CHANGE: ([^:]+):(.+)")
+INVENTORY_ADD_RE = re.compile(r"INVENTORY_ADD: (.+)")
+HEALTH_RE = re.compile(r"HEALTH_CHANGE: ([+-]\d+)")
+STATE_CHANGES_RE = re.compile(r"STATE_CHANGES:\s*(.+)")
+
+
+def parse_state_change(line):
+    """Parse a single state change line, returning None if it is not one"""
+    stripped = line.strip().lstrip("*#- ")
+
+    match = LOCATION_RE.match(stripped)
+    if match:
+        region, area = match.groups()
+        return {"type": "location", "region": region.strip(), "area": area.strip()}
+
+    match = INVENTORY_ADD_RE.match(stripped)
+    if match:
+        return {"type": "inventory_add", "item": match.group(1).strip()}
+
+    match = HEALTH_RE.match(stripped)
+    if match:
+        return {"type": "health", "delta": int(match.group(1))}
+
+    match = STATE_CHANGES_RE.match(stripped)
+    if match:
+        try:
+            changes = json.loads(match.group(1))
+        except ValueError:
+            return None
+        if isinstance(changes, dict):
+            return {"type": "state_changes", "changes": changes}
+
+    return None
+
+
+class ResponseParser:
+    """Single-pass, incremental parser for storyteller responses
+
+    Feed the response chunk by chunk as it streams in; each call returns the events
+    that became available. Narrative text is emitted as soon as it cannot be the start
+    of a section header or state change line, options and state changes as soon as
+    their line is complete.
+    """
+
+    def __init__(self):
+        self.section = "description"
+        self.description_parts = []
+        self.options = []
+        self.state_changes = []
+        self._line = ""          # Current incomplete line
+        self._line_emitted = 0   # Characters of the current line already emitted as description
+        self._pending_space = ""  # Whitespace held back until more description text arrives
+        self._options_done = False
+
+    @property
+    def description(self):
+        return "".join(self.description_parts)
+
+    def result(self):
+        """Return everything parsed so far"""
+        return ParsedResponse(self.description, [o["text"] for o in self.options], list(self.state_changes))
+
+    def feed(self, chunk):
+        """Consume the next chunk of the response and return the new events"""
+        events = []
+        self._line += chunk
+
+        while "\n" in self._line:
+            line, self._line = self._line.split("\n", 1)
+            self._complete_line(line, events)
+            self._line_emitted = 0
+
+        self._partial_line(events)
+        return events
+
+    def close(self):
+        """Finish parsing, flushing the last line, and return the remaining events"""
+        events = []
+        if self._line:
+            self._complete_line(self._line, events)
+            self._line = ""
+            self._line_emitted = 0
+        self._end_options(events)
+        return events
+
+    def _may_be_marker(self, text):
+        """Whether an incomplete line could still turn into a header or state change"""
+        stripped = text.lstrip().lstrip("*#- ")
+        if not stripped:
+            return True
+        return any(marker.startswith(stripped) or stripped.startswith(marker) for marker in MARKERS)
+
+    def _partial_line(self, events):
+        """Emit description text from the incomplete line when it is safe to do so"""
+        header = HEADER_RE.match(self._line)
+        if header and header.group(1) == "DESCRIPTION":
+            self._start_description(events)
+            start = max(self._line_emitted, header.start(2))
+        elif self.section != "description" or self._may_be_marker(self._line):
+            return
+        else:
+            start = self._line_emitted
+
+        self._emit_description(self._line[start:], events)
+        self._line_emitted = len(self._line)
+
+    def _complete_line(self, line, events):
+        header = HEADER_RE.match(line)
+        if header and header.group(1) == "OPTIONS":
+            self.section = "options"
+            # The first option may share the header's line ("OPTIONS: 1. Go north")
+            self._option_line(header.group(2), events)
+            return
+        if header:
+            self._start_description(events)
+            self._emit_description(line[max(self._line_emitted, header.start(2)):] + "\n", events)
+            return
+
+        change = parse_state_change(line)
+        if change:
+            self.state_changes.append(change)
+            events.append(ResponseEvent("state_change", change))
+            return
+
+        if self.section == "options":
+            self._option_line(line, events)
+            return
+
+        self._emit_description(line[self._line_emitted:] + "\n", events)
+
+    def _option_line(self, line, events):
+        match = OPTION_RE.match(line)
+        if match:
+            option = {"number": int(match.group(1)), "text": match.group(2)}
+            self.options.append(option)
+            events.append(ResponseEvent("option", option))
+
+    def _start_description(self, events):
+        if self.section != "description":
+            self._end_options(events)
+            self.section = "description"
+
+    def _emit_description(self, text, events):
+        if not text:
+            return
+        # Hold back whitespace so the description never starts or ends with it
+        text = self._pending_space + text
+        body = text.rstrip()
+        self._pending_space = text[len(body):]
+        if not self.description_parts:
+            body = body.lstrip()
+        if body:
+            self.description_parts.append(body)
+            events.append(ResponseEvent("description", body))
+
+    def _end_options(self, events):
+        if self.options and not self._options_done:
+            self._options_done = True
+            events.append(ResponseEvent("options", [o["text"] for o in self.options]))
+
+
+def parse_response(text):
+    """Parse a complete storyteller response"""
+    parser = ResponseParser()
+    parser.feed(text)
+    parser.close()
+    return parser.result()
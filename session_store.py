@@ -0,0 +1,319 @@
+"""
+Two-tier session store for live games
+
+Games are kept in an in-process LRU with an idle TTL, backed by a durable tier
+that holds each session's snapshot and a version number. Every lookup checks the
+durable version, so a game updated by another worker process is rehydrated from
+its snapshot instead of served stale; several workers can share sessions without
+sticky routing. Saves are compare-and-set on the version, so two workers writing
+the same session at once cannot silently overwrite each other.
+
+Within a worker, concurrent requests for a session share one live game object, so
+servers run each turn under the session's lock (`session_locks`) and `discard()`
+the live game when a turn fails part way, so the next request starts again from
+the last saved snapshot.
+
+The durable tier is picked by SESSION_STORE_URL:
+
+    sqlite:///path/to/sessions.db   (default: sessions.db next to this file)
+    redis://host:6379/0             (needs the `redis` package)
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from game import AdventureGame
+from snapshot import encode_snapshot, decode_snapshot
+from llm_backends import create_llm
+
+
+class SessionConflict(Exception):
+    """Raised when a session was saved by someone else since it was loaded"""
+
+
+class SQLiteBackend:
+    """Durable session tier in a local SQLite database, safe to share between processes"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.local = threading.local()
+        with self._connection() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def _connection(self):
+        if getattr(self.local, "db", None) is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return self.local.db
+
+    def version(self, session_id):
+        row = self._connection().execute(
+            "SELECT version FROM sessions WHERE session_id = ? AND updated_at > ?",
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id):
+        """Return (version, data) for a session, or None"""
+        row = self._connection().execute(
+            "SELECT version, data FROM sessions WHERE session_id = ? AND updated_at > ?",
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def save(self, session_id, data, expected_version):
+        """Write a session if its version is still `expected_version`; return the new version or None"""
+        db = self._connection()
+        now = time.time()
+        if expected_version is None:
+            cursor = db.execute(
+                "INSERT INTO sessions (session_id, version, data, updated_at) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET version = 1, data = excluded.data, "
+                "updated_at = excluded.updated_at WHERE sessions.updated_at <= ?",
+                (session_id, data, now, now - self.ttl)
+            )
+            return 1 if cursor.rowcount else None
+
+        cursor = db.execute(
+            "UPDATE sessions SET version = version + 1, data = ?, updated_at = ? "
+            "WHERE session_id = ? AND version = ?",
+            (data, now, session_id, expected_version)
+        )
+        return expected_version + 1 if cursor.rowcount else None
+
+    def delete(self, session_id):
+        self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge_expired(self):
+        """Delete sessions idle for longer than the TTL, returning how many were removed"""
+        cursor = self._connection().execute(
+            "DELETE FROM sessions WHERE updated_at <= ?", (time.time() - self.ttl,)
+        )
+        return cursor.rowcount
+
+
+class RedisBackend:
+    """Durable session tier in Redis (or anything speaking its protocol)"""
+
+    # Compare-and-set in one round trip: KEYS[1] = session key,
+    # ARGV = expected version ('' for a new session), data, ttl
+    SAVE_SCRIPT = """
+        local current = redis.call('HGET', KEYS[1], 'version')
+        if (ARGV[1] == '' and current) or (ARGV[1] ~= '' and current ~= ARGV[1]) then
+            return nil
+        end
+        local version = (tonumber(current) or 0) + 1
+        redis.call('HSET', KEYS[1], 'version', version, 'data', ARGV[2])
+        redis.call('EXPIRE', KEYS[1], ARGV[3])
+        return version
+    """
+
+    def __init__(self, url, ttl=7 * 24 * 3600, prefix="adventure:session:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.save_script = self.client.register_script(self.SAVE_SCRIPT)
+
+    def version(self, session_id):
+        version = self.client.hget(self.prefix + session_id, "version")
+        return int(version) if version is not None else None
+
+    def load(self, session_id):
+        version, data = self.client.hmget(self.prefix + session_id, "version", "data")
+        return (int(version), data) if version is not None else None
+
+    def save(self, session_id, data, expected_version):
+        version = self.save_script(
+            keys=[self.prefix + session_id],
+            args=["" if expected_version is None else expected_version, data, self.ttl]
+        )
+        return int(version) if version is not None else None
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+    def purge_expired(self):
+        # Redis expires keys by itself
+        return 0
+
+
+class SessionLocks:
+    """One lock per session ID, created on demand and dropped once nobody holds or waits on it
+
+    `factory` makes the locks: threading.Lock for threaded servers, asyncio.Lock for
+    an event loop.
+    """
+
+    def __init__(self, factory=threading.Lock):
+        self.factory = factory
+        self.locks = weakref.WeakValueDictionary()
+        self.guard = threading.Lock()
+
+    def __call__(self, session_id):
+        with self.guard:
+            lock = self.locks.get(session_id)
+            if lock is None:
+                lock = self.locks[session_id] = self.factory()
+            return lock
+
+
+class SessionStore:
+    """Live games in an LRU/TTL memory tier over a durable snapshot tier
+
+    `get()` returns the caller's game, rehydrating it from its snapshot when it is not
+    in memory or another worker has saved a newer version. Call `save()` after changing
+    a game so other workers (and restarts) see the change.
+    """
+
+    def __init__(self, backend, llm_factory=None, max_live=1000, idle_ttl=3600):
+        self.backend = backend
+        self.llm_factory = llm_factory or shared_llm
+        self.max_live = max_live
+        self.idle_ttl = idle_ttl
+        self.live = OrderedDict()  # session_id -> (game, version, last_used)
+        self.versions = weakref.WeakKeyDictionary()  # game -> version it was loaded or saved at
+        self.lock = threading.Lock()
+        self.session_locks = SessionLocks()
+        self.stats = {"hits": 0, "rehydrations": 0, "misses": 0, "stale": 0,
+                      "evictions": 0, "expirations": 0, "conflicts": 0, "saves": 0, "discards": 0}
+
+    def get(self, session_id):
+        """Return the live game for a session, or None if there is no such session"""
+        version = self.backend.version(session_id)
+        with self.lock:
+            entry = self.live.get(session_id)
+            if entry is not None and version is not None and entry[1] == version:
+                self.live[session_id] = (entry[0], version, time.time())
+                self.live.move_to_end(session_id)
+                self.stats["hits"] += 1
+                return entry[0]
+            if entry is not None:
+                # Saved by another worker since we loaded it, or deleted
+                del self.live[session_id]
+                self.stats["stale"] += 1
+
+        record = self.backend.load(session_id)
+        if record is None:
+            with self.lock:
+                self.stats["misses"] += 1
+            return None
+
+        version, data = record
+        game = AdventureGame.from_snapshot(decode_snapshot(data), llm=self.llm_factory())
+        self._remember(session_id, game, version)
+        with self.lock:
+            self.stats["rehydrations"] += 1
+        return game
+
+    def save(self, session_id, game):
+        """Persist a game's snapshot, raising SessionConflict if another worker saved it first"""
+        with self.lock:
+            expected_version = self.versions.get(game)
+
+        version = self.backend.save(session_id, encode_snapshot(game.to_snapshot()), expected_version)
+        if version is None:
+            with self.lock:
+                self.live.pop(session_id, None)
+                self.stats["conflicts"] += 1
+            raise SessionConflict(session_id)
+
+        self._remember(session_id, game, version)
+        with self.lock:
+            self.stats["saves"] += 1
+        return version
+
+    def create(self, session_id, game):
+        """Save a new game for a session, replacing whatever was there"""
+        self.delete(session_id)
+        return self.save(session_id, game)
+
+    def discard(self, session_id):
+        """Forget the live game, e.g. after a failed turn; the next get() rehydrates the saved snapshot"""
+        with self.lock:
+            if self.live.pop(session_id, None) is not None:
+                self.stats["discards"] += 1
+
+    def delete(self, session_id):
+        with self.lock:
+            self.live.pop(session_id, None)
+        self.backend.delete(session_id)
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def live_sessions(self):
+        with self.lock:
+            return list(self.live.keys())
+
+    def metrics(self):
+        with self.lock:
+            return {**self.stats, "live": len(self.live), "max_live": self.max_live}
+
+    def _remember(self, session_id, game, version):
+        now = time.time()
+        with self.lock:
+            self.versions[game] = version
+            self.live[session_id] = (game, version, now)
+            self.live.move_to_end(session_id)
+
+            # Drop games idle for longer than the TTL; they can be rehydrated later
+            while self.live:
+                oldest_id, (_, _, last_used) = next(iter(self.live.items()))
+                if now - last_used <= self.idle_ttl:
+                    break
+                del self.live[oldest_id]
+                self.stats["expirations"] += 1
+
+            while len(self.live) > self.max_live:
+                self.live.popitem(last=False)
+                self.stats["evictions"] += 1
+
+
+_shared_llm = None
+_shared_llm_lock = threading.Lock()
+
+
+def shared_llm():
+    """One storyteller LLM client per process, shared by every rehydrated game"""
+    global _shared_llm
+    with _shared_llm_lock:
+        if _shared_llm is None:
+            _shared_llm = create_llm(temperature=0.7)
+        return _shared_llm
+
+
+def create_backend(url=None):
+    """Create the durable tier for SESSION_STORE_URL (SQLite by default)"""
+    url = url or os.environ.get("SESSION_STORE_URL")
+    ttl = int(os.environ.get("SESSION_TTL", str(7 * 24 * 3600)))
+
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url, ttl=ttl)
+
+    path = url[len("sqlite:///"):] if url and url.startswith("sqlite:///") else (
+        url or os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db"))
+    backend = SQLiteBackend(path, ttl=ttl)
+    backend.purge_expired()
+    return backend
+
+
+def create_session_store(url=None, **kwargs):
+    """Create a SessionStore for SESSION_STORE_URL (SQLite by default)"""
+    kwargs.setdefault("max_live", int(os.environ.get("SESSION_MAX_LIVE", "1000")))
+    kwargs.setdefault("idle_ttl", int(os.environ.get("SESSION_IDLE_TTL", "3600")))
+    return SessionStore(create_backend(url), **kwargs)
@@ -0,0 +1,128 @@
+import threading
+from collections import OrderedDict
+from game import AdventureGame
+from snapshot import decode_snapshot
+from state_delta import diff_snapshots, snapshot_version
+
+
+class GameSessionManager:
+    """Keeps live AdventureGame instances keyed by session ID
+
+    Each turn reuses the live game when the caller's snapshot matches it, so only
+    the storyteller chain runs. When the session is unknown (new container, eviction)
+    or out of date, the game is rebuilt from the snapshot without calling the LLM.
+
+    `game_state_data` is either the legacy game state dict or the bytes of a whole
+    packed game (AdventureGame.pack()); turns answer in the same form they were given.
+    """
+
+    def __init__(self, llm_factory=None, max_sessions=1000):
+        self.llm_factory = llm_factory
+        self.max_sessions = max_sessions
+        self.games = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "restores": 0, "evictions": 0}
+
+    def _new_llm(self):
+        return self.llm_factory() if self.llm_factory else None
+
+    def _store(self, session_id, game):
+        with self.lock:
+            self.games[session_id] = game
+            self.games.move_to_end(session_id)
+            while len(self.games) > self.max_sessions:
+                self.games.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def start_game(self, session_id, world_key, character_name, character_attributes, character_description,
+                   packed=False):
+        """Create a new game for the session and return its introduction and snapshot"""
+        game = AdventureGame(llm=self._new_llm())
+        game.select_world(world_key)
+        game.create_character(character_name, character_attributes, character_description)
+        intro = game.initialize_game()
+        self._store(session_id, game)
+
+        return {
+            "introduction": intro,
+            "game_state": game.pack() if packed else game.to_snapshot()["game_state"]
+        }
+
+    def get_game(self, session_id, world_key, character_data, game_state_data):
+        """Return the live game for a session, restoring it from the snapshot if needed"""
+        with self.lock:
+            game = self.games.get(session_id)
+
+        if isinstance(game_state_data, (bytes, bytearray)):
+            snapshot = decode_snapshot(game_state_data)
+            game_state_data = snapshot.get("game_state")
+        else:
+            snapshot = {"world_key": world_key, "character": character_data, "game_state": game_state_data or {}}
+
+        expected_turn = game_state_data.get("turn", 0) if game_state_data else None
+        if game is not None and (expected_turn is None or game.turn == expected_turn):
+            with self.lock:
+                self.games.move_to_end(session_id)
+                self.stats["hits"] += 1
+            return game
+
+        game = AdventureGame.from_snapshot(snapshot, llm=self._new_llm())
+        self._store(session_id, game)
+        with self.lock:
+            self.stats["restores"] += 1
+        return game
+
+    def run_turn(self, session_id, world_key, character_data, game_state_data, user_input):
+        """Run a single turn and return the response with the updated game state"""
+        game = self.get_game(session_id, world_key, character_data, game_state_data)
+        try:
+            response = game.process_user_action(user_input)
+        except Exception:
+            # A failed turn can leave the game half-updated; rebuild it from the snapshot next time
+            self.end_session(session_id)
+            raise
+        packed = isinstance(game_state_data, (bytes, bytearray))
+
+        return {
+            "response": response,
+            "game_state": game.pack() if packed else game.to_snapshot()["game_state"]
+        }
+
+    def run_delta_turn(self, session_id, version, user_input, packed=None):
+        """Run a turn against the game at `version` (its snapshot_version), returning only what changed
+
+        If this container does not hold the game at that version the answer is
+        {"resync": True} and the caller repeats the call with the packed game.
+        """
+        with self.lock:
+            game = self.games.get(session_id)
+        before = game.to_snapshot() if game is not None else None
+
+        if before is None or snapshot_version(before) != version:
+            if packed is None:
+                return {"resync": True}
+            game = AdventureGame.unpack(packed, llm=self._new_llm())
+            self._store(session_id, game)
+            with self.lock:
+                self.stats["restores"] += 1
+            before = game.to_snapshot()
+        else:
+            with self.lock:
+                self.games.move_to_end(session_id)
+                self.stats["hits"] += 1
+
+        try:
+            response = game.process_user_action(user_input)
+        except Exception:
+            self.end_session(session_id)
+            raise
+
+        return {
+            "response": response,
+            "delta": diff_snapshots(before, game.to_snapshot())
+        }
+
+    def end_session(self, session_id):
+        """Drop a live game"""
+        with self.lock:
+            return self.games.pop(session_id, None) is not None
@@ -0,0 +1,68 @@
+"""
+Compact encoding for game snapshots
+
+Snapshots are the plain dicts produced by `AdventureGame.to_snapshot()`. On the
+wire they are msgpack when the `msgpack` package is installed and compact JSON
+otherwise, zlib-compressed once they are big enough for it to pay off. Every
+encoded snapshot starts with a two byte header (format version, flags) so either
+side can decode what the other wrote, and bare JSON from older releases still
+decodes.
+"""
+
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Bumped whenever the snapshot dict layout changes
+SNAPSHOT_VERSION = 1
+
+FORMAT_VERSION = 1
+FLAG_MSGPACK = 0x01
+FLAG_ZLIB = 0x02
+
+# Below this many bytes zlib's overhead outweighs what it saves
+COMPRESS_THRESHOLD = 512
+
+
+def encode_snapshot(snapshot, compress=True, use_msgpack=None):
+    """Encode a snapshot dict to bytes"""
+    if use_msgpack is None:
+        use_msgpack = msgpack is not None
+
+    flags = 0
+    if use_msgpack:
+        payload = msgpack.packb(snapshot, use_bin_type=True)
+        flags |= FLAG_MSGPACK
+    else:
+        payload = json.dumps(snapshot, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    if compress and len(payload) >= COMPRESS_THRESHOLD:
+        payload = zlib.compress(payload, 6)
+        flags |= FLAG_ZLIB
+
+    return bytes((FORMAT_VERSION, flags)) + payload
+
+
+def decode_snapshot(data):
+    """Decode bytes written by encode_snapshot (or plain JSON) back to a snapshot dict"""
+    data = bytes(data)
+    if data[:1] in (b"{", b"["):
+        return json.loads(data)
+
+    if len(data) < 2 or data[0] != FORMAT_VERSION:
+        raise ValueError(f"Unknown snapshot format {data[:1]!r}")
+
+    flags, payload = data[1], data[2:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+
+    if flags & FLAG_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Snapshot is msgpack-encoded but the msgpack package is not installed")
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    return json.loads(payload)
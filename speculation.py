@@ -0,0 +1,90 @@
+"""
+Speculative pre-generation of storyteller turns
+
+While the player reads a response, the storyteller can already be asked about each
+option it offered. Results are kept against a key describing the game state they
+were generated for; if the player then picks one of those options in that same
+state the response is served straight away, and everything else is discarded.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llm_backends import approx_tokens
+
+
+def token_usage(result, messages):
+    """(input, output) tokens of an LLM call, from the provider if it reports them"""
+    usage = getattr(result, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    text = getattr(result, "content", result)
+    return sum(approx_tokens(message.content) for message in messages), approx_tokens(text)
+
+
+class SpeculativeCache:
+    """Runs speculative LLM calls in the background and hands out the one that is needed"""
+
+    def __init__(self, max_workers=3):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculate")
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.stats = {
+            'launched': 0,
+            'hits': 0,
+            'misses': 0,
+            'discarded': 0,
+            'wasted_input_tokens': 0,
+            'wasted_output_tokens': 0
+        }
+
+    def launch(self, calls):
+        """Start speculative calls, given as (key, llm, messages), replacing any previous ones"""
+        self.discard()
+        with self.lock:
+            for key, llm, messages in calls:
+                future = self.executor.submit(llm.invoke, messages)
+                future.messages = messages
+                self.pending[key] = future
+                self.stats['launched'] += 1
+
+    def take(self, key):
+        """Return the Future speculated for `key` (or None) and discard the others"""
+        with self.lock:
+            future = self.pending.pop(key, None)
+            speculated = bool(self.pending) or future is not None
+            if future is not None:
+                self.stats['hits'] += 1
+            elif speculated:
+                self.stats['misses'] += 1
+        self.discard()
+        return future
+
+    def discard(self):
+        """Drop all outstanding speculations, counting the tokens they used"""
+        with self.lock:
+            futures, self.pending = list(self.pending.values()), {}
+        for future in futures:
+            if future.cancel():
+                continue
+            self.stats['discarded'] += 1
+            future.add_done_callback(self._count_waste)
+
+    def _count_waste(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        input_tokens, output_tokens = token_usage(future.result(), future.messages)
+        with self.lock:
+            self.stats['wasted_input_tokens'] += input_tokens
+            self.stats['wasted_output_tokens'] += output_tokens
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else None
+            }
+
+    def shutdown(self):
+        self.discard()
+        self.executor.shutdown(wait=False, cancel_futures=True)
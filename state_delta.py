@@ -0,0 +1,94 @@
+"""
+Turn-by-turn deltas between game snapshots
+
+A turn changes a handful of fields and appends two history entries, so instead of
+shipping the whole snapshot back and forth the side running the turn returns a
+delta against the version the caller already holds:
+
+    {"base": "9f2c...", "turn": 50,
+     "set": {"health": 80, "location": {...}},      # game_state fields that changed
+     "history": {"drop": 0, "append": ["PLAYER: ...", "STORYTELLER: ..."]},
+     "character": {...}}                            # only if the character changed
+
+History is a ring buffer that only loses entries from the front, so `drop` says how
+many of the caller's oldest entries to discard before appending.
+
+A version is a digest of the whole snapshot rather than its turn number: two games
+that diverged (one side ran a turn the other never saved) can be at the same turn,
+but they never share a digest.
+"""
+
+import copy
+import json
+import hashlib
+
+
+class StaleDelta(Exception):
+    """Raised when a delta was computed against a different version than the one held"""
+
+
+def snapshot_turn(snapshot):
+    return (snapshot.get("game_state") or {}).get("turn", 0)
+
+
+def snapshot_version(snapshot):
+    """Content digest identifying a snapshot"""
+    data = json.dumps(snapshot, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _history_delta(old, new):
+    """Entries dropped from the front of `old` and appended to get `new`, or None"""
+    for drop in range(len(old) + 1):
+        kept = len(old) - drop
+        if new[:kept] == old[drop:]:
+            return {"drop": drop, "append": new[kept:]}
+    return None
+
+
+def diff_snapshots(old, new):
+    """The delta that turns snapshot `old` into snapshot `new`"""
+    old_state = old.get("game_state") or {}
+    new_state = new.get("game_state") or {}
+    delta = {"base": snapshot_version(old), "turn": snapshot_turn(new), "set": {}}
+
+    for field, value in new_state.items():
+        if field in ("turn", "history"):
+            continue
+        if old_state.get(field) != value:
+            delta["set"][field] = value
+
+    old_history = old_state.get("history") or []
+    new_history = new_state.get("history") or []
+    history = _history_delta(old_history, new_history)
+    if history is None:
+        delta["set"]["history"] = new_history
+    elif history["drop"] or history["append"]:
+        delta["history"] = history
+
+    if new.get("character") != old.get("character"):
+        delta["character"] = new.get("character")
+
+    return delta
+
+
+def apply_delta(snapshot, delta):
+    """Return a new snapshot with `delta` applied, raising StaleDelta on a version mismatch"""
+    version = snapshot_version(snapshot)
+    if version != delta["base"]:
+        raise StaleDelta(f"Delta is based on version {delta['base']}, snapshot is at version {version}")
+
+    updated = copy.deepcopy(snapshot)
+    game_state = updated.setdefault("game_state", {}) or {}
+    updated["game_state"] = game_state
+    game_state.update(copy.deepcopy(delta["set"]))
+
+    history = delta.get("history")
+    if history:
+        game_state["history"] = (game_state.get("history") or [])[history["drop"]:] + list(history["append"])
+
+    if "character" in delta:
+        updated["character"] = copy.deepcopy(delta["character"])
+
+    game_state["turn"] = delta["turn"]
+    return updated
@@ -0,0 +1,146 @@
+"""
+Structured (JSON) storyteller output
+
+With STORYTELLER_FORMAT=json the storyteller is asked, in the backend's JSON mode,
+for one compact object instead of DESCRIPTION/OPTIONS text:
+
+    {"d": "<narrative>", "o": ["<option>", ...], "s": [{"k": "add", "v": "Lantern"}, ...]}
+
+Single-letter keys keep the output tokens close to the text format. The object is
+validated with pydantic; malformed output is first repaired locally (code fences,
+surrounding prose, trailing commas) and then re-prompted with the validation error.
+Valid turns are rendered back to the text format, so history, the API payloads and
+the frontend are unchanged, and their state changes are applied directly instead
+of being scanned out of the text. A reply that cannot be repaired is never shown
+as raw JSON: its narrative or surrounding prose is kept if there is any, and the
+story pauses otherwise.
+"""
+
+import re
+import json
+from typing import List, Literal, Optional, Union
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from langchain_core.messages import AIMessage, HumanMessage
+
+CUSTOM_ACTION_OPTION = "[Type your own action]"
+
+# Shown when an unrepairable reply has no narrative to salvage
+PAUSED_TURN = ("DESCRIPTION: The story pauses for a moment while the storyteller gathers their thoughts.\n\n"
+               f"OPTIONS:\n1. Look around\n2. {CUSTOM_ACTION_OPTION}")
+
+
+class StructuredOutputError(ValueError):
+    """Storyteller output that is not a valid StoryTurn"""
+
+
+class StateChange(BaseModel):
+    k: Literal["move", "add", "remove", "health", "gold"]
+    v: Union[int, str]
+    r: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_value(self):
+        if self.k in ("health", "gold"):
+            if isinstance(self.v, str):
+                try:
+                    self.v = int(self.v)
+                except ValueError:
+                    raise ValueError(f"'{self.k}' needs an integer change, got {self.v!r}")
+        else:
+            self.v = str(self.v).strip()
+            if not self.v:
+                raise ValueError(f"'{self.k}' needs a name")
+        if self.k == "move" and not (self.r and self.r.strip()):
+            raise ValueError("'move' needs a region in 'r'")
+        return self
+
+
+class StoryTurn(BaseModel):
+    d: str = Field(min_length=1)
+    o: List[str] = Field(min_length=1, max_length=5)
+    s: List[StateChange] = Field(default_factory=list)
+
+
+def _strip_json(text):
+    """A reply without its code fences and JSON object"""
+    text = re.sub(r"```.*?```", " ", text, flags=re.DOTALL)
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        text = text[:start] + " " + text[end + 1:]
+    return text.strip()
+
+
+def _candidate_json(text):
+    """The JSON object in a reply, minus the usual ways models wrap or break it"""
+    text = text.strip()
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        text = text[start:end + 1]
+    return re.sub(r",\s*([}\]])", r"\1", text)
+
+
+def parse_turn(text):
+    """Validate a storyteller reply as a StoryTurn, raising StructuredOutputError"""
+    try:
+        data = json.loads(_candidate_json(text))
+    except ValueError as e:
+        raise StructuredOutputError(f"not valid JSON: {e}") from e
+    try:
+        return StoryTurn.model_validate(data)
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+        raise StructuredOutputError(errors) from e
+
+
+def repair_messages(messages, reply, error):
+    """The original messages plus the bad reply and a request to fix it"""
+    return list(messages) + [
+        AIMessage(content=reply),
+        HumanMessage(content=f"That reply was invalid ({error}). Reply again with only the corrected "
+                             'JSON object: {"d": ..., "o": [...], "s": [...]}')
+    ]
+
+
+def render_turn(turn):
+    """The turn in the DESCRIPTION/OPTIONS text format"""
+    options = [option for option in turn.o if option.strip() and "type your own" not in option.lower()]
+    options.append(CUSTOM_ACTION_OPTION)
+    lines = "\n".join(f"{number}. {option}" for number, option in enumerate(options, 1))
+    return f"DESCRIPTION: {turn.d.strip()}\n\nOPTIONS:\n{lines}"
+
+
+def fallback_text(reply):
+    """Text format for a reply that could not be made a valid turn, without its raw JSON
+
+    Keeps the narrative ("d") and any options of a JSON object that failed validation,
+    else the prose around the JSON (all of it for a plain text reply), else PAUSED_TURN.
+    """
+    try:
+        data = json.loads(_candidate_json(reply))
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and isinstance(data.get("d"), str) and data["d"].strip():
+        options = data.get("o") if isinstance(data.get("o"), list) else []
+        options = [option for option in options if isinstance(option, str)]
+        return render_turn(StoryTurn.model_construct(d=data["d"], o=options, s=[]))
+    return _strip_json(reply) or PAUSED_TURN
+
+
+def turn_state_changes(turn):
+    """The turn's state changes as response parser change dicts"""
+    changes = []
+    for change in turn.s:
+        if change.k == "move":
+            changes.append({"type": "location", "region": change.r.strip(), "area": change.v})
+        elif change.k == "add":
+            changes.append({"type": "inventory_add", "item": change.v})
+        elif change.k == "remove":
+            changes.append({"type": "inventory_remove", "item": change.v})
+        elif change.k == "health":
+            changes.append({"type": "health", "delta": change.v})
+        elif change.k == "gold":
+            changes.append({"type": "gold", "delta": change.v})
+    return changes
@@ -0,0 +1,44 @@
+"""
+Shared fixtures: every game talks to the offline fake LLM backend
+
+    python -m pytest -q
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path so we can import game modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+from game import AdventureGame
+from llm_backends import FakeStorytellerLLM
+
+
+@pytest.fixture
+def llm():
+    return FakeStorytellerLLM()
+
+
+@pytest.fixture
+def new_game(llm):
+    """Make a started fantasy game; keyword arguments go to AdventureGame"""
+    def make(**kwargs):
+        game = AdventureGame(llm=llm, speculation=0, **kwargs)
+        game.select_world("fantasy")
+        game.create_character("Tester", {"strength": 5, "intelligence": 5}, "A careful tester")
+        game.initialize_game()
+        return game
+    return make
+
+
+@pytest.fixture
+def game(new_game):
+    return new_game()
+
+
+@pytest.fixture
+def game_state(game):
+    return game.game_state
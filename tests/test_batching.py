@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from batching import DynamicBatcher
+
+
+class FakePipeline:
+    """Records the batches it is called with"""
+
+    def __init__(self, fail=False, drop=False):
+        self.batches = []
+        self.fail = fail
+        self.drop = drop
+
+    def __call__(self, prompts):
+        self.batches.append(list(prompts))
+        if self.fail:
+            raise RuntimeError("out of memory")
+        results = [prompt.upper() for prompt in prompts]
+        return results[:-1] if self.drop else results
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def make(pipeline, **kwargs):
+        batchers.append(DynamicBatcher(pipeline, **kwargs))
+        return batchers[-1]
+
+    yield make
+    for batcher in batchers:
+        batcher.close()
+
+
+def test_concurrent_submits_share_a_batch(make_batcher):
+    pipeline = FakePipeline()
+    batcher = make_batcher(pipeline, max_batch_size=4, max_wait=0.5)
+    prompts = [f"prompt {index}" for index in range(4)]
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(batcher, prompts))
+    # Each caller gets its own result back
+    assert results == [prompt.upper() for prompt in prompts]
+    assert sorted(pipeline.batches[0]) == prompts
+    assert batcher.metrics()["batches"] == 1
+
+
+def test_max_batch_size(make_batcher):
+    pipeline = FakePipeline()
+    batcher = make_batcher(pipeline, max_batch_size=2, max_wait=0.5)
+    futures = [batcher.submit(str(index)) for index in range(5)]
+    assert [future.result(5) for future in futures] == ["0", "1", "2", "3", "4"]
+    assert [len(batch) for batch in pipeline.batches] == [2, 2, 1]
+    assert batcher.metrics()["largest_batch"] == 2
+
+
+@pytest.mark.parametrize("pipeline, message", [
+    (FakePipeline(fail=True), "out of memory"),
+    (FakePipeline(drop=True), "results for"),
+])
+def test_errors_reach_every_caller(make_batcher, pipeline, message):
+    batcher = make_batcher(pipeline, max_wait=0.2)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for future in futures:
+        with pytest.raises(RuntimeError, match=message):
+            future.result(5)
+    # The worker keeps serving after a failed batch
+    pipeline.fail = pipeline.drop = False
+    assert batcher("c", timeout=5) == "C"
+
+
+def test_closed_batcher_rejects_submits():
+    batcher = DynamicBatcher(FakePipeline())
+    batcher.close()
+    assert not batcher.worker.is_alive()
+    with pytest.raises(RuntimeError):
+        batcher.submit("late")
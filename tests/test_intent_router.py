@@ -0,0 +1,58 @@
+import pytest
+
+from intent_router import Intent, IntentRouter, command_name, match_name, normalize
+
+
+@pytest.fixture
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("text, name", [
+    ("inventory", "inventory"),
+    ("check my bag", "inventory"),
+    ("What am I carrying?", "inventory"),
+    ("how much gold do I have", "status"),
+    ("Where am I?", "location"),
+    ("what can I do", "help"),
+])
+def test_phrases(router, game_state, text, name):
+    assert router.route(text, game_state) == Intent(name)
+
+
+@pytest.mark.parametrize("text", [
+    "Attack the dragon with my sword",
+    "Talk to the innkeeper about the bell",
+    "go to the moon",
+    "",
+])
+def test_narrative_actions_go_to_the_storyteller(router, game_state, text):
+    assert router.route(text, game_state) is None
+
+
+def test_travel_resolves_areas(router, game_state):
+    assert router.route("go to the castle", game_state) == Intent("travel", "Castle Eldoria", "Kingdom of Eldoria")
+    # A typo still resolves, whichever region the area is in
+    assert router.route("walk to whispering beech", game_state) == Intent("travel", "Whispering Beach", "Arcane Isles")
+
+
+def test_drop_resolves_inventory_items(router, game_state):
+    game_state.add_to_inventory("Rusty Sword")
+    game_state.add_to_inventory("Rusty Lantern")
+    assert router.route("drop the sword", game_state) == Intent("drop", "Rusty Sword")
+    # Ambiguous names are left to the storyteller
+    assert router.route("drop rusty", game_state) is None
+
+
+def test_exact_commands():
+    assert command_name("  Stats ") == "status"
+    assert command_name("check stats") is None
+
+
+def test_match_name():
+    assert normalize("The Wizard's Academy!") == "wizards academy"
+    candidates = ["Wizard's Academy", "Mystical Caves", "Mountain Peaks"]
+    assert match_name("the wizards academy", candidates) == "Wizard's Academy"
+    assert match_name("caves", candidates) == "Mystical Caves"
+    assert match_name("mountain peeks", candidates) == "Mountain Peaks"
+    assert match_name("swamp", candidates) is None
@@ -0,0 +1,63 @@
+import pytest
+
+from inventory import Inventory, categorize, item_id
+
+
+def test_stacks_by_id():
+    inventory = Inventory()
+    inventory.add("Healing Potion")
+    inventory.add("healing  potion", 2)
+    assert len(inventory) == 1
+    assert inventory.count("HEALING POTION") == 3
+    assert "healing potion" in inventory
+    assert inventory.get("Healing Potion").name == "Healing Potion"
+    assert item_id("Captain's Map!") == "captain-s-map"
+
+
+def test_remove():
+    inventory = Inventory(["Torch", "Torch", "Rope"])
+    assert inventory.remove("torch") == "Torch"
+    assert inventory.count("Torch") == 1
+    assert inventory.remove("Torch", 5) == "Torch"
+    assert "Torch" not in inventory
+    assert inventory.remove("Dragon Egg") is None
+    assert inventory.total == 1
+    assert inventory.items("tool") == [inventory.get("Rope")]
+
+
+@pytest.mark.parametrize("count", [0, -2])
+def test_rejects_non_positive_counts(count):
+    inventory = Inventory(["Torch"])
+    with pytest.raises(ValueError):
+        inventory.add("Rope", count)
+    with pytest.raises(ValueError):
+        inventory.remove("Torch", count)
+    assert inventory.to_snapshot() == [["Torch", 1]]
+
+
+def test_categories():
+    assert categorize("Rusty Sword") == "weapon"
+    assert categorize("Map of the Isles") == "document"
+    assert categorize("Odd Trinket") == "misc"
+    inventory = Inventory(["Rusty Sword", "Rope", "Lantern"])
+    assert [item.name for item in inventory.items("tool")] == ["Rope", "Lantern"]
+    assert inventory.items("armor") == []
+
+
+def test_summary_is_capped_and_cached():
+    inventory = Inventory(max_summary_stacks=2)
+    for name in ("Torch", "Rope", "Map"):
+        inventory.add(name)
+    inventory.add("Torch")
+    assert inventory.summary() == "Torch x2, Rope, and 1 more kinds of items"
+    assert inventory.summary() is inventory.summary()
+    inventory.remove("Map")
+    assert inventory.summary() == "Torch x2, Rope"
+
+
+def test_snapshots():
+    inventory = Inventory(["Torch", ["Healing Potion", 2]])
+    assert inventory.to_snapshot() == [["Torch", 1], ["Healing Potion", 2]]
+    assert inventory.to_list() == ["Torch", "Healing Potion", "Healing Potion"]
+    # Older snapshots stored one name per unit
+    assert Inventory(inventory.to_list()).to_snapshot() == inventory.to_snapshot()
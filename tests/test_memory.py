@@ -0,0 +1,81 @@
+import asyncio
+
+from gamestate import ConversationMemory
+
+
+def entries(count, start=0):
+    return [f"PLAYER: action {i}" for i in range(start, start + count)]
+
+
+def test_overflow_folds_oldest_half_into_summary():
+    calls = []
+
+    def summarizer(summary, evicted, max_chars):
+        calls.append(list(evicted))
+        return (summary + " " + " ".join(evicted)).strip()
+
+    memory = ConversationMemory(max_entries=4, summarizer=summarizer)
+    for entry in entries(5):
+        memory.add(entry)
+
+    assert calls == [entries(3)]
+    assert list(memory.recent) == entries(2, start=3)
+    assert "action 0" in memory.summary
+    assert memory.total_entries == 5
+
+
+def test_summary_stays_bounded():
+    memory = ConversationMemory(max_entries=4, max_summary_chars=50)
+    for entry in entries(100):
+        memory.add(entry)
+    assert len(memory.summary) <= 50
+    assert len(memory.recent) <= 4
+
+
+def test_failing_summarizer_falls_back_to_local_summary():
+    def summarizer(summary, evicted, max_chars):
+        raise RuntimeError("LLM unavailable")
+
+    memory = ConversationMemory(max_entries=2, summarizer=summarizer)
+    for entry in entries(3):
+        memory.add(entry)
+    assert memory.summary
+    assert len(memory.recent) == 1
+
+
+def test_deferred_compaction_uses_async_summarizer():
+    def summarizer(summary, evicted, max_chars):
+        raise AssertionError("the sync summarizer must not run on async turns")
+
+    async def asummarizer(summary, evicted, max_chars):
+        return f"{len(evicted)} entries"
+
+    memory = ConversationMemory(max_entries=4, summarizer=summarizer, asummarizer=asummarizer)
+    with memory.deferred():
+        for entry in entries(6):
+            memory.add(entry)
+    assert len(memory.recent) == 6
+
+    asyncio.run(memory.acompact())
+    assert memory.summary == "4 entries"
+    assert list(memory.recent) == entries(2, start=4)
+
+
+def test_load_compacts_locally():
+    def summarizer(summary, evicted, max_chars):
+        raise AssertionError("restores must not call the summarizer")
+
+    memory = ConversationMemory(max_entries=4, summarizer=summarizer)
+    memory.load(entries(10), summary="Earlier", total_entries=40)
+    assert len(memory.recent) <= 4
+    assert memory.summary.startswith("Earlier")
+    assert memory.total_entries == 40
+
+
+def test_context_includes_summary_and_pending():
+    memory = ConversationMemory()
+    assert memory.get_context() == "No history yet."
+    memory.load(entries(3), summary="Earlier")
+    context = memory.get_context(count=2, pending=["PLAYER: next"])
+    assert context.splitlines() == ["Summary of earlier events: Earlier", "PLAYER: action 2", "PLAYER: next"]
+    assert len(memory.recent) == 3
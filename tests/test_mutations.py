@@ -0,0 +1,100 @@
+import pytest
+
+from mutations import (
+    MOVE, ADD_ITEM, GOLD, MutationError, move, add_item, remove_item, change_health, change_gold,
+    change_attribute, from_state_changes, from_change_dict, resolve_location
+)
+
+
+def state_of(game_state):
+    return (game_state.location.to_snapshot(), game_state.inventory.to_snapshot(), game_state.health,
+            game_state.gold, dict(game_state.character.attributes))
+
+
+def test_transaction_commits_changes(game_state):
+    gold = game_state.gold
+    with game_state.mutations.recording() as changes:
+        game_state.mutations.apply([
+            move("Kingdom of Eldoria", "Castle Eldoria"),
+            add_item("Torch"),
+            change_gold(10),
+            change_attribute("Strength", 2),
+        ])
+    assert game_state.location.area == "Castle Eldoria"
+    assert "Torch" in game_state.inventory
+    assert game_state.gold == gold + 10
+    assert game_state.character.attributes["strength"] == 7
+    assert [change.kind for change in changes] == [MOVE, ADD_ITEM, GOLD, "attribute"]
+
+
+def test_invalid_mutation_rolls_back_transaction(game_state):
+    game_state.add_to_inventory("Torch")
+    before = state_of(game_state)
+    with game_state.mutations.recording() as changes:
+        with pytest.raises(MutationError):
+            game_state.mutations.apply([
+                move("Arcane Isles", "Whispering Beach"),
+                remove_item("Torch"),
+                change_health(-10),
+                change_gold(-10_000),
+            ])
+    assert state_of(game_state) == before
+    assert changes == []
+    assert game_state.mutations.undo_log == []
+
+
+def test_lenient_apply_skips_invalid(game_state):
+    changes = game_state.mutations.apply([remove_item("Dragon Egg"), add_item("Rope")], strict=False)
+    assert [change.kind for change in changes] == [ADD_ITEM]
+    assert len(game_state.mutations.rejected) == 1
+
+
+def test_undo_reverts_last_transaction(game_state):
+    before = state_of(game_state)
+    game_state.mutations.apply([move("Arcane Isles", "Elemental Shrine"), add_item("Torch"), change_health(-20)])
+    reverse = game_state.mutations.undo()
+    assert state_of(game_state) == before
+    assert all(change.source == "undo" for change in reverse)
+    assert game_state.mutations.undo() == []
+
+
+def test_health_is_clamped(game_state):
+    game_state.mutations.apply([change_health(500)])
+    assert game_state.health == 100
+    game_state.mutations.apply([change_health(-500)])
+    assert game_state.health == 0
+
+
+def test_failing_subscriber_does_not_fail_the_transaction(game_state):
+    def broken(changes):
+        raise RuntimeError("subscriber bug")
+
+    game_state.mutations.subscribe(broken)
+    game_state.mutations.apply([add_item("Torch")])
+    assert "Torch" in game_state.inventory
+
+
+def test_malformed_state_changes_are_rejected(game_state):
+    mutations = from_state_changes([
+        {"type": "state_changes", "changes": {"gold": "lots", "inventory_add": {"oops": 1}}},
+        {"type": "state_changes", "changes": ["not", "a", "dict"]},
+        {"type": "inventory_add", "item": "Lantern"},
+    ])
+    changes = game_state.mutations.apply(mutations, strict=False)
+    assert [change.key for change in changes] == ["Lantern"]
+    assert len(game_state.mutations.rejected) == 3
+
+
+def test_change_dict_accepts_single_names():
+    assert from_change_dict({"inventory_add": "Torch", "inventory_remove": ["Map"]}) == [
+        add_item("Torch"), remove_item("Map")
+    ]
+
+
+def test_resolve_location(game_state):
+    world = game_state.world_setting
+    assert resolve_location(world, "kingdom of eldoria", "castle eldoria") == ("Kingdom of Eldoria", "Castle Eldoria")
+    # A wrong region still finds the area elsewhere in the world
+    assert resolve_location(world, "Kingdom of Eldoria", "Whispering Beach") == ("Arcane Isles", "Whispering Beach")
+    game_state.mutations.apply([move("Eldoria", "drakenwood forest")])
+    assert game_state.location.area == "Drakenwood Forest"
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from prompts import GeminiContextCache
+
+PREFIX = "x" * 400
+
+
+class SlowUploads(GeminiContextCache):
+    """Uploads block until released, and are counted per prefix"""
+
+    def __init__(self):
+        super().__init__(min_tokens=10)
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.uploaded = []
+
+    def _upload(self, prefix):
+        self.uploaded.append(prefix)
+        self.started.set()
+        if not self.release.wait(5):
+            raise TimeoutError("upload never released")
+        if prefix == "fail" * 100:
+            raise RuntimeError("quota exceeded")
+        return f"cachedContents/{len(self.uploaded)}"
+
+
+def test_small_prefixes_are_sent_inline():
+    assert GeminiContextCache(min_tokens=4096).lookup("k", PREFIX) is None
+
+
+def test_upload_does_not_block_other_prefixes():
+    cache = SlowUploads()
+    results = {}
+    first = threading.Thread(target=lambda: results.update(a=cache.lookup("a", PREFIX)))
+    first.start()
+    assert cache.started.wait(5)
+
+    # A cached handle for another prefix is served while the upload is in flight
+    cache.handles["b"] = ("cachedContents/b", float("inf"))
+    assert cache.lookup("b", PREFIX) == "cachedContents/b"
+
+    cache.release.set()
+    first.join(5)
+    assert results["a"] == "cachedContents/1"
+
+
+def test_concurrent_lookups_share_one_upload():
+    cache = SlowUploads()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.lookup("a", PREFIX))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert cache.started.wait(5)
+    cache.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ["cachedContents/1"] * 4
+    assert len(cache.uploaded) == 1
+    assert cache.lookup("a", PREFIX) == "cachedContents/1"
+
+
+def test_failed_upload_is_not_left_in_flight():
+    cache = SlowUploads()
+    cache.release.set()
+    with pytest.raises(RuntimeError):
+        cache.lookup("f", "fail" * 100)
+    assert cache.uploads == {}
+    assert cache.lookup("a", PREFIX) == "cachedContents/2"
@@ -0,0 +1,72 @@
+import pytest
+
+from mutations import move, add_item
+from quests import ACTIVE, COMPLETED, LOCKED, VISIT, OBTAIN, TALK, Quest, QuestLog
+
+
+def test_prerequisites_unlock_by_name():
+    quest_log = QuestLog()
+    second = quest_log.add(Quest("Slay the Dragon", [(TALK, "Old Knight")], prerequisites=["Find the Sword"]))
+    first = quest_log.add(Quest("Find the Sword", [(OBTAIN, "Ancient Sword")]))
+    assert second.status == LOCKED
+    assert first.status == ACTIVE
+
+    quest_log.complete("find the sword")
+    assert first.status == COMPLETED
+    assert second.status == ACTIVE
+    assert quest_log.complete("Find the Sword") is False
+
+
+def test_state_changes_complete_objectives(game_state):
+    quest = game_state.add_quest(Quest("Castle Errand", [(VISIT, "Castle Eldoria"), (OBTAIN, "Royal Seal")]))
+    game_state.mutations.apply([move("Kingdom of Eldoria", "Castle Eldoria")])
+    assert [objective.target for objective in quest.remaining()] == ["Royal Seal"]
+    assert quest.status == ACTIVE
+
+    game_state.mutations.apply([add_item("royal seal")])
+    assert quest.status == COMPLETED
+    assert game_state.quest_log.by_trigger == {}
+
+
+def test_objectives_already_met_complete_on_add(game_state):
+    game_state.add_to_inventory("Torch")
+    assert game_state.add_quest(Quest("Light", [(OBTAIN, "Torch")])).status == COMPLETED
+
+
+def test_talk_objectives():
+    quest_log = QuestLog()
+    quest = quest_log.add(Quest("Gossip", [(TALK, "Innkeeper")]))
+    assert quest_log.record_talk("Blacksmith") == []
+    assert quest_log.record_talk("innkeeper") == [quest]
+
+
+def test_rejects_cycles_and_duplicates():
+    quest_log = QuestLog()
+    quest_log.add(Quest("A", prerequisites=["B"]))
+    with pytest.raises(ValueError):
+        quest_log.add(Quest("B", prerequisites=["A"]))
+    with pytest.raises(ValueError):
+        quest_log.add(Quest("a"))
+
+
+def test_snapshot_round_trip():
+    quest_log = QuestLog()
+    quest_log.add(Quest("Find the Sword", [(OBTAIN, "Ancient Sword")]))
+    quest_log.add(Quest("Slay the Dragon", prerequisites=["Find the Sword"]))
+    quest_log.complete("Find the Sword")
+    restored = QuestLog.from_snapshot(quest_log.to_snapshot())
+    assert restored.to_snapshot() == quest_log.to_snapshot()
+    assert restored.get("Slay the Dragon").status == ACTIVE
+    # Older snapshots only had a name and a completed flag
+    assert QuestLog.from_snapshot([{"name": "Old", "completed": True}]).get("old").status == COMPLETED
+
+
+def test_prompt_block_is_bounded():
+    quest_log = QuestLog(max_prompt_quests=2)
+    assert quest_log.prompt_block() == "No active quests."
+    for index in range(4):
+        quest_log.add(Quest(f"Quest {index}", [(VISIT, f"Place {index}")]))
+    quest_log.complete("Quest 0")
+    assert quest_log.prompt_block().splitlines() == [
+        "⋯ Quest 1 (visit Place 1)", "⋯ Quest 2 (visit Place 2)", "and 1 more active quests", "✓ 1 completed"
+    ]
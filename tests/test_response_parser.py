@@ -0,0 +1,73 @@
+from response_parser import ResponseParser, parse_response, parse_state_change
+
+RESPONSE = (
+    "DESCRIPTION: You step into the Village of Riverdale. A bell tolls somewhere nearby.\n"
+    "LOCATION_CHANGE: Kingdom of Eldoria: Village of Riverdale\n"
+    "INVENTORY_ADD: Rusty Lantern\n"
+    "HEALTH_CHANGE: -5\n"
+    'STATE_CHANGES: {"gold": 10}\n'
+    "\n"
+    "OPTIONS:\n"
+    "1. Visit the tavern\n"
+    "2. Follow the bell\n"
+    "3. [Type your own action]"
+)
+
+
+def stream(text, size):
+    """Feed `text` in chunks of `size` characters, returning the events and the parser"""
+    parser = ResponseParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    events.extend(parser.close())
+    return events, parser
+
+
+def test_whole_response():
+    parsed = parse_response(RESPONSE)
+    assert parsed.description == "You step into the Village of Riverdale. A bell tolls somewhere nearby."
+    assert parsed.options == ["Visit the tavern", "Follow the bell", "[Type your own action]"]
+    assert parsed.state_changes == [
+        {"type": "location", "region": "Kingdom of Eldoria", "area": "Village of Riverdale"},
+        {"type": "inventory_add", "item": "Rusty Lantern"},
+        {"type": "health", "delta": -5},
+        {"type": "state_changes", "changes": {"gold": 10}},
+    ]
+
+
+def test_streamed_chunks_match_whole_parse():
+    whole = parse_response(RESPONSE)
+    for size in (1, 2, 3, 7, 16, len(RESPONSE)):
+        events, parser = stream(RESPONSE, size)
+        assert parser.result() == whole
+        # Description events add up to the description, in order
+        assert "".join(value for kind, value in events if kind == "description") == whole.description
+        assert [value["text"] for kind, value in events if kind == "option"] == whole.options
+        assert [value for kind, value in events if kind == "options"] == [whole.options]
+
+
+def test_state_changes_arrive_before_options():
+    events, _ = stream(RESPONSE, 5)
+    kinds = [kind for kind, _ in events]
+    assert kinds.index("state_change") < kinds.index("option")
+
+
+def test_option_on_the_header_line():
+    text = "DESCRIPTION: A crossroads.\nOPTIONS: 1. Go north\n2. Go south"
+    for size in (1, 4, len(text)):
+        _, parser = stream(text, size)
+        assert parser.result().options == ["Go north", "Go south"]
+        assert parser.result().description == "A crossroads."
+
+
+def test_text_without_headers_is_description():
+    parsed = parse_response("The door creaks open.")
+    assert parsed.description == "The door creaks open."
+    assert parsed.options == []
+
+
+def test_parse_state_change_lines():
+    assert parse_state_change("** INVENTORY_ADD: Torch") == {"type": "inventory_add", "item": "Torch"}
+    assert parse_state_change("STATE_CHANGES: not json") is None
+    assert parse_state_change("Just narrative") is None
@@ -0,0 +1,92 @@
+import pytest
+
+from session_store import SessionStore, SessionLocks, SQLiteBackend, SessionConflict
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "sessions.db"))
+
+
+@pytest.fixture
+def workers(backend, llm):
+    """Two stores over the same database, like two server processes"""
+    return SessionStore(backend, llm_factory=lambda: llm), SessionStore(backend, llm_factory=lambda: llm)
+
+
+def test_get_returns_live_game(workers, game):
+    store, _ = workers
+    store.create("s1", game)
+    assert store.get("s1") is game
+    assert store.metrics()["hits"] == 1
+
+
+def test_other_worker_rehydrates(workers, game):
+    first, second = workers
+    first.create("s1", game)
+    restored = second.get("s1")
+    assert restored is not game
+    assert restored.to_snapshot() == game.to_snapshot()
+    assert second.metrics()["rehydrations"] == 1
+
+
+def test_compare_and_set_conflict(workers, game):
+    first, second = workers
+    first.create("s1", game)
+    other = second.get("s1")
+
+    other.game_state.gold += 5
+    second.save("s1", other)
+
+    game.game_state.gold += 1
+    with pytest.raises(SessionConflict):
+        first.save("s1", game)
+    assert first.metrics()["conflicts"] == 1
+
+    # The stale game was dropped; the next get sees the other worker's save
+    reloaded = first.get("s1")
+    assert reloaded is not game
+    assert reloaded.game_state.gold == other.game_state.gold
+
+
+def test_discard_rehydrates_saved_snapshot(workers, game):
+    store, _ = workers
+    store.create("s1", game)
+    saved_gold = game.game_state.gold
+    game.game_state.gold += 100  # a turn that failed part way
+
+    store.discard("s1")
+    restored = store.get("s1")
+    assert restored is not game
+    assert restored.game_state.gold == saved_gold
+
+
+def test_missing_and_deleted_sessions(workers, game):
+    store, _ = workers
+    assert store.get("nope") is None
+    store.create("s1", game)
+    store.delete("s1")
+    assert "s1" not in store
+
+
+def test_expired_sessions_can_be_recreated(tmp_path, game):
+    backend = SQLiteBackend(str(tmp_path / "sessions.db"), ttl=-1)
+    assert backend.save("s1", b"old", None) == 1
+    assert backend.load("s1") is None
+    assert backend.save("s1", b"new", None) == 1
+
+
+def test_lru_eviction(backend, llm, new_game):
+    store = SessionStore(backend, llm_factory=lambda: llm, max_live=2)
+    for session_id in ("a", "b", "c"):
+        store.create(session_id, new_game())
+    assert store.live_sessions() == ["b", "c"]
+    assert store.metrics()["evictions"] == 1
+    assert store.get("a") is not None  # rehydrated from the durable tier
+
+
+def test_session_locks():
+    locks = SessionLocks()
+    lock = locks("s1")
+    assert locks("s1") is lock
+    assert locks("s2") is not lock
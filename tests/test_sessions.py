@@ -0,0 +1,37 @@
+import pytest
+
+from sessions import GameSessionManager
+from state_delta import snapshot_version
+
+
+@pytest.fixture
+def manager(llm):
+    return GameSessionManager(llm_factory=lambda: llm)
+
+
+def test_turns_reuse_the_live_game(manager):
+    result = manager.start_game("s1", "fantasy", "Tester", {"strength": 5}, "A careful tester", packed=True)
+    game = manager.games["s1"]
+    manager.run_turn("s1", None, None, result["game_state"], "Take the left path")
+    assert manager.games["s1"] is game
+    assert manager.stats["hits"] == 1
+
+
+@pytest.mark.parametrize("delta", [False, True])
+def test_failed_turn_drops_the_live_game(manager, monkeypatch, delta):
+    manager.start_game("s1", "fantasy", "Tester", {"strength": 5}, "A careful tester")
+    game = manager.games["s1"]
+    snapshot = game.to_snapshot()
+
+    def fail(user_input):
+        game.game_state.add_to_history(f"PLAYER: {user_input}")
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(game, "process_user_action", fail)
+    with pytest.raises(RuntimeError):
+        if delta:
+            manager.run_delta_turn("s1", snapshot_version(snapshot), "Wait")
+        else:
+            manager.run_turn("s1", snapshot["world_key"], snapshot["character"], snapshot["game_state"], "Wait")
+    # The retry rebuilds the game from the caller's snapshot instead of reusing the half-updated one
+    assert "s1" not in manager.games
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from game import AdventureGame
+from snapshot import encode_snapshot, decode_snapshot
+
+
+def play(game, *actions):
+    for action in actions:
+        game.process_user_action(action)
+
+
+def test_game_round_trip(game, llm):
+    play(game, *[f"Look around {i}" for i in range(10)])
+    game.game_state.add_to_inventory("Healing Potion", 3)
+    snapshot = game.to_snapshot()
+
+    calls = llm.calls
+    restored = AdventureGame.from_snapshot(snapshot, llm=llm)
+    assert llm.calls == calls  # restoring never calls the LLM
+    assert restored.to_snapshot() == snapshot
+    assert restored.game_state.inventory.count("Healing Potion") == 3
+    # Entries folded into the summary still count
+    assert restored.game_state.memory.total_entries == game.game_state.memory.total_entries
+
+
+@pytest.mark.parametrize("use_msgpack", [False, True])
+@pytest.mark.parametrize("compress", [False, True])
+def test_encoding_round_trip(game, use_msgpack, compress):
+    if use_msgpack:
+        pytest.importorskip("msgpack")
+    snapshot = game.to_snapshot()
+    assert decode_snapshot(encode_snapshot(snapshot, compress=compress, use_msgpack=use_msgpack)) == snapshot
+
+
+def test_decodes_bare_json(game):
+    snapshot = game.to_snapshot()
+    assert decode_snapshot(json.dumps(snapshot).encode("utf-8")) == snapshot
+
+
+def test_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        decode_snapshot(b"\x09\x00payload")
+
+
+def test_pack_unpack(game, llm):
+    play(game, "Take the right path")
+    assert AdventureGame.unpack(game.pack(), llm=llm).to_snapshot() == game.to_snapshot()
@@ -0,0 +1,64 @@
+import pytest
+
+from sessions import GameSessionManager
+from snapshot import encode_snapshot
+from state_delta import StaleDelta, diff_snapshots, apply_delta, snapshot_turn, snapshot_version
+
+
+def play(game, *actions):
+    for action in actions:
+        game.process_user_action(action)
+
+
+def test_delta_round_trip(game):
+    before = game.to_snapshot()
+    play(game, "Take the left path")
+    game.game_state.gold += 15
+    after = game.to_snapshot()
+
+    delta = diff_snapshots(before, after)
+    assert delta["base"] == snapshot_version(before)
+    assert delta["turn"] == snapshot_turn(after)
+    assert delta["set"]["gold"] == after["game_state"]["gold"]
+    assert apply_delta(before, delta) == after
+    # The base snapshot is left untouched
+    assert before != after
+
+
+def test_delta_across_history_overflow(game):
+    before = game.to_snapshot()
+    play(game, *[f"Look around {i}" for i in range(10)])
+    after = game.to_snapshot()
+    assert apply_delta(before, diff_snapshots(before, after)) == after
+
+
+def test_stale_delta(game):
+    before = game.to_snapshot()
+    play(game, "Take the left path")
+    middle = game.to_snapshot()
+    play(game, "Wait and listen")
+    delta = diff_snapshots(middle, game.to_snapshot())
+    with pytest.raises(StaleDelta):
+        apply_delta(before, delta)
+
+
+def test_diverged_game_at_same_turn_is_stale(game):
+    before = game.to_snapshot()
+    play(game, "Take the left path")
+    ours = game.to_snapshot()
+    diverged = dict(ours, game_state=dict(ours["game_state"], gold=ours["game_state"]["gold"] + 1))
+    assert snapshot_turn(diverged) == snapshot_turn(ours)
+    with pytest.raises(StaleDelta):
+        apply_delta(diverged, diff_snapshots(ours, before))
+
+
+def test_manager_resyncs_a_diverged_live_game(llm, game):
+    manager = GameSessionManager(llm_factory=lambda: llm)
+    manager.games["s1"] = game
+    stored = game.to_snapshot()
+    play(game, "Take the left path")  # a turn whose save lost the race
+
+    assert manager.run_delta_turn("s1", snapshot_version(stored), "Wait") == {"resync": True}
+    result = manager.run_delta_turn("s1", snapshot_version(stored), "Wait", encode_snapshot(stored))
+    assert manager.stats["restores"] == 1
+    assert apply_delta(stored, result["delta"]) == manager.games["s1"].to_snapshot()
@@ -0,0 +1,92 @@
+import json
+import asyncio
+
+import pytest
+
+from structured_output import (
+    PAUSED_TURN, StructuredOutputError, fallback_text, parse_turn, render_turn, turn_state_changes
+)
+
+VALID = {"d": "You light the lantern.", "o": ["Go deeper", "Turn back"],
+         "s": [{"k": "add", "v": "Lantern"}, {"k": "gold", "v": "-5"}]}
+
+
+def test_parses_valid_turn():
+    turn = parse_turn(json.dumps(VALID))
+    assert turn.d == "You light the lantern."
+    assert turn_state_changes(turn) == [{"type": "inventory_add", "item": "Lantern"}, {"type": "gold", "delta": -5}]
+
+
+def test_repairs_wrapped_json_locally():
+    wrapped = "Here is the turn:\n```json\n" + json.dumps(VALID)[:-1] + ",}\n```\nEnjoy!"
+    assert parse_turn(wrapped).o == ["Go deeper", "Turn back"]
+
+
+@pytest.mark.parametrize("reply", [
+    "no json here",
+    json.dumps({"d": "", "o": ["Go"]}),
+    json.dumps({"d": "Text", "o": []}),
+    json.dumps({"d": "Text", "o": ["Go"], "s": [{"k": "move", "v": "Castle"}]}),
+    json.dumps({"d": "Text", "o": ["Go"], "s": [{"k": "gold", "v": "lots"}]}),
+])
+def test_rejects_invalid_turns(reply):
+    with pytest.raises(StructuredOutputError):
+        parse_turn(reply)
+
+
+def test_renders_text_format():
+    text = render_turn(parse_turn(json.dumps({**VALID, "o": ["Go deeper", "[Type your own action]"]})))
+    assert text == "DESCRIPTION: You light the lantern.\n\nOPTIONS:\n1. Go deeper\n2. [Type your own action]"
+
+
+def test_fallback_text_never_shows_json():
+    # A turn that failed validation keeps its narrative and options
+    assert fallback_text('{"d": "The cave is dark.", "o": ["Light a torch"], "s": [{"k": "gold", "v": "x"}]}') == (
+        "DESCRIPTION: The cave is dark.\n\nOPTIONS:\n1. Light a torch\n2. [Type your own action]"
+    )
+    assert fallback_text('The cave is dark.\n```json\n{"o": ["Go"]}\n```') == "The cave is dark."
+    assert fallback_text('{"o": ["Go"], "s": []}') == PAUSED_TURN
+
+
+def script(game, *replies):
+    """Make the game's storyteller answer with `replies`, in order"""
+    game.llm.responses = list(replies)
+    game.llm.reset_stats()
+
+
+def test_game_repairs_invalid_reply(new_game):
+    game = new_game(structured=True)
+    script(game, '{"d": "You wait.", "o": []}', json.dumps(VALID))
+
+    response = game.process_user_action("Wait")
+    assert response.startswith("DESCRIPTION: You light the lantern.")
+    assert game.llm.calls == 2
+    assert game.structured_stats["repaired"] == 1
+    assert "Lantern" in game.game_state.inventory
+
+
+def test_game_repairs_invalid_reply_async(new_game):
+    game = new_game(structured=True)
+    script(game, "not json", json.dumps(VALID))
+
+    response = asyncio.run(game.aprocess_user_action("Wait"))
+    assert response.startswith("DESCRIPTION: You light the lantern.")
+    assert game.structured_stats["repaired"] == 1
+
+
+def test_game_falls_back_to_text(new_game):
+    game = new_game(structured=True)
+    text = "DESCRIPTION: The storyteller ignored JSON mode.\n\nOPTIONS:\n1. Carry on"
+    script(game, text)
+
+    assert game.process_user_action("Wait") == text
+    assert game.structured_stats["fallback"] == 1
+    assert game.offered_options == ["Carry on"]
+
+
+def test_game_falls_back_without_raw_json(new_game):
+    game = new_game(structured=True)
+    script(game, '{"o": ["Go"]}')
+
+    assert game.process_user_action("Wait") == PAUSED_TURN
+    assert game.game_state.history[-1] == f"STORYTELLER: {PAUSED_TURN}"
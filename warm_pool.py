@@ -0,0 +1,149 @@
+"""
+Warm capacity for the Modal game and image functions
+
+Each function gets a minimum number of warm containers, optionally raised during
+time-of-day windows, plus predictive pre-warming: when a player reaches character
+creation the functions their intro and first image will need are woken up, so
+those calls do not pay the cold start. Nothing here talks to Modal; app.py applies
+the targets on a cron schedule and the web servers call `prewarm()`.
+
+Configuration is DEFAULT_WARM_POOL, overridden per function by WARM_POOL_CONFIG
+(a path to a JSON file, or the JSON itself), e.g.
+
+    {"image": {"min_containers": 0,
+               "schedule": [{"start": 17, "end": 23, "min_containers": 1}],
+               "utc_offset": 1}}
+"""
+
+import os
+import json
+import time
+import threading
+
+DEFAULT_WARM_POOL = {
+    "game": {
+        "min_containers": 0,
+        "schedule": [],
+        "scaledown_window": 300,  # seconds Modal keeps an idle container
+        "prewarm": True,
+        "utc_offset": 0
+    },
+    "image": {
+        "min_containers": 0,
+        "schedule": [],
+        "scaledown_window": 600,
+        "prewarm": True,
+        "utc_offset": 0
+    }
+}
+
+
+class WarmPoolConfig:
+    """Warm-capacity settings for one function"""
+
+    def __init__(self, name, min_containers=0, schedule=None, scaledown_window=300,
+                 prewarm=True, prewarm_cooldown=None, utc_offset=0):
+        self.name = name
+        self.min_containers = min_containers
+        self.schedule = list(schedule or [])
+        self.scaledown_window = scaledown_window
+        self.prewarm = prewarm
+        # A container woken or used this recently is assumed to still be warm
+        self.prewarm_cooldown = prewarm_cooldown if prewarm_cooldown is not None else scaledown_window / 2
+        self.utc_offset = utc_offset
+
+    def scheduled_minimum(self, now):
+        """Minimum warm containers at time `now` (epoch seconds)"""
+        hour = (now / 3600 + self.utc_offset) % 24
+        minimum = self.min_containers
+        for window in self.schedule:
+            start, end = window["start"], window["end"]
+            # Windows may wrap past midnight, e.g. 22 -> 2
+            inside = start <= hour < end if start <= end else (hour >= start or hour < end)
+            if inside:
+                minimum = max(minimum, window["min_containers"])
+        return minimum
+
+
+def load_overrides(source=None):
+    """The per-function overrides in WARM_POOL_CONFIG (or `source`), read from a file if it is a path"""
+    source = source if source is not None else os.environ.get("WARM_POOL_CONFIG", "")
+    if not source:
+        return {}
+    if source.lstrip().startswith("{"):
+        return json.loads(source)
+    with open(source) as f:
+        return json.load(f)
+
+
+def warm_pool_env(source=None):
+    """Environment that carries this process's overrides into a Modal container as inline JSON"""
+    return {"WARM_POOL_CONFIG": json.dumps(load_overrides(source))}
+
+
+def load_warm_pool_config(source=None):
+    """Build {name: WarmPoolConfig} from the defaults and WARM_POOL_CONFIG"""
+    overrides = load_overrides(source)
+    configs = {}
+    for name in set(DEFAULT_WARM_POOL) | set(overrides):
+        settings = {**DEFAULT_WARM_POOL.get(name, {}), **overrides.get(name, {})}
+        configs[name] = WarmPoolConfig(name, **settings)
+    return configs
+
+
+class WarmPoolScheduler:
+    """Decides how many containers each function keeps warm and when to pre-warm"""
+
+    def __init__(self, configs=None, clock=time.time):
+        self.configs = configs if configs is not None else load_warm_pool_config()
+        self.clock = clock
+        self.last_warm = {}  # name -> last time a container was used or woken
+        self.lock = threading.Lock()
+        self.stats = {"prewarms": 0, "prewarms_skipped": 0}
+
+    def targets(self, now=None):
+        """{name: min_containers} to apply right now"""
+        now = self.clock() if now is None else now
+        return {name: config.scheduled_minimum(now) for name, config in self.configs.items()}
+
+    def note_activity(self, name, now=None):
+        """Record that a function just served a call, so it is known to be warm"""
+        with self.lock:
+            self.last_warm[name] = self.clock() if now is None else now
+
+    def prewarm(self, names=None, now=None):
+        """Return the functions worth waking for a new session, marking them as woken"""
+        now = self.clock() if now is None else now
+        names = list(self.configs) if names is None else names
+        woken = []
+        with self.lock:
+            for name in names:
+                config = self.configs.get(name)
+                if config is None or not config.prewarm:
+                    continue
+                # Skip when a container is already guaranteed or was warm a moment ago
+                recently_warm = now - self.last_warm.get(name, float("-inf")) < config.prewarm_cooldown
+                if config.scheduled_minimum(now) > 0 or recently_warm:
+                    self.stats["prewarms_skipped"] += 1
+                    continue
+                self.last_warm[name] = now
+                self.stats["prewarms"] += 1
+                woken.append(name)
+        return woken
+
+    def metrics(self):
+        with self.lock:
+            return {**self.stats, "targets": self.targets()}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def warm_pool_scheduler():
+    """The process-wide scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = WarmPoolScheduler()
+        return _scheduler
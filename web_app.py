@@ -1,7 +1,12 @@
 import os
 import json
+import uuid
 from flask import Flask, render_template, request, jsonify, session
-from app import initialize_new_game, run_game_turn
+from app import GameSessions, prewarm
+from response_parser import parse_response
+from session_store import create_backend
+from snapshot import encode_snapshot, decode_snapshot
+from state_delta import StaleDelta, apply_delta, snapshot_version
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,6 +15,9 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # For session management
 
+# Game snapshots live server-side; the cookie only carries the session ID
+game_snapshots = create_backend(os.environ.get("WEB_SESSION_STORE_URL"))
+
 # Available world settings
 AVAILABLE_WORLDS = {
     "fantasy": "A magical realm of dragons, wizards, and ancient mysteries.",
@@ -28,6 +36,9 @@ def character_creation():
     world_key = request.form.get('world')
     session['world_key'] = world_key
     
+    # Start the game container while the player fills in the form
+    prewarm(["game"])
+    
     return render_template('character.html', world=world_key)
 
 @app.route('/initialize_game', methods=['POST'])
@@ -45,31 +56,25 @@ def initialize_game():
         'luck': int(request.form.get('luck', 0))
     }
     
-    # Store character data in session
-    session['character'] = {
-        'name': name,
-        'attributes': attributes,
-        'description': description
-    }
-    
-    # Initialize game using Modal function
+    # Initialize game using the stateful Modal session class
     world_key = session.get('world_key')
-    result = initialize_new_game.remote(world_key, name, attributes, description)
+    session['session_id'] = uuid.uuid4().hex
+    result = GameSessions().start.remote(session['session_id'], world_key, name, attributes, description,
+                                         packed=True)
     
-    # Store game state in session
-    session['game_state'] = result['game_state']
+    # Store the packed game snapshot server-side
+    game_snapshots.save(session['session_id'], result['game_state'], None)
     
     # Parse introduction text and options
     intro_text = result['introduction']
     
-    # Extract options from the response
-    options = extract_options(intro_text)
-    description_text = extract_description(intro_text)
+    # Extract description and options from the response
+    description_text, options = extract_story(intro_text)
     
     return render_template('game.html', 
                            description=description_text, 
                            options=options,
-                           character=session['character'],
+                           character={'name': name, 'attributes': attributes, 'description': description},
                            world=world_key)
 
 @app.route('/action', methods=['POST'])
@@ -77,63 +82,61 @@ def process_action():
     # Get user action
     action = request.form.get('action')
     
-    # Get game state and character from session
-    game_state = session.get('game_state', {})
-    character = session.get('character', {})
-    world_key = session.get('world_key')
-    
-    # Process action using Modal function
-    result = run_game_turn.remote(
-        world_key,
-        character,
-        game_state,
-        action
-    )
-    
-    # Update game state in session
-    session['game_state'] = result['game_state']
+    # Load the game snapshot for this session
+    session_id = session.get('session_id', '')
+    record = game_snapshots.load(session_id)
+    if record is None:
+        return jsonify({'error': 'No game in progress'}), 404
+    
+    store_version, data = record
+    snapshot = decode_snapshot(data)
+    version = snapshot_version(snapshot)
+    
+    # Process action using the stateful Modal session class; only the changes come back
+    sessions = GameSessions()
+    try:
+        result = sessions.delta_turn.remote(session_id, version, action)
+        if result.get('resync'):
+            # The container serving this call does not hold the game, so send it along
+            result = sessions.delta_turn.remote(session_id, version, action, data)
+        
+        # Apply the changes and save, unless another request for this session got there first
+        snapshot = apply_delta(snapshot, result['delta'])
+        saved = game_snapshots.save(session_id, encode_snapshot(snapshot), store_version)
+    except StaleDelta:
+        # The container ran the turn on a game that no longer matches the stored one
+        sessions.end.remote(session_id)
+        return jsonify({'error': 'Game was updated by another request'}), 409
+    except Exception:
+        sessions.end.remote(session_id)
+        raise
+    if saved is None:
+        # The live game now holds a turn that was never stored, so drop it
+        sessions.end.remote(session_id)
+        return jsonify({'error': 'Game was updated by another request'}), 409
     
     # Parse response text and options
     response_text = result['response']
-    options = extract_options(response_text)
-    description_text = extract_description(response_text)
+    description_text, options = extract_story(response_text)
     
     return jsonify({
         'description': description_text,
         'options': options
     })
 
-def extract_options(text):
-    """Extract options from the AI response"""
-    options = []
-    
-    # Check if OPTIONS section exists
-    if "OPTIONS:" in text:
-        options_section = text.split("OPTIONS:")[1].strip()
-        
-        # Extract numbered options
-        lines = options_section.split('\n')
-        for line in lines:
-            if line.strip() and any(line.startswith(str(i) + ".") for i in range(1, 5)):
-                # Remove the number prefix
-                option_text = line.split(".", 1)[1].strip()
-                options.append(option_text)
+DEFAULT_OPTIONS = [
+    "Explore your surroundings",
+    "Talk to someone nearby",
+    "Check your inventory"
+]
+
+def extract_story(text):
+    """Extract the description and options from the AI response"""
+    parsed = parse_response(text)
     
     # If no options found, provide default ones
-    if not options:
-        options = [
-            "Explore your surroundings",
-            "Talk to someone nearby",
-            "Check your inventory"
-        ]
-    
-    return options
-
-def extract_description(text):
-    """Extract the description from the AI response"""
-    if "DESCRIPTION:" in text:
-        return text.split("DESCRIPTION:")[1].split("OPTIONS:")[0].strip()
-    return text
+    options = parsed.options[:4] or list(DEFAULT_OPTIONS)
+    return parsed.description or text, options
 
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
@@ -112,6 +112,14 @@ class WorldSettings:
         
         return regions
     
+    def to_snapshot(self):
+        # Regions are derived from the world type, so they are not stored
+        return {"world_type": self.world_type, "description": self.description}
+    
+    @classmethod
+    def from_snapshot(cls, data):
+        return cls(data["world_type"], data["description"])
+    
     def get_areas_in_region(self, region_name):
         """Get all areas within a specific region"""
         if region_name in self.regions: